@@ -0,0 +1,335 @@
+"""
+Harvest Pipeline
+Generator-based streaming pipeline shared by all NASAHarvester sources
+
+A source is a small plugin: it yields WorkItems from discover() and
+overrides whichever of fetch/parse/persist it needs. The pipeline runs
+every source through the same stages, connected by bounded queues so a
+slow writer throttles the fetchers instead of buffering the whole
+harvest in memory:
+
+    discover -> fetch (N threads) -> parse (N threads) -> persist -> catalog
+
+Every source gets for free:
+  - concurrency   fetch/parse worker threads
+  - caching       items whose target file exists are not fetched again
+  - metrics       per-stage counts, failures, timings and bytes
+  - resume        an interrupted run skips the items it already finished
+
+A failed item is logged and dropped, and the next identical run retries
+only the failures. A run in which every item failed raises the first
+error (e.g. requests.HTTPError) instead of returning an empty result.
+
+Usage:
+    from harvest_pipeline import HarvestPipeline, HarvestSource, WorkItem
+
+    class MySource(HarvestSource):
+        name = 'my_source'
+
+        def discover(self, harvester, session):
+            yield WorkItem(key='2026-01-01', url='https://...', target=Path(...))
+
+    HarvestPipeline(harvester).run(MySource())
+"""
+
+import json
+import hashlib
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+
+
+@dataclass
+class WorkItem:
+    """One unit of work flowing through the pipeline"""
+    key: str
+    url: Optional[str] = None
+    params: Dict = field(default_factory=dict)
+    target: Optional[Path] = None
+    meta_file: Optional[Path] = None
+    meta: Dict = field(default_factory=dict)
+    payload: Any = None
+    cached: bool = False
+    result: Optional[Dict] = None
+
+
+class HarvestSource:
+    """Base class for pipeline source plugins.
+
+    Subclasses set ``name`` and implement ``discover``; the default stages
+    download ``item.url`` to ``item.target`` (or into ``item.payload`` when
+    there is no target) and return ``item.meta`` as the item result.
+    """
+
+    name = 'source'
+    fetch_timeout = 60
+
+    def run_key(self) -> str:
+        """Identity of a run, used to find resume state. Override to include parameters."""
+        return self.name
+
+    def session(self, harvester) -> requests.Session:
+        return requests.Session()
+
+    def discover(self, harvester, session: requests.Session) -> Iterator[WorkItem]:
+        raise NotImplementedError
+
+    def fetch(self, harvester, session: requests.Session, item: WorkItem) -> int:
+        """Fetch an item; returns bytes transferred"""
+        if not item.url:
+            return 0
+        if item.target is not None:
+            if item.target.exists():
+                item.cached = True
+                return 0
+            item.target.parent.mkdir(parents=True, exist_ok=True)
+            partial = item.target.with_name(item.target.name + '.part')
+            size = 0
+            with session.get(item.url, params=item.params or None, stream=True,
+                             timeout=self.fetch_timeout) as response:
+                response.raise_for_status()
+                with open(partial, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                        size += len(chunk)
+            partial.replace(item.target)
+            return size
+        response = session.get(item.url, params=item.params or None,
+                               timeout=self.fetch_timeout)
+        response.raise_for_status()
+        item.payload = response.content
+        return len(response.content)
+
+    def parse(self, harvester, item: WorkItem) -> None:
+        pass
+
+    def persist(self, harvester, item: WorkItem) -> None:
+        pass
+
+    def summarize(self, item: WorkItem) -> Dict:
+        return item.result if item.result is not None else dict(item.meta)
+
+    def finish(self, harvester, results: List[Dict]) -> None:
+        """Hook for whole-run work once every item is persisted (e.g. mosaics)"""
+
+    def catalog_key(self) -> str:
+        return self.name
+
+    def catalog_entry(self, results: List[Dict]) -> Dict:
+        return {'items_harvested': len(results)}
+
+    def output(self, results: List[Dict]):
+        """Value returned to the caller of HarvestPipeline.run()"""
+        return results
+
+
+class ResumeState:
+    """Finished item keys of an in-progress run, persisted as JSON.
+
+    The file is removed when the run completes, so it only ever describes
+    an interrupted run.
+    """
+
+    def __init__(self, state_dir: Path, run_key: str, flush_every: int = 25):
+        digest = hashlib.sha1(run_key.encode()).hexdigest()[:16]
+        state_dir.mkdir(parents=True, exist_ok=True)
+        self.path = state_dir / f"{digest}.json"
+        self.flush_every = flush_every
+        self._pending = 0
+        self.done: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                self.done = json.load(f).get('done', {})
+
+    def mark(self, key: str, summary: Dict):
+        self.done[key] = summary
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'done': self.done}, f)
+        tmp.replace(self.path)
+        self._pending = 0
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+class StageMetrics:
+    """Thread-safe per-stage counters"""
+
+    def __init__(self, stages: List[str]):
+        self._lock = threading.Lock()
+        self.stages = {s: {'items': 0, 'failed': 0, 'seconds': 0.0} for s in stages}
+        self.bytes_fetched = 0
+        self.cached = 0
+        self.resumed = 0
+
+    def record(self, stage: str, seconds: float, failed: bool = False):
+        with self._lock:
+            entry = self.stages[stage]
+            entry['failed' if failed else 'items'] += 1
+            entry['seconds'] += seconds
+
+    def add_bytes(self, n: int):
+        with self._lock:
+            self.bytes_fetched += n
+
+    def add_cached(self):
+        with self._lock:
+            self.cached += 1
+
+    def add_resumed(self):
+        with self._lock:
+            self.resumed += 1
+
+    def as_dict(self, elapsed: float) -> Dict:
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'bytes_fetched': self.bytes_fetched,
+            'cached': self.cached,
+            'resumed': self.resumed,
+            'stages': {s: {**v, 'seconds': round(v['seconds'], 3)}
+                       for s, v in self.stages.items()}
+        }
+
+
+_DONE = object()
+
+
+class HarvestPipeline:
+    """Run HarvestSource plugins through bounded-queue stages"""
+
+    STAGES = ['fetch', 'parse', 'persist']
+
+    def __init__(self, harvester, workers: int = 4, queue_size: int = 16):
+        self.harvester = harvester
+        self.workers = workers
+        self.queue_size = queue_size
+        self.logger = harvester.logger
+
+    def _stage(self, name, fn, inbox, outbox, workers, metrics, failures):
+        """Start worker threads for one stage; the last one out forwards _DONE.
+        A failed item is logged, appended to ``failures`` and dropped."""
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    inbox.put(_DONE)
+                    break
+                start = time.perf_counter()
+                try:
+                    fn(item)
+                except Exception as e:
+                    metrics.record(name, time.perf_counter() - start, failed=True)
+                    self.logger.warning(f"{name} failed for {item.key}: {e}")
+                    failures.append(e)
+                    continue
+                metrics.record(name, time.perf_counter() - start)
+                outbox.put(item)
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    outbox.put(_DONE)
+
+        threads = [threading.Thread(target=work, daemon=True, name=f"{name}-{i}")
+                   for i in range(workers)]
+        for t in threads:
+            t.start()
+        return threads
+
+    def run(self, source: HarvestSource):
+        harvester = self.harvester
+        started = time.perf_counter()
+        metrics = StageMetrics(self.STAGES)
+        state = ResumeState(harvester.data_dir / ".pipeline", source.run_key())
+        session = source.session(harvester)
+        self.logger.info(f"Pipeline start: {source.name}")
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(4)]
+        discovered, fetched, parsed, persisted = queues
+        results = []
+        errors = []
+        failures = []
+
+        def discover():
+            try:
+                for item in source.discover(harvester, session):
+                    if item.key in state.done:
+                        results.append(state.done[item.key])
+                        metrics.add_resumed()
+                        continue
+                    discovered.put(item)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                discovered.put(_DONE)
+
+        def fetch(item):
+            metrics.add_bytes(source.fetch(harvester, session, item))
+            if item.cached:
+                metrics.add_cached()
+
+        threads = [threading.Thread(target=discover, daemon=True, name='discover')]
+        threads[0].start()
+        threads += self._stage('fetch', fetch, discovered, fetched, self.workers, metrics, failures)
+        threads += self._stage('parse', lambda item: source.parse(harvester, item),
+                               fetched, parsed, self.workers, metrics, failures)
+        # A single writer keeps on-disk state consistent
+        threads += self._stage('persist', lambda item: source.persist(harvester, item),
+                               parsed, persisted, 1, metrics, failures)
+
+        # Catalog stage: collect results in the calling thread
+        while True:
+            item = persisted.get()
+            if item is _DONE:
+                break
+            summary = source.summarize(item)
+            results.append(summary)
+            state.mark(item.key, summary)
+
+        for t in threads:
+            t.join()
+        if errors:
+            # Discovery failed (e.g. listing request); keep progress for a resume
+            state.flush()
+            raise errors[0]
+        if failures and not results:
+            # Nothing to catalog; surface the failure (e.g. HTTPError) to the caller
+            state.flush()
+            raise failures[0]
+
+        source.finish(harvester, results)
+        elapsed = time.perf_counter() - started
+
+        entry = {'last_harvest': datetime.now().isoformat()}
+        entry.update(source.catalog_entry(results))
+        entry['metrics'] = metrics.as_dict(elapsed)
+        harvester.catalog['sources'][source.catalog_key()] = entry
+        harvester._save_catalog()
+
+        failed = sum(s['failed'] for s in metrics.stages.values())
+        if failed:
+            # Keep finished keys so the next identical run only retries failures
+            state.flush()
+        else:
+            state.clear()
+
+        self.logger.info(
+            f"Pipeline done: {source.name} - {len(results)} items "
+            f"({metrics.cached} cached, {metrics.resumed} resumed, {failed} failed) "
+            f"in {elapsed:.1f}s"
+        )
+        return source.output(results)
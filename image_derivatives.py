@@ -0,0 +1,130 @@
+"""
+Image Derivatives
+Dimensions, EXIF, thumbnails and web-size copies for harvested imagery
+
+Work runs in a process pool (decoding and resampling are CPU-bound).
+Derivatives are content-addressed by SHA-256, so a file whose hash is
+unchanged since the last run is skipped without being decoded.
+
+Usage:
+    from image_derivatives import derive_images
+    records = derive_images(paths, out_dir, known={path: sha256, ...})
+"""
+
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+THUMB_SIZE = 256
+WEB_SIZE = 1600
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.gif', '.tif', '.tiff', '.webp'}
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _json_safe(value):
+    """EXIF values as plain JSON types (rationals, tuples, bytes)"""
+    if isinstance(value, bytes):
+        return None if len(value) > 64 else value.hex()
+    if isinstance(value, (tuple, list)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _read_exif(img) -> Dict:
+    from PIL import ExifTags
+
+    exif = img.getexif()
+    tags = dict(exif)
+    # Camera settings live in the Exif sub-IFD
+    tags.update(exif.get_ifd(0x8769))
+    out = {}
+    for tag, value in tags.items():
+        name = ExifTags.TAGS.get(tag, str(tag))
+        value = _json_safe(value)
+        if value is not None:
+            out[name] = value
+    return out
+
+
+def _derivative_paths(out_dir: Path, sha: str):
+    return (out_dir / "thumbs" / sha[:2] / f"{sha}.jpg",
+            out_dir / "web" / sha[:2] / f"{sha}.jpg")
+
+
+def derive_one(path: str, out_dir: str, known_sha: Optional[str] = None) -> Dict:
+    """Process-pool worker: hash, then extract metadata and write derivatives"""
+    from PIL import Image
+
+    path = Path(path)
+    out_dir = Path(out_dir)
+    sha = file_sha256(path)
+    thumb, web = _derivative_paths(out_dir, sha)
+    if sha == known_sha and thumb.exists() and web.exists():
+        return {'path': str(path), 'sha256': sha, 'unchanged': True}
+
+    with Image.open(path) as img:
+        record = {
+            'path': str(path),
+            'sha256': sha,
+            'unchanged': False,
+            'width': img.width,
+            'height': img.height,
+            'format': img.format,
+            'mode': img.mode,
+            'exif': _read_exif(img),
+        }
+        img.seek(0)
+        rgb = img.convert('RGB')
+
+    for target, size in ((web, WEB_SIZE), (thumb, THUMB_SIZE)):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Image.thumbnail keeps aspect and never upsamples; derive the
+        # thumbnail from the web copy to avoid a second full-size resample
+        rgb.thumbnail((size, size), Image.LANCZOS)
+        rgb.save(target, 'JPEG', quality=85, optimize=True)
+
+    record['thumbnail'] = str(thumb)
+    record['web'] = str(web)
+    return record
+
+
+def derive_images(
+    paths: Iterable,
+    out_dir,
+    known: Optional[Dict[str, str]] = None,
+    workers: Optional[int] = None
+) -> Dict[str, Dict]:
+    """Derive metadata for many images in a process pool.
+
+    ``known`` maps path -> sha256 from a previous run. Returns path ->
+    record; records flagged ``unchanged`` carry only the hash.
+    """
+    known = known or {}
+    paths = [str(p) for p in paths if Path(p).suffix.lower() in IMAGE_SUFFIXES]
+    if not paths:
+        return {}
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(derive_one, p, str(out_dir), known.get(p)): p for p in paths
+        }
+        for future, path in futures.items():
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = {'path': path, 'error': str(e)}
+    return results
@@ -6,16 +6,19 @@ Usage:
     from nasa_harvester import NASAHarvester
     harvester = NASAHarvester()
     harvester.harvest_all()
+
+Every harvest_* method runs a source plugin (nasa_sources.py) through the
+streaming pipeline in harvest_pipeline.py; new sources only need a
+HarvestSource subclass passed to harvester.run_source().
 """
 
 import os
 import sys
 import json
 import logging
-import requests
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Sequence
 
 # Load credentials
 sys.path.insert(0, os.path.dirname(__file__))
@@ -25,15 +28,29 @@ try:
 except ImportError:
     pass
 
+from harvest_pipeline import HarvestPipeline, HarvestSource
+from image_derivatives import derive_images
+from nasa_sources import (
+    ApodSource, MarsRoverSource, NeoSource, PowerSource,
+    CmrGranuleSource, GibsImagerySource, EarthdataSession,
+    load_aoi, search_cmr_granules
+)
+
 
 class NASAHarvester:
     """Harvest and manage NASA data locally"""
 
-    def __init__(self, data_dir: str = None):
+    CMR_URL = "https://cmr.earthdata.nasa.gov/search"
+    CMR_COLLECTIONS = CmrGranuleSource.COLLECTIONS
+    GIBS_URL = "https://gibs.earthdata.nasa.gov/wmts/epsg4326/best"
+    GIBS_LAYERS = GibsImagerySource.LAYERS
+
+    def __init__(self, data_dir: str = None, workers: int = 4):
         if data_dir is None:
             data_dir = Path(__file__).parent / "data" / "nasa"
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
 
         # Load credentials
         self.api_key = os.getenv('NASA_API_KEY', 'DEMO_KEY')
@@ -74,71 +91,47 @@ class NASAHarvester:
         with open(self.catalog_file, 'w') as f:
             json.dump(self.catalog, f, indent=2)
 
+    def run_source(self, source: HarvestSource, workers: Optional[int] = None):
+        """Run any HarvestSource plugin through the streaming pipeline"""
+        return HarvestPipeline(self, workers=workers or self.workers).run(source)
+
+    # ===== Image Derivatives =====
+
+    def derive_images(self, paths, workers: Optional[int] = None) -> Dict:
+        """Catalog dimensions/EXIF and build thumbnails for downloaded images"""
+        images = self.catalog.setdefault('images', {})
+        paths = [Path(p) for p in paths if p and Path(p).exists()]
+        keys = {str(p): p.relative_to(self.data_dir).as_posix() for p in paths}
+        known = {p: images.get(k, {}).get('sha256') for p, k in keys.items()}
+
+        results = derive_images(keys, self.data_dir / "derivatives", known, workers)
+
+        stats = {'derived': 0, 'unchanged': 0, 'failed': 0}
+        for path, record in results.items():
+            if 'error' in record:
+                self.logger.warning(f"Image derivation failed for {path}: {record['error']}")
+                stats['failed'] += 1
+                continue
+            if record.pop('unchanged'):
+                stats['unchanged'] += 1
+                continue
+            record['path'] = keys[path]
+            for field in ('thumbnail', 'web'):
+                record[field] = Path(record[field]).relative_to(self.data_dir).as_posix()
+            images[keys[path]] = record
+            stats['derived'] += 1
+
+        self._save_catalog()
+        self.logger.info(f"Image derivatives: {stats['derived']} new, "
+                         f"{stats['unchanged']} unchanged, {stats['failed']} failed")
+        return stats
+
     # ===== APOD Harvesting =====
 
     def harvest_apod(self, days: int = 7) -> List[Dict]:
         """Harvest recent APOD images"""
         self.logger.info(f"Harvesting APOD for last {days} days")
-
-        output_dir = self.data_dir / "apod"
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-
-        response = requests.get(
-            'https://api.nasa.gov/planetary/apod',
-            params={
-                'api_key': self.api_key,
-                'start_date': start_date.strftime('%Y-%m-%d'),
-                'end_date': end_date.strftime('%Y-%m-%d'),
-                'thumbs': True
-            },
-            timeout=30
-        )
-        response.raise_for_status()
-        items = response.json()
-
-        harvested = []
-        for item in items:
-            date = item['date']
-            year, month, _ = date.split('-')
-
-            dir_path = output_dir / year / month
-            dir_path.mkdir(parents=True, exist_ok=True)
-
-            # Save metadata
-            meta_file = dir_path / f"{date}.json"
-            with open(meta_file, 'w') as f:
-                json.dump(item, f, indent=2)
-
-            # Download image
-            if item.get('media_type') == 'image':
-                img_url = item.get('hdurl') or item['url']
-                ext = img_url.split('.')[-1].split('?')[0]
-                img_file = dir_path / f"{date}.{ext}"
-
-                if not img_file.exists():
-                    self.logger.info(f"Downloading: {item['title']}")
-                    try:
-                        img_data = requests.get(img_url, timeout=60).content
-                        with open(img_file, 'wb') as f:
-                            f.write(img_data)
-                    except Exception as e:
-                        self.logger.warning(f"Failed to download {img_url}: {e}")
-
-            harvested.append({
-                'date': date,
-                'title': item['title'],
-                'type': item.get('media_type', 'unknown')
-            })
-
-        # Update catalog
-        self.catalog['sources']['apod'] = {
-            'last_harvest': datetime.now().isoformat(),
-            'items_harvested': len(harvested),
-            'date_range': [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
-        }
-        self._save_catalog()
-
+        harvested = self.run_source(ApodSource(days))
         self.logger.info(f"APOD harvest complete: {len(harvested)} items")
         return harvested
 
@@ -154,87 +147,7 @@ class NASAHarvester:
     ) -> List[Dict]:
         """Harvest Mars rover photos"""
         self.logger.info(f"Harvesting {rover} photos")
-
-        output_dir = self.data_dir / "mars" / rover
-
-        params = {'api_key': self.api_key}
-        if sol:
-            params['sol'] = sol
-            output_dir = output_dir / f"sol_{sol}"
-        elif earth_date:
-            params['earth_date'] = earth_date
-            output_dir = output_dir / earth_date.replace('-', '')
-        else:
-            # Get latest sol from manifest
-            try:
-                manifest_response = requests.get(
-                    f'https://api.nasa.gov/mars-photos/api/v1/manifests/{rover}',
-                    params={'api_key': self.api_key},
-                    timeout=30
-                )
-                manifest_response.raise_for_status()
-                manifest = manifest_response.json()
-                latest_sol = manifest['photo_manifest']['max_sol']
-                self.logger.info(f"Latest sol for {rover}: {latest_sol}")
-            except Exception as e:
-                # Fallback to known recent sols if manifest fails
-                self.logger.warning(f"Manifest fetch failed: {e}. Using fallback sol.")
-                fallback_sols = {
-                    'curiosity': 4100,
-                    'perseverance': 1000,
-                    'opportunity': 5111,
-                    'spirit': 2208
-                }
-                latest_sol = fallback_sols.get(rover, 1000)
-            params['sol'] = latest_sol
-            output_dir = output_dir / f"sol_{latest_sol}"
-
-        if camera:
-            params['camera'] = camera
-
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        response = requests.get(
-            f'https://api.nasa.gov/mars-photos/api/v1/rovers/{rover}/photos',
-            params=params,
-            timeout=30
-        )
-        response.raise_for_status()
-        photos = response.json()['photos'][:limit]
-
-        harvested = []
-        for photo in photos:
-            img_url = photo['img_src']
-            filename = img_url.split('/')[-1]
-            img_file = output_dir / filename
-
-            if not img_file.exists():
-                self.logger.info(f"Downloading: {filename}")
-                try:
-                    img_data = requests.get(img_url, timeout=60).content
-                    with open(img_file, 'wb') as f:
-                        f.write(img_data)
-                except Exception as e:
-                    self.logger.warning(f"Failed to download {img_url}: {e}")
-
-            # Save metadata
-            meta_file = output_dir / f"{photo['id']}.json"
-            with open(meta_file, 'w') as f:
-                json.dump(photo, f, indent=2)
-
-            harvested.append({
-                'id': photo['id'],
-                'camera': photo['camera']['name'],
-                'sol': photo['sol'],
-                'earth_date': photo['earth_date']
-            })
-
-        self.catalog['sources'][f'mars_{rover}'] = {
-            'last_harvest': datetime.now().isoformat(),
-            'items_harvested': len(harvested)
-        }
-        self._save_catalog()
-
+        harvested = self.run_source(MarsRoverSource(rover, sol, earth_date, camera, limit))
         self.logger.info(f"Mars {rover} harvest complete: {len(harvested)} photos")
         return harvested
 
@@ -243,60 +156,7 @@ class NASAHarvester:
     def harvest_neo(self, days: int = 7) -> Dict:
         """Harvest Near Earth Object data"""
         self.logger.info(f"Harvesting NEO data for {days} days")
-
-        output_dir = self.data_dir / "neo" / "weekly"
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-
-        response = requests.get(
-            'https://api.nasa.gov/neo/rest/v1/feed',
-            params={
-                'start_date': start_date.strftime('%Y-%m-%d'),
-                'end_date': end_date.strftime('%Y-%m-%d'),
-                'api_key': self.api_key
-            },
-            timeout=30
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        # Save weekly digest
-        week = end_date.strftime('%Y-W%W')
-        output_file = output_dir / f"{week}.json"
-        with open(output_file, 'w') as f:
-            json.dump(data, f, indent=2)
-
-        # Extract stats
-        stats = {
-            'total_count': data['element_count'],
-            'potentially_hazardous': 0,
-            'closest_approach': None
-        }
-
-        closest_distance = float('inf')
-        for date, asteroids in data['near_earth_objects'].items():
-            for ast in asteroids:
-                if ast['is_potentially_hazardous_asteroid']:
-                    stats['potentially_hazardous'] += 1
-
-                for approach in ast['close_approach_data']:
-                    dist = float(approach['miss_distance']['kilometers'])
-                    if dist < closest_distance:
-                        closest_distance = dist
-                        stats['closest_approach'] = {
-                            'name': ast['name'],
-                            'distance_km': dist,
-                            'date': approach['close_approach_date']
-                        }
-
-        self.catalog['sources']['neo'] = {
-            'last_harvest': datetime.now().isoformat(),
-            'stats': stats
-        }
-        self._save_catalog()
-
+        stats = self.run_source(NeoSource(days))
         self.logger.info(f"NEO harvest complete: {stats['total_count']} objects")
         return stats
 
@@ -310,45 +170,66 @@ class NASAHarvester:
         end: str,
         location_name: str = None
     ) -> Dict:
-        """Harvest NASA POWER climate data"""
+        """Harvest NASA POWER climate data.
+
+        Returns a summary with the raw JSON path, the extracted
+        (parameter, date, value) CSV and per-parameter record counts;
+        a failed request raises (e.g. requests.HTTPError).
+        """
         self.logger.info(f"Harvesting POWER data for ({lat}, {lon})")
+        source = PowerSource(lat, lon, start, end, location_name)
+        summary = self.run_source(source)
+        self.logger.info(f"POWER harvest complete for {source.location_name}")
+        return summary
 
-        if not location_name:
-            location_name = f"{lat}_{lon}"
-
-        output_dir = self.data_dir / "power" / location_name
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        response = requests.get(
-            "https://power.larc.nasa.gov/api/temporal/daily/point",
-            params={
-                "start": start.replace('-', ''),
-                "end": end.replace('-', ''),
-                "latitude": lat,
-                "longitude": lon,
-                "community": "RE",
-                "parameters": "T2M,T2M_MAX,T2M_MIN,PRECTOTCORR,ALLSKY_SFC_SW_DWN,WS2M,RH2M",
-                "format": "JSON"
-            },
-            timeout=60
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        # Save data
-        output_file = output_dir / f"{start}_{end}.json"
-        with open(output_file, 'w') as f:
-            json.dump(data, f, indent=2)
-
-        self.catalog['sources'][f'power_{location_name}'] = {
-            'last_harvest': datetime.now().isoformat(),
-            'location': {'lat': lat, 'lon': lon},
-            'temporal': [start, end]
-        }
-        self._save_catalog()
+    # ===== Earthdata CMR / DEM Tiles =====
 
-        self.logger.info(f"POWER harvest complete for {location_name}")
-        return data
+    def search_cmr_granules(
+        self,
+        aoi,
+        collection: str = 'nasadem',
+        temporal: Optional[str] = None,
+        cmr_url: Optional[str] = None
+    ) -> List[Dict]:
+        """Search CMR for granules of a collection intersecting the AOI"""
+        session = EarthdataSession(self.earthdata_token)
+        return search_cmr_granules(session, cmr_url or self.CMR_URL,
+                                   self.CMR_COLLECTIONS[collection],
+                                   load_aoi(aoi), temporal)
+
+    def harvest_dem_tiles(
+        self,
+        aoi,
+        collection: str = 'nasadem',
+        temporal: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        cmr_url: Optional[str] = None
+    ) -> List[Dict]:
+        """Harvest CMR granules for an AOI, clipped and cached as COGs"""
+        source = CmrGranuleSource(aoi, collection, cmr_url or self.CMR_URL, temporal)
+        self.logger.info(f"Harvesting {collection} granules for AOI {source.aoi_key}")
+        harvested = self.run_source(source, workers=max_workers)
+        self.logger.info(f"{collection} harvest complete: {len(harvested)} files")
+        return harvested
+
+    # ===== GIBS WMTS Imagery Time Series =====
+
+    def harvest_gibs_imagery(
+        self,
+        bbox: Sequence[float],
+        dates: Sequence,
+        layer: str = 'MODIS_Terra_CorrectedReflectance_TrueColor',
+        level: Optional[int] = None,
+        max_workers: int = 8,
+        gibs_url: Optional[str] = None
+    ) -> List[Dict]:
+        """Harvest GIBS WMTS tiles for a bbox and mosaic one GeoTIFF per date"""
+        source = GibsImagerySource(bbox, dates, layer, gibs_url or self.GIBS_URL, level)
+        harvested = self.run_source(source, workers=max_workers)
+        self.logger.info(f"GIBS harvest complete: {len(harvested)} new mosaics, "
+                         f"{len(source.incomplete)} incomplete, "
+                         f"{len(source.dates) - len(source.pending)} dates already cached")
+        return harvested
 
     # ===== Full Harvest =====
 
@@ -390,10 +271,19 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description='NASA Data Harvester')
-    parser.add_argument('--source', choices=['apod', 'mars', 'neo', 'power', 'all'],
+    parser.add_argument('--source', choices=['apod', 'mars', 'neo', 'power', 'dem', 'gibs', 'all'],
                         default='all', help='Data source to harvest')
     parser.add_argument('--days', type=int, default=7, help='Number of days to harvest')
     parser.add_argument('--output', type=str, default=None, help='Output directory')
+    parser.add_argument('--aoi', type=str, default=None,
+                        help='AOI vector file for DEM harvest (e.g. All_Planting_Zones.shp)')
+    parser.add_argument('--collection', choices=sorted(NASAHarvester.CMR_COLLECTIONS),
+                        default='nasadem', help='CMR collection for DEM harvest')
+    parser.add_argument('--bbox', type=float, nargs=4, default=None,
+                        metavar=('MINX', 'MINY', 'MAXX', 'MAXY'),
+                        help='WGS84 bounding box for GIBS imagery')
+    parser.add_argument('--dates', type=str, nargs='+', default=None,
+                        help='Imagery dates (YYYY-MM-DD) for GIBS harvest')
 
     args = parser.parse_args()
 
@@ -407,6 +297,14 @@ if __name__ == "__main__":
         results = harvester.harvest_mars_rover()
     elif args.source == 'neo':
         results = harvester.harvest_neo(days=args.days)
+    elif args.source == 'dem':
+        if not args.aoi:
+            parser.error('--aoi is required for --source dem')
+        results = harvester.harvest_dem_tiles(args.aoi, collection=args.collection)
+    elif args.source == 'gibs':
+        if not args.bbox or not args.dates:
+            parser.error('--bbox and --dates are required for --source gibs')
+        results = harvester.harvest_gibs_imagery(args.bbox, args.dates)
 
     print("\n" + "=" * 50)
     print("HARVEST COMPLETE")
@@ -0,0 +1,795 @@
+"""
+NASA Harvest Sources
+Pipeline plugins for every NASAHarvester data source
+
+Each source only describes its own work items and file layout; fetching,
+caching, concurrency, metrics and resume come from harvest_pipeline.
+"""
+
+import re
+import csv
+import json
+import hashlib
+import zipfile
+import requests
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, List, Dict, Sequence, Tuple
+from urllib.parse import urlparse
+
+from harvest_pipeline import HarvestSource, WorkItem
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+class EarthdataSession(requests.Session):
+    """requests Session that keeps the bearer token across Earthdata redirects.
+
+    Data downloads bounce through urs.earthdata.nasa.gov; requests normally
+    strips the Authorization header when a redirect changes host.
+    """
+
+    TRUSTED_DOMAINS = ('earthdata.nasa.gov', 'earthdatacloud.nasa.gov')
+
+    def __init__(self, token: Optional[str] = None):
+        super().__init__()
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+
+    def rebuild_auth(self, prepared_request, response):
+        host = urlparse(prepared_request.url).hostname or ''
+        if 'Authorization' in self.headers and host.endswith(self.TRUSTED_DOMAINS):
+            prepared_request.headers['Authorization'] = self.headers['Authorization']
+            return
+        super().rebuild_auth(prepared_request, response)
+
+
+def _write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def iter_json_kvitems(f, prefix: str):
+    """Yield (key, value) pairs of the object at ``prefix`` in a JSON stream.
+
+    Uses ijson's incremental parser so only one value is in memory at a
+    time; without ijson the file is loaded once with json.load.
+    """
+    if ijson is not None:
+        yield from ijson.kvitems(f, prefix, use_float=True)
+        return
+    obj = json.load(f)
+    for part in prefix.split('.'):
+        obj = obj.get(part, {})
+    yield from obj.items()
+
+
+def _existing(path: Optional[Path]) -> Optional[str]:
+    return str(path) if path is not None and path.exists() else None
+
+
+# ===== APOD =====
+
+class ApodSource(HarvestSource):
+    """Astronomy Picture of the Day metadata and images"""
+
+    name = 'apod'
+
+    def __init__(self, days: int = 7):
+        self.end_date = datetime.now()
+        self.start_date = self.end_date - timedelta(days=days)
+
+    def run_key(self) -> str:
+        return f"apod:{self.start_date:%Y-%m-%d}:{self.end_date:%Y-%m-%d}"
+
+    def discover(self, harvester, session):
+        output_dir = harvester.data_dir / "apod"
+        response = session.get(
+            'https://api.nasa.gov/planetary/apod',
+            params={
+                'api_key': harvester.api_key,
+                'start_date': self.start_date.strftime('%Y-%m-%d'),
+                'end_date': self.end_date.strftime('%Y-%m-%d'),
+                'thumbs': True
+            },
+            timeout=30
+        )
+        response.raise_for_status()
+
+        for entry in response.json():
+            date = entry['date']
+            year, month, _ = date.split('-')
+            dir_path = output_dir / year / month
+            item = WorkItem(key=date, meta=entry, meta_file=dir_path / f"{date}.json")
+
+            if entry.get('media_type') == 'image':
+                img_url = entry.get('hdurl') or entry['url']
+                ext = img_url.split('.')[-1].split('?')[0]
+                item.url = img_url
+                item.target = dir_path / f"{date}.{ext}"
+            yield item
+
+    def fetch(self, harvester, session, item):
+        # A missing image must not lose the metadata record
+        try:
+            size = super().fetch(harvester, session, item)
+        except Exception as e:
+            harvester.logger.warning(f"Failed to download {item.url}: {e}")
+            return 0
+        if size:
+            harvester.logger.info(f"Downloaded: {item.meta['title']}")
+        return size
+
+    def persist(self, harvester, item):
+        _write_json(item.meta_file, item.meta)
+
+    def summarize(self, item):
+        return {
+            'date': item.meta['date'],
+            'title': item.meta['title'],
+            'type': item.meta.get('media_type', 'unknown'),
+            'file': _existing(item.target)
+        }
+
+    def finish(self, harvester, results):
+        self.images = harvester.derive_images(r.get('file') for r in results)
+
+    def catalog_entry(self, results):
+        return {
+            'items_harvested': len(results),
+            'date_range': [self.start_date.strftime('%Y-%m-%d'),
+                           self.end_date.strftime('%Y-%m-%d')],
+            'images': self.images
+        }
+
+    def output(self, results):
+        return sorted(results, key=lambda r: r['date'])
+
+
+# ===== Mars Rover =====
+
+class MarsRoverSource(HarvestSource):
+    """Mars rover photos for a sol or earth date (latest sol by default)"""
+
+    FALLBACK_SOLS = {
+        'curiosity': 4100,
+        'perseverance': 1000,
+        'opportunity': 5111,
+        'spirit': 2208
+    }
+
+    def __init__(
+        self,
+        rover: str = "curiosity",
+        sol: Optional[int] = None,
+        earth_date: Optional[str] = None,
+        camera: Optional[str] = None,
+        limit: int = 25
+    ):
+        self.rover = rover
+        self.sol = sol
+        self.earth_date = earth_date
+        self.camera = camera
+        self.limit = limit
+        self.name = f"mars_{rover}"
+
+    def run_key(self) -> str:
+        return f"{self.name}:{self.sol}:{self.earth_date}:{self.camera}:{self.limit}"
+
+    def _latest_sol(self, harvester, session) -> int:
+        try:
+            response = session.get(
+                f'https://api.nasa.gov/mars-photos/api/v1/manifests/{self.rover}',
+                params={'api_key': harvester.api_key},
+                timeout=30
+            )
+            response.raise_for_status()
+            latest_sol = response.json()['photo_manifest']['max_sol']
+            harvester.logger.info(f"Latest sol for {self.rover}: {latest_sol}")
+            return latest_sol
+        except Exception as e:
+            harvester.logger.warning(f"Manifest fetch failed: {e}. Using fallback sol.")
+            return self.FALLBACK_SOLS.get(self.rover, 1000)
+
+    def discover(self, harvester, session):
+        output_dir = harvester.data_dir / "mars" / self.rover
+        params = {'api_key': harvester.api_key}
+        if self.sol:
+            params['sol'] = self.sol
+            output_dir = output_dir / f"sol_{self.sol}"
+        elif self.earth_date:
+            params['earth_date'] = self.earth_date
+            output_dir = output_dir / self.earth_date.replace('-', '')
+        else:
+            latest_sol = self._latest_sol(harvester, session)
+            params['sol'] = latest_sol
+            output_dir = output_dir / f"sol_{latest_sol}"
+        if self.camera:
+            params['camera'] = self.camera
+
+        response = session.get(
+            f'https://api.nasa.gov/mars-photos/api/v1/rovers/{self.rover}/photos',
+            params=params,
+            timeout=30
+        )
+        response.raise_for_status()
+
+        for photo in response.json()['photos'][:self.limit]:
+            img_url = photo['img_src']
+            yield WorkItem(key=str(photo['id']), url=img_url, meta=photo,
+                           target=output_dir / img_url.split('/')[-1],
+                           meta_file=output_dir / f"{photo['id']}.json")
+
+    def fetch(self, harvester, session, item):
+        try:
+            return super().fetch(harvester, session, item)
+        except Exception as e:
+            harvester.logger.warning(f"Failed to download {item.url}: {e}")
+            return 0
+
+    def persist(self, harvester, item):
+        _write_json(item.meta_file, item.meta)
+
+    def summarize(self, item):
+        photo = item.meta
+        return {
+            'id': photo['id'],
+            'camera': photo['camera']['name'],
+            'sol': photo['sol'],
+            'earth_date': photo['earth_date'],
+            'file': _existing(item.target)
+        }
+
+    def finish(self, harvester, results):
+        self.images = harvester.derive_images(r.get('file') for r in results)
+
+    def catalog_entry(self, results):
+        return {'items_harvested': len(results), 'images': self.images}
+
+
+# ===== NEO =====
+
+class NeoSource(HarvestSource):
+    """Near Earth Object feed, saved as weekly digests.
+
+    The feed API serves at most 7 days per request, so longer windows are
+    split into chunks, each saved as <start>_<end>.json. Each response streams to disk as-is and is then
+    scanned incrementally; the full feed is never held in memory.
+    """
+
+    name = 'neo'
+    fetch_timeout = 30
+    MAX_SPAN_DAYS = 7
+
+    def __init__(self, days: int = 7):
+        self.end_date = datetime.now()
+        self.start_date = self.end_date - timedelta(days=days)
+
+    def run_key(self) -> str:
+        return f"neo:{self.start_date:%Y-%m-%d}:{self.end_date:%Y-%m-%d}"
+
+    def discover(self, harvester, session):
+        chunk_end = self.end_date
+        while chunk_end >= self.start_date:
+            chunk_start = max(self.start_date, chunk_end - timedelta(days=self.MAX_SPAN_DAYS))
+            # Keyed on the whole range: chunks ending in the same week can
+            # start on different days and must not share a file
+            span = f"{chunk_start:%Y-%m-%d}_{chunk_end:%Y-%m-%d}"
+            yield WorkItem(
+                key=span,
+                url='https://api.nasa.gov/neo/rest/v1/feed',
+                params={
+                    'start_date': chunk_start.strftime('%Y-%m-%d'),
+                    'end_date': chunk_end.strftime('%Y-%m-%d'),
+                    'api_key': harvester.api_key
+                },
+                target=harvester.data_dir / "neo" / "weekly" / f"{span}.json",
+                meta={'end_date': chunk_end.date()}
+            )
+            chunk_end = chunk_start - timedelta(days=1)
+
+    def fetch(self, harvester, session, item):
+        # Windows reaching today are still filling in; past weeks are final
+        if item.meta['end_date'] >= datetime.now().date():
+            item.target.unlink(missing_ok=True)
+        return super().fetch(harvester, session, item)
+
+    def parse(self, harvester, item):
+        stats = {
+            'total_count': 0,
+            'potentially_hazardous': 0,
+            'closest_approach': None
+        }
+
+        closest_distance = float('inf')
+        with open(item.target, 'rb') as f:
+            for date, asteroids in iter_json_kvitems(f, 'near_earth_objects'):
+                for ast in asteroids:
+                    stats['total_count'] += 1
+                    if ast['is_potentially_hazardous_asteroid']:
+                        stats['potentially_hazardous'] += 1
+
+                    for approach in ast['close_approach_data']:
+                        dist = float(approach['miss_distance']['kilometers'])
+                        if dist < closest_distance:
+                            closest_distance = dist
+                            stats['closest_approach'] = {
+                                'name': ast['name'],
+                                'distance_km': dist,
+                                'date': approach['close_approach_date']
+                            }
+        item.result = stats
+
+    def _combined(self, results) -> Dict:
+        approaches = [r['closest_approach'] for r in results if r['closest_approach']]
+        return {
+            'total_count': sum(r['total_count'] for r in results),
+            'potentially_hazardous': sum(r['potentially_hazardous'] for r in results),
+            'closest_approach': min(approaches, key=lambda a: a['distance_km'], default=None)
+        }
+
+    def catalog_entry(self, results):
+        return {'stats': self._combined(results)}
+
+    def output(self, results):
+        return self._combined(results)
+
+
+# ===== POWER Climate =====
+
+class PowerSource(HarvestSource):
+    """NASA POWER daily point climate data.
+
+    The raw JSON response streams straight to disk; daily values are then
+    extracted one parameter at a time into a long-format CSV
+    (parameter, date, value) alongside it.
+    """
+
+    PARAMETERS = "T2M,T2M_MAX,T2M_MIN,PRECTOTCORR,ALLSKY_SFC_SW_DWN,WS2M,RH2M"
+    MISSING = -999
+
+    def __init__(self, lat: float, lon: float, start: str, end: str,
+                 location_name: Optional[str] = None):
+        self.lat = lat
+        self.lon = lon
+        self.start = start
+        self.end = end
+        self.location_name = location_name or f"{lat}_{lon}"
+        self.name = f"power_{self.location_name}"
+
+    def run_key(self) -> str:
+        return f"{self.name}:{self.start}:{self.end}"
+
+    def discover(self, harvester, session):
+        output_dir = harvester.data_dir / "power" / self.location_name
+        yield WorkItem(
+            key=f"{self.start}_{self.end}",
+            url="https://power.larc.nasa.gov/api/temporal/daily/point",
+            params={
+                "start": self.start.replace('-', ''),
+                "end": self.end.replace('-', ''),
+                "latitude": self.lat,
+                "longitude": self.lon,
+                "community": "RE",
+                "parameters": self.PARAMETERS,
+                "format": "JSON"
+            },
+            target=output_dir / f"{self.start}_{self.end}.json",
+            meta_file=output_dir / f"{self.start}_{self.end}.csv"
+        )
+
+    def persist(self, harvester, item):
+        counts = {}
+        partial = item.meta_file.with_name(item.meta_file.name + '.part')
+        with open(item.target, 'rb') as f, open(partial, 'w', newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(['parameter', 'date', 'value'])
+            for parameter, series in iter_json_kvitems(f, 'properties.parameter'):
+                n = 0
+                for date, value in series.items():
+                    value = float(value)
+                    writer.writerow([parameter, date, '' if value == self.MISSING else value])
+                    n += 1
+                counts[parameter] = n
+        partial.replace(item.meta_file)
+        item.result = {
+            'file': str(item.target),
+            'records_file': str(item.meta_file),
+            'parameters': counts,
+            'records': sum(counts.values())
+        }
+
+    def catalog_entry(self, results):
+        return {
+            'location': {'lat': self.lat, 'lon': self.lon},
+            'temporal': [self.start, self.end],
+            'records': results[0]['records'] if results else 0
+        }
+
+    def output(self, results):
+        return results[0] if results else None
+
+
+# ===== Earthdata CMR Granules =====
+
+def load_aoi(aoi):
+    """Return the AOI as a single WGS84 shapely geometry.
+
+    Accepts a shapely geometry or a path to any vector file readable by
+    geopandas (e.g. All_Planting_Zones.shp), which is dissolved to one
+    geometry.
+    """
+    from shapely.ops import unary_union
+
+    if isinstance(aoi, (str, Path)):
+        import geopandas as gpd
+        gdf = gpd.read_file(aoi)
+        if gdf.crs is not None:
+            gdf = gdf.to_crs(epsg=4326)
+        return unary_union(gdf.geometry)
+    return aoi
+
+
+def _granule_footprint(entry: Dict):
+    """Build a granule footprint from CMR 'boxes' or 'polygons' (lat/lon order)"""
+    from shapely.geometry import shape, box
+
+    if entry.get('boxes'):
+        south, west, north, east = map(float, entry['boxes'][0].split())
+        return box(west, south, east, north)
+    if entry.get('polygons'):
+        values = list(map(float, entry['polygons'][0][0].split()))
+        coords = [[lon, lat] for lat, lon in zip(values[::2], values[1::2])]
+        return shape({'type': 'Polygon', 'coordinates': [coords]})
+    return None
+
+
+def search_cmr_granules(session: requests.Session, cmr_url: str, spec: Dict,
+                        aoi, temporal: Optional[str] = None) -> List[Dict]:
+    """Search CMR for granules of a collection intersecting the AOI"""
+    from shapely.geometry.polygon import orient
+
+    # CMR wants a simple counter-clockwise ring; the hull of the AOI is
+    # enough for the search, granules are re-checked against the AOI below.
+    hull = orient(aoi.convex_hull.buffer(1e-6, join_style=2), sign=1.0)
+    ring = ','.join(f"{x:.6f},{y:.6f}" for x, y in hull.exterior.coords)
+
+    params = {
+        'short_name': spec['short_name'],
+        'version': spec['version'],
+        'polygon': ring,
+        'page_size': 500
+    }
+    if temporal:
+        params['temporal'] = temporal
+
+    granules = []
+    headers = {}
+    while True:
+        response = session.get(f"{cmr_url.rstrip('/')}/granules.json", params=params,
+                               headers=headers, timeout=60)
+        response.raise_for_status()
+        entries = response.json()['feed']['entry']
+
+        for entry in entries:
+            footprint = _granule_footprint(entry)
+            if footprint is not None and not footprint.intersects(aoi):
+                continue
+            urls = [
+                link['href'] for link in entry.get('links', [])
+                if link.get('rel', '').endswith('/data#')
+                and not link.get('inherited')
+                and re.search(spec['assets'], link['href'])
+            ]
+            granules.append({
+                'id': entry['id'],
+                'title': entry.get('title', entry['id']),
+                'urls': urls
+            })
+
+        search_after = response.headers.get('CMR-Search-After')
+        if not entries or not search_after:
+            break
+        headers['CMR-Search-After'] = search_after
+
+    return granules
+
+
+def clip_to_cog(source: Path, aoi, target: Path) -> Optional[Path]:
+    """Clip a downloaded raster to the AOI and write it as a COG"""
+    import rasterio
+    import rasterio.mask
+    import rasterio.shutil
+    from rasterio.io import MemoryFile
+    from rasterio.warp import transform_geom
+    from shapely.geometry import mapping
+
+    if target.exists():
+        return target
+
+    path = str(source)
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            members = [n for n in zf.namelist()
+                       if n.lower().endswith(('.hgt', '.tif', '.tiff'))]
+        if not members:
+            return None
+        path = f"/vsizip/{source}/{members[0]}"
+
+    with rasterio.open(path) as src:
+        geom = mapping(aoi)
+        if src.crs and src.crs.to_epsg() != 4326:
+            geom = transform_geom('EPSG:4326', src.crs, geom)
+        try:
+            data, transform = rasterio.mask.mask(src, [geom], crop=True)
+        except ValueError:
+            # AOI only touches the granule footprint, not its pixels
+            return None
+        profile = src.profile.copy()
+
+    profile.update(driver='GTiff', height=data.shape[1], width=data.shape[2],
+                   transform=transform)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as tmp:
+            tmp.write(data)
+            rasterio.shutil.copy(tmp, str(target), driver='COG',
+                                 compress='DEFLATE', overview_resampling='average')
+    return target
+
+
+class CmrGranuleSource(HarvestSource):
+    """CMR granules for a polygon AOI, clipped and cached as COGs"""
+
+    # 'assets' picks the granule data links worth downloading
+    COLLECTIONS = {
+        'nasadem': {'short_name': 'NASADEM_HGT', 'version': '001',
+                    'assets': r'\.zip$'},
+        'srtm': {'short_name': 'SRTMGL1', 'version': '003',
+                 'assets': r'\.hgt\.zip$'},
+        'hls': {'short_name': 'HLSS30', 'version': '2.0',
+                'assets': r'\.(B02|B03|B04|B8A|Fmask)\.tif$'},
+    }
+    fetch_timeout = 300
+
+    def __init__(self, aoi, collection: str, cmr_url: str,
+                 temporal: Optional[str] = None):
+        if collection not in self.COLLECTIONS:
+            raise ValueError(f"Unknown collection '{collection}'. "
+                             f"Choose from {sorted(self.COLLECTIONS)}")
+        self.aoi = load_aoi(aoi)
+        self.aoi_key = hashlib.sha1(self.aoi.wkb).hexdigest()[:10]
+        self.collection = collection
+        self.cmr_url = cmr_url
+        self.temporal = temporal
+        self.granules_found = 0
+        self.cog_dir = None
+        self.name = f"dem_{collection}"
+
+    def run_key(self) -> str:
+        return f"{self.name}:{self.aoi_key}:{self.temporal}"
+
+    def session(self, harvester):
+        if not harvester.earthdata_token:
+            harvester.logger.warning("EARTHDATA_TOKEN not set; protected downloads will fail")
+        return EarthdataSession(harvester.earthdata_token)
+
+    def _dirs(self, harvester) -> Tuple[Path, Path]:
+        base = harvester.data_dir / "dem" / self.collection
+        return base / "raw", base / "cog" / self.aoi_key
+
+    def discover(self, harvester, session):
+        spec = self.COLLECTIONS[self.collection]
+        granules = search_cmr_granules(session, self.cmr_url, spec, self.aoi, self.temporal)
+        self.granules_found = len(granules)
+        harvester.logger.info(f"CMR {spec['short_name']}: {len(granules)} granules intersect AOI")
+
+        raw_dir, _ = self._dirs(harvester)
+        for granule in granules:
+            for url in granule['urls']:
+                filename = url.split('/')[-1].split('?')[0]
+                yield WorkItem(key=url, url=url, target=raw_dir / filename,
+                               meta={'granule': granule['id'], 'title': granule['title']})
+
+    def parse(self, harvester, item):
+        _, cog_dir = self._dirs(harvester)
+        stem = re.sub(r'(\.hgt)?\.(zip|tif|tiff)$', '', item.target.name)
+        cog_file = clip_to_cog(item.target, self.aoi, cog_dir / f"{stem}.tif")
+        item.result = {
+            **item.meta,
+            'raw': str(item.target),
+            'cog': str(cog_file) if cog_file else None
+        }
+
+    def finish(self, harvester, results):
+        self.cog_dir = self._dirs(harvester)[1]
+
+    def catalog_entry(self, results):
+        return {
+            'aoi': {'key': self.aoi_key, 'bounds': list(self.aoi.bounds)},
+            'granules_found': self.granules_found,
+            'items_harvested': len(results),
+            'cog_dir': str(self.cog_dir) if self.cog_dir else None
+        }
+
+    def output(self, results):
+        return sorted(results, key=lambda r: r['raw'])
+
+
+# ===== GIBS WMTS Imagery =====
+
+class GibsImagerySource(HarvestSource):
+    """GIBS WMTS tiles for a bbox, mosaicked into one GeoTIFF per date.
+
+    A date is only mosaicked once every tile is accounted for (cached,
+    downloaded or 404 outside the layer's coverage). Dates with a failed
+    tile get no mosaic and stay pending, so the next run fetches just the
+    missing tiles.
+    """
+
+    # layer -> (TileMatrixSet, deepest TileMatrix, tile format)
+    LAYERS = {
+        'MODIS_Terra_CorrectedReflectance_TrueColor': ('250m', 8, 'jpg'),
+        'MODIS_Aqua_CorrectedReflectance_TrueColor': ('250m', 8, 'jpg'),
+        'VIIRS_SNPP_CorrectedReflectance_TrueColor': ('250m', 8, 'jpg'),
+        'HLS_S30_Nadir_BRDF_Adjusted_Reflectance': ('31.25m', 11, 'png'),
+        'HLS_L30_Nadir_BRDF_Adjusted_Reflectance': ('31.25m', 11, 'png'),
+    }
+    TILE_SIZE = 512
+
+    def __init__(self, bbox: Sequence[float], dates: Sequence, layer: str,
+                 gibs_url: str, level: Optional[int] = None):
+        if layer not in self.LAYERS:
+            raise ValueError(f"Unknown GIBS layer '{layer}'. "
+                             f"Choose from {sorted(self.LAYERS)}")
+        self.matrix_set, max_level, self.ext = self.LAYERS[layer]
+        self.level = max_level if level is None else min(level, max_level)
+        self.bbox = tuple(bbox)
+        self.dates = sorted({d if isinstance(d, str) else d.strftime('%Y-%m-%d')
+                             for d in dates})
+        self.layer = layer
+        self.gibs_url = gibs_url.rstrip('/')
+        self.bbox_key = '_'.join(f"{v:.4f}" for v in self.bbox)
+        self.span, self.rows, self.cols = self.tile_range(self.bbox, self.level)
+        self.name = f"gibs_{layer}"
+        self.mosaics = []
+        self.incomplete = []
+
+    @staticmethod
+    def tile_range(bbox: Sequence[float], level: int) -> Tuple[float, range, range]:
+        """Tile span (degrees) and row/col ranges covering a bbox.
+
+        GIBS EPSG:4326 matrices start at (-180, 90) and tile level 0 spans
+        288 degrees; every level halves it.
+        """
+        span = 288.0 / 2 ** level
+        minx, miny, maxx, maxy = bbox
+        eps = 1e-9
+        cols = range(int((minx + 180) // span), int((maxx - eps + 180) // span) + 1)
+        rows = range(int((90 - maxy) // span), int((90 - miny - eps) // span) + 1)
+        return span, rows, cols
+
+    def run_key(self) -> str:
+        return f"{self.name}:{self.level}:{self.bbox_key}:{','.join(self.dates)}"
+
+    def _tile_path(self, harvester, date, row, col) -> Path:
+        return (harvester.data_dir / "gibs" / self.layer / "tiles" / date /
+                str(self.level) / str(row) / f"{col}.{self.ext}")
+
+    def _mosaic_dir(self, harvester) -> Path:
+        return harvester.data_dir / "gibs" / self.layer / "mosaics" / self.bbox_key
+
+    def discover(self, harvester, session):
+        mosaic_dir = self._mosaic_dir(harvester)
+        self.previous = harvester.catalog['sources'].get(self.name, {}).get('mosaics', {})
+        # Mosaics are only written complete, so dates without one need work;
+        # cached tiles are never re-fetched
+        self.pending = [d for d in self.dates if not (mosaic_dir / f"{d}.tif").exists()]
+        harvester.logger.info(
+            f"GIBS {self.layer}: {len(self.pending)} new dates "
+            f"({len(self.rows) * len(self.cols)} tiles/date at level {self.level})"
+        )
+        for date in self.pending:
+            for row in self.rows:
+                for col in self.cols:
+                    url = (f"{self.gibs_url}/{self.layer}/default/{date}/"
+                           f"{self.matrix_set}/{self.level}/{row}/{col}.{self.ext}")
+                    yield WorkItem(key=f"{date}/{row}/{col}", url=url,
+                                   target=self._tile_path(harvester, date, row, col),
+                                   meta={'date': date})
+
+    def fetch(self, harvester, session, item):
+        if item.target.exists():
+            item.cached = True
+            return 0
+        response = session.get(item.url, timeout=self.fetch_timeout)
+        if response.status_code == 404:
+            # Outside the layer's coverage for that day; mosaic leaves it blank
+            item.meta['missing'] = True
+            return 0
+        response.raise_for_status()
+        item.target.parent.mkdir(parents=True, exist_ok=True)
+        # A run killed mid-write must not leave a truncated tile that looks cached
+        partial = item.target.with_name(item.target.name + '.part')
+        partial.write_bytes(response.content)
+        partial.replace(item.target)
+        return len(response.content)
+
+    def summarize(self, item):
+        missing = item.meta.get('missing', False)
+        return {'date': item.meta['date'], 'fetched': not (item.cached or missing),
+                'missing': missing}
+
+    def finish(self, harvester, results):
+        import warnings
+        import numpy as np
+        import rasterio
+        from rasterio.errors import NotGeoreferencedWarning
+        from rasterio.io import MemoryFile
+        from rasterio.transform import from_origin
+        from rasterio.windows import from_bounds
+
+        size = self.TILE_SIZE
+        transform = from_origin(-180 + self.cols.start * self.span,
+                                90 - self.rows.start * self.span,
+                                self.span / size, self.span / size)
+        window = from_bounds(*self.bbox, transform=transform).round_offsets().round_lengths()
+        mosaic_dir = self._mosaic_dir(harvester)
+        mosaic_dir.mkdir(parents=True, exist_ok=True)
+
+        # Failed tiles have no result; their dates must not be mosaicked
+        fetched = {d: 0 for d in self.pending}
+        accounted = {d: 0 for d in self.pending}
+        for r in results:
+            if r['date'] in fetched:
+                accounted[r['date']] += 1
+                fetched[r['date']] += bool(r.get('fetched'))
+        tiles_per_date = len(self.rows) * len(self.cols)
+        self.incomplete = [d for d in self.pending if accounted[d] < tiles_per_date]
+        for date in self.incomplete:
+            harvester.logger.warning(
+                f"GIBS {self.layer} {date}: {tiles_per_date - accounted[date]} of "
+                f"{tiles_per_date} tiles failed; no mosaic until they are fetched")
+
+        for date in self.pending:
+            if date in self.incomplete:
+                continue
+            mosaic = np.zeros((3, len(self.rows) * size, len(self.cols) * size), dtype=np.uint8)
+            for i, row in enumerate(self.rows):
+                for j, col in enumerate(self.cols):
+                    path = self._tile_path(harvester, date, row, col)
+                    if not path.exists():
+                        continue
+                    # WMTS tiles carry no georeferencing; placement comes from row/col
+                    with warnings.catch_warnings():
+                        warnings.simplefilter('ignore', NotGeoreferencedWarning)
+                        with MemoryFile(path.read_bytes()) as memfile, memfile.open() as tile:
+                            block = tile.read([1, 2, 3])
+                    mosaic[:, i * size:(i + 1) * size, j * size:(j + 1) * size] = block
+
+            r0, c0 = window.row_off, window.col_off
+            clipped = mosaic[:, r0:r0 + window.height, c0:c0 + window.width]
+            out_file = mosaic_dir / f"{date}.tif"
+            with rasterio.open(
+                out_file, 'w', driver='GTiff', height=clipped.shape[1], width=clipped.shape[2],
+                count=3, dtype='uint8', crs='EPSG:4326', photometric='RGB',
+                transform=rasterio.windows.transform(window, transform),
+                tiled=True, compress='DEFLATE'
+            ) as dst:
+                dst.write(clipped)
+
+            self.mosaics.append({'date': date, 'mosaic': str(out_file),
+                                 'tiles_fetched': fetched[date]})
+
+    def catalog_entry(self, results):
+        mosaics = dict(self.previous)
+        complete = set(self.dates) - set(self.incomplete)
+        mosaics[self.bbox_key] = sorted(set(mosaics.get(self.bbox_key, [])) | complete)
+        return {'level': self.level, 'mosaics': mosaics}
+
+    def output(self, results):
+        return self.mosaics
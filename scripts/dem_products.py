@@ -0,0 +1,224 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Persistent DEM Products
+
+Interpolated survey surfaces written once as georeferenced products:
+
+  <name>.tif   Cloud-Optimized GeoTIFF (256 px tiles, DEFLATE with a
+               floating-point predictor, averaged overviews, NaN nodata)
+               for the report, the ESRI package and GIS users
+  <name>.npy   the same grid, north-up, for memory-mapped reuse in-process
+  <name>.json  grid spec, CRS, transform and the key of the computation
+               that produced it; an unchanged key skips the rewrite
+
+Surfaces too large for memory are streamed in with DemWriter one tile at
+a time and read back with iter_dem_tiles() (tiles with a halo for
+neighbourhood kernels). Readers open the COG lazily and read only the
+window they need; dem_preview() reads a plot-sized overview.
+
+Usage:
+    from dem_products import write_dem, read_dem_window, load_dem
+    write_dem(zi_grid_clipped, grid_spec, 'phase2_surface', source_key=...)
+    window, transform = read_dem_window('phase2_surface', site.bounds)
+    dem, meta = load_dem('phase2_surface')          # np.memmap, north-up
+    for tile, block in iter_dem_tiles('phase2_surface', halo=1): ...
+    X, Y, Z = dem_preview('phase2_surface', to_crs='EPSG:4326')
+"""
+
+import json
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from project_layers import transformer
+from raster_masks import Tile, node_transform, tile_windows
+
+# ── Paths ──
+BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
+DEM_DIR = BASE / "outputs" / "dem" / "8mm"
+
+COG_BLOCKSIZE = 256
+GDAL_CACHE_MB = 64       # bounds GDAL's block cache while streaming
+DEM_TILE = 1024          # cells per tile side for streamed reads
+
+
+def product_paths(name: str, out_dir: Path = None) -> Dict[str, Path]:
+    out_dir = Path(out_dir or DEM_DIR)
+    return {ext: out_dir / f"{name}.{ext}" for ext in ('tif', 'npy', 'json')}
+
+
+def _recorded_key(paths: Dict[str, Path]) -> Optional[str]:
+    if not all(p.exists() for p in paths.values()):
+        return None
+    with open(paths['json']) as f:
+        return json.load(f).get('source_key')
+
+
+class DemWriter:
+    """Stream a GridSpec-aligned surface to disk one tile at a time.
+
+    Blocks (row 0 = ymin, like SurveySurface.grid) go into a north-up
+    .npy memmap and a tiled scratch GeoTIFF; close() converts the
+    scratch file to the COG, so no step holds the whole grid in memory.
+    When ``source_key`` matches the key recorded with an existing
+    product, ``current`` is True and writes are skipped.
+    """
+
+    def __init__(self, spec, name: str, crs: str = 'EPSG:4326',
+                 source_key: Optional[str] = None, out_dir: Path = None):
+        self.spec = spec
+        self.name = name
+        self.crs = crs
+        self.source_key = source_key
+        self.paths = product_paths(name, out_dir)
+        self.current = bool(source_key) and _recorded_key(self.paths) == source_key
+        self._tmp_npy = self.paths['npy'].with_name(f"{name}.tmp.npy")
+        self._scratch = self.paths['tif'].with_name(f"{name}.scratch.tif")
+        self._npy = self._tif = None
+        if not self.current:
+            self._open()
+
+    def _open(self):
+        import rasterio
+        from rasterio.env import set_gdal_config
+
+        self.paths['tif'].parent.mkdir(parents=True, exist_ok=True)
+        self._npy = np.lib.format.open_memmap(self._tmp_npy, mode='w+', dtype='float32',
+                                              shape=(self.spec.ny, self.spec.nx))
+        self._npy[:] = np.nan
+        # Process-wide, so several writers can be open at once
+        set_gdal_config('GDAL_CACHEMAX', GDAL_CACHE_MB)
+        self._tif = rasterio.open(
+            self._scratch, 'w', driver='GTiff', height=self.spec.ny, width=self.spec.nx,
+            count=1, dtype='float32', crs=self.crs, transform=node_transform(self.spec),
+            nodata=np.nan, tiled=True, blockxsize=COG_BLOCKSIZE, blockysize=COG_BLOCKSIZE,
+            BIGTIFF='IF_SAFER')
+
+    def write(self, core: Tuple[int, int, int, int], block: np.ndarray):
+        """Write ``block`` into grid rows [row0, row1) x cols [col0, col1)"""
+        if self.current:
+            return
+        from rasterio.windows import Window
+
+        r0, r1, c0, c1 = core
+        north_up = np.ascontiguousarray(np.asarray(block, dtype='float32')[::-1])
+        top = self.spec.ny - r1
+        self._npy[top:top + (r1 - r0), c0:c1] = north_up
+        self._tif.write(north_up, 1, window=Window(c0, top, c1 - c0, r1 - r0))
+
+    def close(self) -> Path:
+        """Finish the COG, .npy and .json; returns the COG path"""
+        if self._tif is None:
+            return self.paths['tif']
+        import rasterio.shutil
+
+        self._tif.close()
+        self._npy.flush()
+        self._npy = self._tif = None
+        rasterio.shutil.copy(str(self._scratch), str(self.paths['tif']), driver='COG',
+                             blocksize=COG_BLOCKSIZE, compress='DEFLATE', predictor=3,
+                             overview_resampling='average', BIGTIFF='IF_SAFER')
+        self._scratch.unlink()
+        self._tmp_npy.replace(self.paths['npy'])
+        with open(self.paths['json'], 'w') as f:
+            json.dump({
+                'name': self.name, 'crs': self.crs, 'spec': asdict(self.spec),
+                'transform': list(node_transform(self.spec))[:6],
+                'shape': [self.spec.ny, self.spec.nx],
+                'orientation': 'north-up', 'source_key': self.source_key,
+            }, f, indent=2)
+        return self.paths['tif']
+
+    def abort(self):
+        """Drop a partial write, leaving any previous product in place"""
+        if self._tif is not None:
+            self._tif.close()
+            self._npy = self._tif = None
+            self._scratch.unlink(missing_ok=True)
+            self._tmp_npy.unlink(missing_ok=True)
+
+    def __enter__(self) -> 'DemWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_dem(grid: np.ndarray, spec, name: str, crs: str = 'EPSG:4326',
+              source_key: Optional[str] = None, out_dir: Path = None) -> Path:
+    """Write a GridSpec-aligned surface (row 0 = ymin) as COG + .npy.
+
+    When ``source_key`` matches the key recorded with an existing
+    product, nothing is rewritten. Returns the COG path.
+    """
+    with DemWriter(spec, name, crs, source_key, out_dir) as writer:
+        writer.write((0, spec.ny, 0, spec.nx), grid)
+    return writer.paths['tif']
+
+
+def load_dem(name: str, out_dir: Path = None) -> Tuple[np.memmap, Dict]:
+    """Memory-mapped north-up grid plus its metadata (no decoding, no copy)"""
+    paths = product_paths(name, out_dir)
+    with open(paths['json']) as f:
+        meta = json.load(f)
+    return np.load(paths['npy'], mmap_mode='r'), meta
+
+
+def read_dem_window(name: str, bounds: Sequence[float], out_dir: Path = None,
+                    overview_level: Optional[int] = None):
+    """Read only the (minx, miny, maxx, maxy) window of a DEM COG.
+
+    Returns (masked array, window transform). ``overview_level`` reads
+    from a reduced-resolution overview instead of full resolution.
+    """
+    import rasterio
+    from rasterio.windows import Window, from_bounds
+
+    path = product_paths(name, out_dir)['tif']
+    open_kwargs = {} if overview_level is None else {'overview_level': overview_level}
+    with rasterio.open(path, **open_kwargs) as src:
+        window = from_bounds(*bounds, transform=src.transform)
+        window = window.round_offsets().round_lengths().intersection(
+            Window(0, 0, src.width, src.height))
+        data = src.read(1, window=window, masked=True)
+        return data, src.window_transform(window)
+
+
+def iter_dem_tiles(name: str, size: int = DEM_TILE, halo: int = 0,
+                   out_dir: Path = None) -> Iterator[Tuple[Tile, np.ndarray]]:
+    """(tile, block) pairs over a DEM's north-up memmap. Each block covers
+    ``tile.outer`` (the core plus ``halo`` cells, clipped at the edges),
+    so neighbourhood kernels see across tile seams; ``block[tile.inner]``
+    is the core. Only one block is in memory at a time."""
+    dem, _ = load_dem(name, out_dir)
+    for tile in tile_windows(dem.shape[0], dem.shape[1], size, halo):
+        r0, r1, c0, c1 = tile.outer
+        yield tile, np.array(dem[r0:r1, c0:c1])
+
+
+def dem_preview(name: str, max_cells: int = 1500, to_crs=None, out_dir: Path = None):
+    """(X, Y, Z) node arrays for plotting a DEM product with at most
+    ``max_cells`` per side, read from the COG overviews. Rows run south
+    to north like GridSpec grids, Z is NaN outside the data, and X, Y
+    are reprojected when ``to_crs`` is given (e.g. UTM DEM on a lon/lat
+    map)."""
+    import rasterio
+    from rasterio.enums import Resampling
+
+    with rasterio.open(product_paths(name, out_dir)['tif']) as src:
+        step = max(1, -(-max(src.width, src.height) // max_cells))
+        h, w = -(-src.height // step), -(-src.width // step)
+        z = src.read(1, out_shape=(h, w), resampling=Resampling.average)
+        transform = src.transform * src.transform.scale(src.width / w, src.height / h)
+        crs = src.crs
+
+    cols, rows = np.meshgrid(np.arange(w) + 0.5, np.arange(h) + 0.5)
+    x, y = transform * (cols, rows)
+    if to_crs is not None:
+        x, y = transformer(crs, to_crs).transform(x, y)
+    return np.asarray(x)[::-1], np.asarray(y)[::-1], z[::-1]
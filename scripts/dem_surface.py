@@ -0,0 +1,335 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Survey DEM Surfaces
+
+Interpolated elevation grids from the survey points. griddata() builds a
+new Delaunay triangulation on every call; a SurveySurface builds it once
+per survey dataset and evaluates every grid (project extent, each site)
+from it, with linear or Clough-Tocher cubic interpolators sharing the
+triangulation. Evaluated grids are cached on disk as .npy, keyed by the
+SHA-256 of the survey data, the grid spec and the method, so the
+surface and classification maps - and reruns - share one computation.
+
+For large RTK / drone surveys, 'idw' and 'kriging' (local ordinary
+kriging, with an optional variance surface) work from k-nearest
+neighbourhoods and evaluate the grid in chunks over a process pool.
+
+Grids can be specified by cell size in a projected CRS (metres in UTM
+39N) and streamed straight to a DEM product tile by tile, so a 1 m grid
+over a 500 ha site needs one tile of memory rather than the whole grid.
+
+Usage:
+    from dem_surface import GridSpec, SurveySurface
+    surface = SurveySurface.from_points(all_pts, 'ELEVATION')
+    spec = GridSpec.around(zones_union.bounds, margin=0.002, n=500)
+    xi_grid, yi_grid = spec.mesh()
+    zi_grid = surface.grid(spec, method='cubic')
+    zk_grid = surface.grid(spec, method='kriging', k=16)
+    zk_var = surface.variance(spec, k=16)
+
+    utm_surface = SurveySurface.from_points(layer('all_pts', UTM_39N, ['ELEVATION']))
+    site_spec = GridSpec.from_cell_size(site_utm.bounds, cell=1.0, margin=20)
+    utm_surface.write_dem(site_spec, 'site_1_surface', clip=[site_utm], crs='EPSG:32639')
+"""
+
+import hashlib
+import json
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+from scipy.interpolate import CloughTocher2DInterpolator, LinearNDInterpolator
+from scipy.spatial import Delaunay, cKDTree
+
+from dem_products import DemWriter
+from local_interp import Variogram, fit_variogram, idw, ordinary_kriging
+from raster_masks import Tile, label_raster, tile_windows
+from render_pool import default_workers
+
+# ── Paths ──
+BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
+GRID_CACHE = BASE / "data" / "cache" / "dem_grids"
+
+INTERP_METHODS = ('linear', 'cubic', 'idw', 'kriging')
+CHUNK_NODES = 65_536     # grid nodes per interpolation task (idw; kriging scales it down)
+TILE_NODES = 1024        # tile side (nodes) for streamed surfaces
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    """Regular grid of nx x ny cell centres spanning [xmin, xmax] x [ymin, ymax]"""
+    xmin: float
+    xmax: float
+    ymin: float
+    ymax: float
+    nx: int
+    ny: int
+
+    @classmethod
+    def around(cls, bounds: Sequence[float], margin: float, n: int, ny: int = None) -> 'GridSpec':
+        """Grid over (minx, miny, maxx, maxy) bounds padded by margin"""
+        minx, miny, maxx, maxy = bounds
+        return cls(float(minx - margin), float(maxx + margin),
+                   float(miny - margin), float(maxy + margin), n, ny or n)
+
+    @classmethod
+    def from_cell_size(cls, bounds: Sequence[float], cell: float, margin: float = 0.0,
+                       max_nodes: Optional[int] = None) -> 'GridSpec':
+        """Grid with ``cell`` spacing in CRS units (metres in UTM) over bounds
+        padded by margin; nodes snap to multiples of ``cell`` so grids of
+        the same cell size line up. With ``max_nodes``, the cell grows to
+        the smallest multiple of ``cell`` that keeps nx * ny within it
+        (widely separated sites otherwise make huge, mostly empty grids)."""
+        minx, miny, maxx, maxy = bounds
+        step = cell
+        while True:
+            xmin = np.floor((minx - margin) / step) * step
+            ymin = np.floor((miny - margin) / step) * step
+            nx = int(np.ceil((maxx + margin - xmin) / step)) + 1
+            ny = int(np.ceil((maxy + margin - ymin) / step)) + 1
+            if max_nodes is None or nx * ny <= max_nodes:
+                break
+            step += cell
+        return cls(float(xmin), float(xmin + (nx - 1) * step),
+                   float(ymin), float(ymin + (ny - 1) * step), nx, ny)
+
+    @property
+    def dx(self) -> float:
+        return (self.xmax - self.xmin) / max(self.nx - 1, 1)
+
+    @property
+    def dy(self) -> float:
+        return (self.ymax - self.ymin) / max(self.ny - 1, 1)
+
+    def window(self, row0: int, row1: int, col0: int, col1: int) -> 'GridSpec':
+        """Sub-grid of node rows [row0, row1) x columns [col0, col1)"""
+        return GridSpec(self.xmin + col0 * self.dx, self.xmin + (col1 - 1) * self.dx,
+                        self.ymin + row0 * self.dy, self.ymin + (row1 - 1) * self.dy,
+                        col1 - col0, row1 - row0)
+
+    def tiles(self, size: int = TILE_NODES, halo: int = 0) -> Iterator[Tile]:
+        return tile_windows(self.ny, self.nx, size, halo)
+
+    def axes(self):
+        return np.linspace(self.xmin, self.xmax, self.nx), np.linspace(self.ymin, self.ymax, self.ny)
+
+    def mesh(self):
+        return np.meshgrid(*self.axes())
+
+    def key(self) -> str:
+        return hashlib.sha256(json.dumps(asdict(self), sort_keys=True).encode()).hexdigest()[:16]
+
+
+# Set in the parent before forking so workers inherit the tree and data
+_ACTIVE: Optional['SurveySurface'] = None
+
+
+def _local_chunk(method: str, params: tuple, spec: GridSpec, start: int, stop: int):
+    """Process-pool worker: evaluate grid nodes [start, stop) of spec"""
+    return _ACTIVE._evaluate_nodes(method, dict(params), spec, start, stop)
+
+
+class SurveySurface:
+    """One survey, evaluated on many grids.
+
+    'linear' and 'cubic' share one Delaunay triangulation. 'idw' and
+    'kriging' (local ordinary kriging) use k-nearest neighbourhoods from
+    one cKDTree and scale to very large surveys: grids are evaluated in
+    chunks of CHUNK_NODES nodes spread over a fork process pool. Kriging
+    builds a (k+1)x(k+1) system per node, so its chunks are CHUNK_NODES
+    scaled by 64 / (k+1)^2 (about 14k nodes, ~150 MB per task at k=16).
+    """
+
+    def __init__(self, x, y, z, cache_dir: Path = None, workers: Optional[int] = None):
+        self.xy = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+        self.z = np.asarray(z, dtype=float)
+        self.cache_dir = Path(cache_dir or GRID_CACHE)
+        self.workers = workers
+        digest = hashlib.sha256(self.xy.tobytes())
+        digest.update(self.z.tobytes())
+        self.data_hash = digest.hexdigest()[:16]
+        self._tri = None
+        self._tree = None
+        self._variograms: Dict[str, Variogram] = {}
+        self._interpolators: Dict[str, object] = {}
+        self._grids: Dict[tuple, np.ndarray] = {}
+
+    @classmethod
+    def from_points(cls, gdf, column: str = 'ELEVATION', **kwargs) -> 'SurveySurface':
+        return cls(gdf.geometry.x.values, gdf.geometry.y.values, gdf[column].values, **kwargs)
+
+    @property
+    def triangulation(self) -> Delaunay:
+        if self._tri is None:
+            self._tri = Delaunay(self.xy)
+        return self._tri
+
+    @property
+    def tree(self) -> cKDTree:
+        if self._tree is None:
+            self._tree = cKDTree(self.xy)
+        return self._tree
+
+    def variogram(self, model: str = 'spherical') -> Variogram:
+        if model not in self._variograms:
+            self._variograms[model] = fit_variogram(self.xy, self.z, model)
+        return self._variograms[model]
+
+    def interpolator(self, method: str = 'cubic'):
+        """Linear or Clough-Tocher interpolator on the shared triangulation"""
+        if method not in self._interpolators:
+            if method == 'cubic':
+                interp = CloughTocher2DInterpolator(self.triangulation, self.z)
+            elif method == 'linear':
+                interp = LinearNDInterpolator(self.triangulation, self.z)
+            else:
+                raise ValueError(f"Unknown method '{method}' (use 'linear' or 'cubic')")
+            self._interpolators[method] = interp
+        return self._interpolators[method]
+
+    def _evaluate_nodes(self, method: str, params: Dict, spec: GridSpec, start: int, stop: int):
+        xi, yi = spec.axes()
+        flat = np.arange(start, stop)
+        targets = np.column_stack([xi[flat % spec.nx], yi[flat // spec.nx]])
+        if method == 'idw':
+            return idw(self.tree, self.z, targets, k=params.get('k', 12),
+                       power=params.get('power', 2.0)), None
+        vgm = self.variogram(params.get('model', 'spherical'))
+        return ordinary_kriging(self.tree, self.z, targets, vgm, k=params.get('k', 16))
+
+    def _evaluate_local(self, spec: GridSpec, method: str, params: Dict):
+        """(values, variance or None) for idw/kriging, chunked over a process pool"""
+        global _ACTIVE
+        n = spec.nx * spec.ny
+        chunk = CHUNK_NODES
+        if method == 'kriging':
+            chunk = max(1, CHUNK_NODES // (params.get('k', 16) + 1) ** 2) * 64
+        bounds = [(a, min(a + chunk, n)) for a in range(0, n, chunk)]
+        # Build shared state before forking so workers inherit it
+        self.tree
+        if method == 'kriging':
+            self.variogram(params.get('model', 'spherical'))
+
+        workers = min(self.workers or default_workers(), len(bounds))
+        if workers > 1 and 'fork' in mp.get_all_start_methods():
+            _ACTIVE = self
+            try:
+                with ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=mp.get_context('fork')) as pool:
+                    items = tuple(sorted(params.items()))
+                    parts = list(pool.map(_local_chunk, *zip(*[
+                        (method, items, spec, a, b) for a, b in bounds])))
+            finally:
+                _ACTIVE = None
+        else:
+            parts = [self._evaluate_nodes(method, params, spec, a, b) for a, b in bounds]
+
+        values = np.concatenate([p[0] for p in parts]).reshape(spec.ny, spec.nx)
+        variance = None
+        if method == 'kriging':
+            variance = np.concatenate([p[1] for p in parts]).reshape(spec.ny, spec.nx)
+        return values, variance
+
+    def _evaluate(self, spec: GridSpec, method: str, params: Dict):
+        if method in ('linear', 'cubic'):
+            return self.interpolator(method)(*spec.mesh()), None
+        return self._evaluate_local(spec, method, params)
+
+    def _cache_file(self, spec: GridSpec, method: str, params: Dict, suffix: str = '') -> Path:
+        tag = method
+        if params:
+            tag += '_' + hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:8]
+        return self.cache_dir / f"{self.data_hash}_{spec.key()}_{tag}{suffix}.npy"
+
+    def _save(self, path: Path, array: np.ndarray):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + '.tmp.npy')
+        np.save(tmp, array)
+        tmp.replace(path)
+
+    def grid(self, spec: GridSpec, method: str = 'cubic', **params) -> np.ndarray:
+        """Surface on ``spec`` as a (ny, nx) array.
+
+        ``method`` is 'linear' or 'cubic' (NaN outside the survey hull),
+        'idw' (params k, power) or 'kriging' (params k, model).
+        """
+        if method not in INTERP_METHODS:
+            raise ValueError(f"Unknown method '{method}' (use one of {INTERP_METHODS})")
+        key = (spec, method, tuple(sorted(params.items())))
+        if key in self._grids:
+            return self._grids[key]
+        cache_file = self._cache_file(spec, method, params)
+        if cache_file.exists():
+            zi = np.load(cache_file)
+        else:
+            zi, variance = self._evaluate(spec, method, params)
+            self._save(cache_file, zi)
+            if variance is not None:
+                self._save(self._cache_file(spec, method, params, '_var'), variance)
+        self._grids[key] = zi
+        return zi
+
+    def variance(self, spec: GridSpec, **params) -> np.ndarray:
+        """Ordinary-kriging variance surface on ``spec`` (computed with the estimate)"""
+        var_file = self._cache_file(spec, 'kriging', params, '_var')
+        if not var_file.exists():
+            self._grids.pop((spec, 'kriging', tuple(sorted(params.items()))), None)
+            self._cache_file(spec, 'kriging', params).unlink(missing_ok=True)
+            self.grid(spec, 'kriging', **params)
+        return np.load(var_file)
+
+    def iter_tiles(self, spec: GridSpec, method: str = 'cubic', clip: Sequence = None,
+                   size: int = TILE_NODES, **params):
+        """Evaluate ``spec`` one size x size tile at a time, yielding
+        (tile, values, variance) with rows running south to north; variance
+        is None except for kriging. Nodes outside the ``clip`` geometries
+        (same CRS as the survey) are NaN, and tiles entirely outside them
+        are not interpolated.
+
+        Tiles have no halo: every method evaluates each node on its own
+        (the triangulation and k-NN neighbourhoods span the whole survey),
+        so tiles join without seams; neighbourhood kernels on the result
+        read it back with iter_dem_tiles(halo=...)."""
+        if method not in INTERP_METHODS:
+            raise ValueError(f"Unknown method '{method}' (use one of {INTERP_METHODS})")
+        for tile in spec.tiles(size):
+            sub = spec.window(*tile.core)
+            outside = None if clip is None else label_raster(clip, sub) == 0
+            if outside is not None and outside.all():
+                empty = np.full((sub.ny, sub.nx), np.nan)
+                yield tile, empty, (empty.copy() if method == 'kriging' else None)
+                continue
+            values, variance = self._evaluate(sub, method, params)
+            if outside is not None:
+                values[outside] = np.nan
+                if variance is not None:
+                    variance[outside] = np.nan
+            yield tile, values, variance
+
+    def write_dem(self, spec: GridSpec, name: str, method: str = 'cubic', clip: Sequence = None,
+                  crs: str = 'EPSG:4326', source_key: Optional[str] = None,
+                  variance_name: Optional[str] = None, out_dir: Path = None, **params) -> Path:
+        """Stream the surface on ``spec`` tile by tile into a DEM product
+        (dem_products.DemWriter), so memory stays flat however large the
+        grid. ``variance_name`` also writes the kriging variance. Nothing
+        is computed when the products match ``source_key``."""
+        writers = [DemWriter(spec, name, crs, source_key, out_dir)]
+        if variance_name:
+            writers.append(DemWriter(spec, variance_name, crs,
+                                     source_key and f"{source_key}_var", out_dir))
+        if not all(w.current for w in writers):
+            try:
+                for tile, values, variance in self.iter_tiles(spec, method, clip, **params):
+                    writers[0].write(tile.core, values)
+                    if variance_name:
+                        writers[1].write(tile.core, variance)
+            except BaseException:
+                for w in writers:
+                    w.abort()
+                raise
+        for w in writers:
+            w.close()
+        return writers[0].paths['tif']
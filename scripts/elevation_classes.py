@@ -0,0 +1,121 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Elevation Class Areas per Site
+
+Planting-suitability figures as true areas from the interpolated DEM
+rather than survey-point counts, which over-weight densely surveyed
+ground. The DEM product is read tile by tile against the cached zone
+label raster (zonal_stats.zone_labels); each tile's cells are binned
+into the classification bands of the DEM maps and counted per site with
+a single np.bincount over combined (site label, class) codes.
+Cell counts times the cell area (UTM metres) give hectares.
+
+The result is a long table - one row per (site_id, class) with cells,
+area_ha and pct of the site's DEM area - cached as CSV next to the DEM
+product, keyed by the DEM's source key, the zones layer and the class
+bounds. The DEM maps, the site comparison figures and the report all
+read the same table.
+
+Usage:
+    from elevation_classes import class_areas, optimal_pct
+    table = class_areas('phase2_surface', 'final_poly')
+    pct = optimal_pct(table)              # {site_id: % of area in +0.30 to +0.60 m}
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pyproj import CRS
+
+from dem_products import DEM_DIR, iter_dem_tiles, load_dem, product_paths
+from dem_surface import GridSpec
+from project_layers import layer, layer_sha256
+from zonal_stats import zone_labels
+
+# Classification bands of the DEM maps (m MSL); values beyond the outer
+# bounds fall in the end classes, as on the map colour scale
+ELEVATION_CLASSES = (-3, -1, 0, 0.15, 0.30, 0.60, 1.00, 2.00, 3.50)
+CLASS_NAMES = ('Deep', 'Sub-MSL', 'Low', 'Marginal Low', 'Optimal',
+               'Marginal High', 'Above', 'High')
+OPTIMAL_CLASS = 'Optimal'
+
+
+def _class_names(bounds: Sequence[float], names: Optional[Sequence[str]] = None):
+    if names is not None:
+        return list(names)
+    if tuple(bounds) == ELEVATION_CLASSES:
+        return list(CLASS_NAMES)
+    return [f"{lo:+.2f} to {hi:+.2f} m" for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def compute_class_areas(dem_name: str, zones: str,
+                        bounds: Sequence[float] = ELEVATION_CLASSES,
+                        out_dir: Path = None, names: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Class areas of every zone, one bincount per DEM tile"""
+    _, meta = load_dem(dem_name, out_dir)
+    spec = GridSpec(**meta['spec'])
+    polys = layer(zones, CRS.from_user_input(meta['crs']).to_epsg(), [])
+    site_labels = zone_labels(zones, product_paths(dem_name, out_dir)['tif'])
+    n_cls = len(bounds) - 1
+    inner_edges = np.asarray(bounds[1:-1], dtype=float)
+
+    counts = np.zeros((len(polys) + 1) * n_cls, dtype=np.int64)
+    for tile, block in iter_dem_tiles(dem_name, out_dir=out_dir):
+        r0, r1, c0, c1 = tile.core
+        labels = np.asarray(site_labels[r0:r1, c0:c1])
+        valid = (labels > 0) & np.isfinite(block)
+        cls = np.digitize(block[valid], inner_edges)
+        counts += np.bincount(labels[valid] * n_cls + cls, minlength=counts.size)
+
+    cells = counts.reshape(len(polys) + 1, n_cls)[1:]
+    site_cells = cells.sum(axis=1, keepdims=True)
+    pct = np.divide(100.0 * cells, site_cells, out=np.full(cells.shape, np.nan),
+                    where=site_cells > 0)
+    cell_ha = spec.dx * spec.dy / 10_000
+    return pd.DataFrame({
+        'site_id': np.repeat(polys.index.to_numpy(), n_cls),
+        'class': np.tile(_class_names(bounds, names), len(polys)),
+        'lower_m': np.tile(bounds[:-1], len(polys)).astype(float),
+        'upper_m': np.tile(bounds[1:], len(polys)).astype(float),
+        'cells': cells.ravel(),
+        'area_ha': cells.ravel() * cell_ha,
+        'pct': pct.ravel(),
+    })
+
+
+_memo: Dict[str, pd.DataFrame] = {}
+
+
+def class_areas(dem_name: str = 'phase2_surface', zones: str = 'final_poly',
+                bounds: Sequence[float] = ELEVATION_CLASSES, out_dir: Path = None,
+                names: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Cached (site_id, class) area table for a DEM product; any product
+    (e.g. a suitability score) can be classed with its own ``bounds`` and
+    class ``names``.
+
+    Raises FileNotFoundError when the DEM product has not been generated
+    (generate_8mm_maps_v2.py writes it).
+    """
+    _, meta = load_dem(dem_name, out_dir)
+    dem_key = meta.get('source_key') or str(product_paths(dem_name, out_dir)['npy'].stat().st_mtime_ns)
+    key = hashlib.sha256(
+        f"{dem_key}|{layer_sha256(zones)}|{list(map(float, bounds))}|{names}".encode()
+    ).hexdigest()[:16]
+    if key not in _memo:
+        cache_file = Path(out_dir or DEM_DIR) / f"{dem_name}__{zones}_classes_{key}.csv"
+        if cache_file.exists():
+            table = pd.read_csv(cache_file)
+        else:
+            table = compute_class_areas(dem_name, zones, bounds, out_dir, names)
+            table.to_csv(cache_file, index=False)
+        _memo[key] = table
+    return _memo[key]
+
+
+def optimal_pct(table: pd.DataFrame) -> Dict:
+    """{site_id: % of the site's DEM area in the optimal planting band}"""
+    optimal = table[table['class'] == OPTIMAL_CLASS]
+    return dict(zip(optimal['site_id'], optimal['pct']))
@@ -14,23 +14,30 @@ from matplotlib.colors import LinearSegmentedColormap
 import numpy as np
 from pathlib import Path
 import json
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from project_layers import load_layer
+from site_membership import site_membership
+from plot_layers import plot_polygons
+from render_pool import render_all
 
 # ── Paths ──
 BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
-ESRI = BASE / "Work Files - GIS" / "_INBOX" / "ESRI_Data"
 OUTPUT = BASE / "outputs" / "maps" / "8mm_report"
 OUTPUT.mkdir(parents=True, exist_ok=True)
 
-# ── Load all shapefiles ──
+# ── Load layers (shared cache, only the columns used here) ──
 print("[1/6] Loading shapefiles...")
-final_pts = gpd.read_file(ESRI / "8MM_Final_Locations_Points.shp")
-final_poly = gpd.read_file(ESRI / "8MM_Final_Locations_Polygons.shp")
-ali_pts = gpd.read_file(ESRI / "Abu_Ali_8MM_Sites_Points.shp")
-ali_poly = gpd.read_file(ESRI / "Abu_Ali_8MM_Sites_Polygons.shp")
-all_zones = gpd.read_file(ESRI / "All_Planting_Zones.shp")
-all_pts = gpd.read_file(ESRI / "All_Survey_Points.shp")
-control = gpd.read_file(ESRI / "Control_Sites.shp")
-nursery = gpd.read_file(ESRI / "Nursery_Boundary.shp")
+final_pts = load_layer('final_pts', ['NAME', 'LATITUDE', 'LONGITUDE', 'ELEVATION'])
+final_poly = load_layer('final_poly', ['AREA_HA'])
+all_zones = load_layer('all_zones', ['NAME', 'AREA_HA'])
+control = load_layer('control', ['NAME', 'LATITUDE', 'LONGITUDE'])
+nursery = load_layer('nursery', ['NAME', 'AREA_HA', 'CAPACITY'])
+
+# Survey points per site (cached membership, 500 m buffer)
+SITE_BUFFER_M = 500
+site_members = site_membership('final_pts', 'final_poly', SITE_BUFFER_M)
 
 # ── Color scheme ──
 ZONE_COLORS = ['#2E7D32', '#1B5E20', '#388E3C', '#43A047',
@@ -192,7 +199,8 @@ print(f"  Saved: {OUTPUT / '02_all_sites_overview.html'}")
 # ═══════════════════════════════════════════════════════════
 print("[4/6] Creating Maps 3a-3d: Individual Site Maps...")
 
-for idx, row in final_poly.iterrows():
+def render_site_detail(idx):
+    row = final_poly.loc[idx]
     site_num = idx + 1
     bounds = row.geometry.bounds  # minx, miny, maxx, maxy
     center = [(bounds[1] + bounds[3]) / 2, (bounds[0] + bounds[2]) / 2]
@@ -212,9 +220,7 @@ for idx, row in final_poly.iterrows():
     ).add_to(m)
 
     # Survey points for this site
-    site_pts = final_pts[
-        final_pts.geometry.within(row.geometry.buffer(0.005))
-    ]
+    site_pts = final_pts.loc[site_members.points(idx)]
     for _, pt in site_pts.iterrows():
         folium.CircleMarker(
             location=[pt['LATITUDE'], pt['LONGITUDE']],
@@ -230,8 +236,12 @@ for idx, row in final_poly.iterrows():
     ).add_to(m)
 
     plugins.MeasureControl(position='topleft').add_to(m)
-    m.save(str(OUTPUT / f"03{chr(96+site_num)}_site_{site_num}_detail.html"))
-    print(f"  Saved: Site {site_num} detail map")
+    outfile = OUTPUT / f"03{chr(96+site_num)}_site_{site_num}_detail.html"
+    m.save(str(outfile))
+    return outfile
+
+
+render_all(render_site_detail, list(final_poly.index))
 
 
 # ═══════════════════════════════════════════════════════════
@@ -372,10 +382,11 @@ fig.patch.set_facecolor('#1a1a2e')
 ax.set_facecolor('#16213e')
 
 # Plot planting zones
+plot_polygons(ax, final_poly.geometry,
+              facecolor=[site_colors[i % 4] for i in final_poly.index], alpha=0.6,
+              edgecolor='white', linewidth=2)
 for idx4, row4 in final_poly.iterrows():
     color = site_colors[idx4 % 4]
-    gpd.GeoSeries([row4.geometry]).plot(ax=ax, color=color, alpha=0.6,
-                                        edgecolor='white', linewidth=2)
     centroid = row4.geometry.centroid
     ax.annotate(f"Site {idx4+1}\n{row4['AREA_HA']:.0f} ha",
                 xy=(centroid.x, centroid.y),
@@ -436,7 +447,8 @@ plt.close()
 print(f"  Saved: overview_static.png")
 
 # --- Individual site static maps ---
-for idx6, row6 in final_poly.iterrows():
+def render_site_static(idx6):
+    row6 = final_poly.loc[idx6]
     site_num = idx6 + 1
     fig2, ax2 = plt.subplots(1, 1, figsize=(10, 8))
     fig2.patch.set_facecolor('#1a1a2e')
@@ -446,9 +458,7 @@ for idx6, row6 in final_poly.iterrows():
                                         alpha=0.5, edgecolor='white', linewidth=2.5)
 
     # Points within this site
-    site_pts = final_pts[
-        final_pts.geometry.within(row6.geometry.buffer(0.005))
-    ]
+    site_pts = final_pts.loc[site_members.points(idx6)]
     if len(site_pts) > 0:
         site_pts.plot(ax=ax2, color='#FFD600', markersize=25, alpha=0.9,
                       edgecolor='black', linewidth=0.5, zorder=5)
@@ -461,10 +471,14 @@ for idx6, row6 in final_poly.iterrows():
     ax2.grid(True, alpha=0.2, color='white')
 
     plt.tight_layout()
-    plt.savefig(str(OUTPUT / f"site_{site_num}_static.png"), dpi=200,
+    outfile = OUTPUT / f"site_{site_num}_static.png"
+    plt.savefig(str(outfile), dpi=200,
                 bbox_inches='tight', facecolor=fig2.get_facecolor())
     plt.close()
-    print(f"  Saved: site_{site_num}_static.png")
+    return outfile
+
+
+render_all(render_site_static, list(final_poly.index))
 
 
 # --- Nursery static map ---
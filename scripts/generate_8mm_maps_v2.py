@@ -17,28 +17,48 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib.colors import LinearSegmentedColormap, BoundaryNorm
 from matplotlib.lines import Line2D
-from matplotlib.path import Path as MplPath
 import numpy as np
-from scipy.interpolate import griddata
+import pandas as pd
 from shapely.ops import unary_union
 from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from project_layers import UTM_39N, WGS84, layer, load_layer, layer_sha256, source_path
+from site_membership import site_membership
+from dem_surface import GridSpec, SurveySurface
+from dem_products import dem_preview
+from elevation_classes import ELEVATION_CLASSES, class_areas, optimal_pct
+from zonal_stats import zonal_stats
+from terrain_derivatives import add_hillshade, write_derivatives
+from hydroperiod import TIDE_SERIES, load_tide_series, write_hydroperiod
+from tide_model import TIDE_GAUGE, station_model
+from suitability import (site_scores, suitable_areas, suitable_pct, write_channel_distance,
+                         write_suitability)
+from plot_layers import plot_polygons
+from label_engine import add_labels
 
 # ── Paths ──
 BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
-ESRI = BASE / "Work Files - GIS" / "_INBOX" / "ESRI_Data"
 OUTPUT = BASE / "outputs" / "maps" / "8mm_report"
 OUTPUT.mkdir(parents=True, exist_ok=True)
 
-# ── Load shapefiles ──
+# Hydroperiod year, predicted from the gauge's harmonic constituents
+HYDRO_PERIOD = ('2026-01-01', '2027-01-01')
+HYDRO_STEP = '10min'
+
+# ── Load layers (shared cache, only the columns used here) ──
 print("[1/6] Loading shapefiles...")
-final_pts = gpd.read_file(ESRI / "8MM_Final_Locations_Points.shp")
-final_poly = gpd.read_file(ESRI / "8MM_Final_Locations_Polygons.shp")
-ali_pts = gpd.read_file(ESRI / "Abu_Ali_8MM_Sites_Points.shp")
-ali_poly = gpd.read_file(ESRI / "Abu_Ali_8MM_Sites_Polygons.shp")
-all_zones = gpd.read_file(ESRI / "All_Planting_Zones.shp")
-all_pts = gpd.read_file(ESRI / "All_Survey_Points.shp")
-control = gpd.read_file(ESRI / "Control_Sites.shp")
-nursery = gpd.read_file(ESRI / "Nursery_Boundary.shp")
+final_poly = load_layer('final_poly', ['NAME', 'AREA_HA'])
+ali_poly = load_layer('ali_poly', ['NAME', 'AREA_HA'])
+all_zones = load_layer('all_zones', [])
+all_pts = load_layer('all_pts', ['ELEVATION'])
+control = load_layer('control', ['NAME', 'LATITUDE', 'LONGITUDE'])
+nursery = load_layer('nursery', [])
+
+# Survey points per zone (cached membership, 500 m buffer)
+ZONE_BUFFER_M = 500
+zone_members = site_membership('all_pts', 'final_poly', ZONE_BUFFER_M)
 
 # ── Colors ──
 ZONE_COLORS = ['#2E7D32', '#1B5E20', '#388E3C', '#43A047',
@@ -50,28 +70,6 @@ CONTROL_COLORS = {'Control_Unplanted_1': '#E53935',
 NURSERY_COLOR = '#8E24AA'
 
 
-def create_polygon_mask(geom, xi_grid, yi_grid):
-    """Create a boolean mask for grid points inside a polygon/multipolygon."""
-    grid_points = np.column_stack([xi_grid.ravel(), yi_grid.ravel()])
-    mask = np.zeros(len(grid_points), dtype=bool)
-
-    if geom.geom_type == 'MultiPolygon':
-        for poly in geom.geoms:
-            ext_path = MplPath(np.array(poly.exterior.coords))
-            mask |= ext_path.contains_points(grid_points)
-            for interior in poly.interiors:
-                hole_path = MplPath(np.array(interior.coords))
-                mask &= ~hole_path.contains_points(grid_points)
-    else:
-        ext_path = MplPath(np.array(geom.exterior.coords))
-        mask = ext_path.contains_points(grid_points)
-        for interior in geom.interiors:
-            hole_path = MplPath(np.array(interior.coords))
-            mask &= ~hole_path.contains_points(grid_points)
-
-    return mask.reshape(xi_grid.shape)
-
-
 # ═══════════════════════════════════════════════════════════
 # MAP: ABU ALI ISLAND OVERVIEW WITH ALL OVERLAYS
 # ═══════════════════════════════════════════════════════════
@@ -83,21 +81,16 @@ fig, ax = plt.subplots(1, 1, figsize=(16, 12))
 ax.set_facecolor('#E3F2FD')
 
 # Plot ALL planting zones (Phase 2 + Abu Ali)
-for idx, row in all_zones.iterrows():
-    color = ZONE_COLORS[idx % len(ZONE_COLORS)]
-    gpd.GeoSeries([row.geometry]).plot(ax=ax, color=color, alpha=0.45,
-                                       edgecolor=color, linewidth=1.5)
+zone_colors = [ZONE_COLORS[i % len(ZONE_COLORS)] for i in all_zones.index]
+plot_polygons(ax, all_zones.geometry, facecolor=zone_colors, alpha=0.45,
+              edgecolor=zone_colors, linewidth=1.5)
 
 # Plot Abu Ali polygons separately with distinct style
-for idx, row in ali_poly.iterrows():
-    gpd.GeoSeries([row.geometry]).plot(ax=ax, facecolor='none',
-                                       edgecolor='#FF6F00', linewidth=2.5,
-                                       linestyle='--')
+plot_polygons(ax, ali_poly.geometry, edgecolor='#FF6F00', linewidth=2.5,
+              linestyle='--')
 
 # Plot Phase 2 polygons with green boundary
-for idx, row in final_poly.iterrows():
-    gpd.GeoSeries([row.geometry]).plot(ax=ax, facecolor='none',
-                                       edgecolor='#1B5E20', linewidth=2.5)
+plot_polygons(ax, final_poly.geometry, edgecolor='#1B5E20', linewidth=2.5)
 
 # Plot nursery boundary
 nursery.plot(ax=ax, color=NURSERY_COLOR, alpha=0.6,
@@ -233,10 +226,8 @@ fig, ax = plt.subplots(1, 1, figsize=(14, 10))
 ax.set_facecolor('#F5F5F5')
 
 # Plot planting zone boundaries as context
-for idx, row in all_zones.iterrows():
-    gpd.GeoSeries([row.geometry]).plot(ax=ax, facecolor='none',
-                                       edgecolor='#1B5E20', linewidth=1.5,
-                                       alpha=0.7)
+plot_polygons(ax, all_zones.geometry, edgecolor='#1B5E20', linewidth=1.5,
+              alpha=0.7)
 
 # Plot nursery boundary
 nursery.plot(ax=ax, facecolor='none', edgecolor=NURSERY_COLOR, linewidth=2)
@@ -255,13 +246,11 @@ scatter = ax.scatter(all_pts.geometry.x, all_pts.geometry.y,
                      s=60, zorder=5, edgecolors='#333', linewidth=0.5,
                      vmin=-3, vmax=3.5)
 
-# Add elevation value labels for selected points
-for idx, row in all_pts.iterrows():
-    if idx % 5 == 0:  # Label every 5th point to avoid clutter
-        ax.annotate(f"{row['ELEVATION']:.1f}",
-                    xy=(row.geometry.x, row.geometry.y),
-                    xytext=(3, 3), textcoords='offset points',
-                    fontsize=5, color='#333', alpha=0.8)
+# Add elevation value labels wherever they fit without overlapping
+add_labels(ax, all_pts.geometry.x, all_pts.geometry.y,
+           [f"{e:.1f}" for e in all_pts['ELEVATION']],
+           offset=(3, 3), fontsize=5, fontweight='normal', color='#333',
+           alpha=0.8, box_facecolor=None)
 
 # Highlight optimal planting elevation band
 ax.text(0.02, 0.97, 'Optimal Planting Elevation: +0.30m to +0.60m MSL',
@@ -320,19 +309,98 @@ z = all_pts['ELEVATION'].values
 # Create union of all Phase 2 planting zone polygons for clipping
 zones_union = unary_union(final_poly.geometry)
 
-# Create interpolation grid bounded by the planting zones extent (not survey points)
-zb = zones_union.bounds  # minx, miny, maxx, maxy
+# One triangulation of the survey serves every grid below, in UTM metres.
+# Dense RTK / drone surveys switch to local ordinary kriging (k-NN, chunked).
+DENSE_SURVEY_POINTS = 5000
+DEM_METHOD = 'cubic' if len(z) <= DENSE_SURVEY_POINTS else 'kriging'
+DEM_CRS = f"EPSG:{UTM_39N}"
+DEM_CELL_M = 2.0         # project-wide surface
+SITE_CELL_M = 1.0        # per-site surfaces
+MAX_DEM_NODES = 50_000_000   # project-wide cap (~200 MB per float32 product)
+surface = SurveySurface.from_points(layer('all_pts', UTM_39N, ['ELEVATION']))
+final_poly_utm = layer('final_poly', UTM_39N, [])
+
+# Interpolation grid bounded by the planting zones extent (not survey points),
+# at a fixed cell size so every site gets the same resolution. Widely
+# separated sites would make a huge, mostly empty grid, so the cell is
+# coarsened to stay under MAX_DEM_NODES (tiles outside every zone are not
+# interpolated); the per-site surfaces below keep SITE_CELL_M.
+zb = zones_union.bounds  # minx, miny, maxx, maxy (map extent, degrees)
 margin = 0.002
-xi = np.linspace(zb[0] - margin, zb[2] + margin, 500)
-yi = np.linspace(zb[1] - margin, zb[3] + margin, 500)
-xi_grid, yi_grid = np.meshgrid(xi, yi)
-
-# Interpolate using cubic method
-zi_grid = griddata((x, y), z, (xi_grid, yi_grid), method='cubic')
-
-# Clip interpolated surface to planting zone boundaries
-zone_mask = create_polygon_mask(zones_union, xi_grid, yi_grid)
-zi_grid_clipped = np.where(zone_mask, zi_grid, np.nan)
+grid_spec = GridSpec.from_cell_size(final_poly_utm.total_bounds, DEM_CELL_M, margin=200,
+                                    max_nodes=MAX_DEM_NODES)
+if round(grid_spec.dx, 6) > DEM_CELL_M:
+    print(f"  Zones span {grid_spec.xmax - grid_spec.xmin:,.0f} x {grid_spec.ymax - grid_spec.ymin:,.0f} m;"
+          f" project surface at {grid_spec.dx:g} m cells")
+
+# Interpolate tile by tile, clipped to the planting zones, streamed to a
+# COG + memory-mapped grid for the report / ESRI package
+zones_key = layer_sha256('final_poly')[:16]
+dem_file = surface.write_dem(
+    grid_spec, 'phase2_surface', DEM_METHOD, clip=final_poly_utm.geometry, crs=DEM_CRS,
+    source_key=f"{surface.data_hash}_{grid_spec.key()}_{DEM_METHOD}_{zones_key}",
+    variance_name='phase2_surface_variance' if DEM_METHOD == 'kriging' else None)
+print(f"  -> {dem_file.name}")
+if DEM_METHOD == 'kriging':
+    print("  -> phase2_surface_variance.tif")
+
+# Control sites and the nursery lie outside the planting zones, where
+# phase2_surface is NaN, so they get a surface clipped to their own polygons
+reference_layers = ['control', 'nursery']
+reference_utm = pd.concat([layer(name, UTM_39N, []) for name in reference_layers])
+reference_spec = GridSpec.from_cell_size(reference_utm.total_bounds, DEM_CELL_M, margin=50,
+                                         max_nodes=MAX_DEM_NODES)
+reference_key = '_'.join(layer_sha256(name)[:16] for name in reference_layers)
+reference_file = surface.write_dem(
+    reference_spec, 'phase2_reference_surface', DEM_METHOD, clip=reference_utm.geometry, crs=DEM_CRS,
+    source_key=f"{surface.data_hash}_{reference_spec.key()}_{DEM_METHOD}_{reference_key}")
+print(f"  -> {reference_file.name}")
+
+# Elevation statistics per planting zone, control site and nursery
+zonal_file = dem_file.with_name('phase2_surface_zonal_stats.csv')
+pd.concat([zonal_stats(dem_file, 'final_poly'), zonal_stats(reference_file, reference_layers)],
+          ignore_index=True).to_csv(zonal_file, index=False)
+print(f"  -> {zonal_file.name}")
+
+# Slope / aspect / hillshade COGs (relief underlay, drainage and planting checks)
+for name, path in write_derivatives('phase2_surface').items():
+    print(f"  -> {path.name}")
+
+# Per-cell hydroperiod (inundation frequency, flood / dry-spell durations)
+# with per-site means: a year predicted from the fitted gauge constituents,
+# else the recorded tide series
+site_flooded_pct = {}
+tide = None
+if TIDE_GAUGE.exists():
+    tide_model = station_model('abu_ali', TIDE_GAUGE)
+    print(f"  Tide model: {len(tide_model.constituents)} constituents, "
+          f"rms residual {tide_model.rms_residual:.3f} m, {tide_model.regime()}")
+    tide = tide_model.series(*HYDRO_PERIOD, freq=HYDRO_STEP)
+elif TIDE_SERIES.exists():
+    tide = load_tide_series(TIDE_SERIES)
+if tide is not None:
+    hydro_files = write_hydroperiod('phase2_surface', tide)
+    for path in hydro_files.values():
+        print(f"  -> {path.name}")
+    hydro_stats = zonal_stats(hydro_files['inundation_frequency'], 'final_poly', ('mean', 'p10', 'p90'))
+    hydro_stats.to_csv(dem_file.with_name('phase2_hydroperiod_zonal_stats.csv'), index=False)
+    site_flooded_pct = dict(zip(hydro_stats['zone_id'], hydro_stats['mean'] * 100))
+else:
+    print(f"  (no tide gauge at {TIDE_GAUGE} or series at {TIDE_SERIES}; skipping hydroperiod)")
+
+# Distance to tidal channels and the multi-criteria suitability raster
+# (elevation, slope, inundation, channel distance, substrate - whichever
+# layers exist) with per-site suitable areas and mean criterion scores
+if source_path('channels').exists():
+    print(f"  -> {write_channel_distance('phase2_surface').name}")
+print(f"  -> {write_suitability('phase2_surface').name}")
+suitability_table = suitable_areas('phase2_surface', 'final_poly')
+suitability_table.to_csv(dem_file.with_name('phase2_suitability_classes.csv'), index=False)
+site_scores('phase2_surface', 'final_poly').to_csv(dem_file.with_name('phase2_suitability_site_scores.csv'))
+site_suitable_pct = suitable_pct(suitability_table)
+
+# Plot-resolution view of the surface on the lon/lat map
+xi_grid, yi_grid, zi_grid_clipped = dem_preview('phase2_surface', to_crs=WGS84)
 
 # Create figure with two subplots: surface + histogram
 fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(18, 10),
@@ -348,11 +416,10 @@ terrain_cmap = LinearSegmentedColormap.from_list('terrain_custom',
 
 im = ax1.pcolormesh(xi_grid, yi_grid, zi_grid_clipped, cmap=terrain_cmap,
                      shading='auto', vmin=-3, vmax=3.5)
+add_hillshade(ax1, 'phase2_surface', to_crs=WGS84, alpha=0.3, zorder=1.5)
 
 # Overlay planting zone boundaries (crisp white borders)
-for idx, row in final_poly.iterrows():
-    gpd.GeoSeries([row.geometry]).plot(ax=ax1, facecolor='none',
-                                        edgecolor='white', linewidth=2.5)
+plot_polygons(ax1, final_poly.geometry, edgecolor='white', linewidth=2.5)
 
 # Plot survey points
 ax1.scatter(x, y, c='black', s=8, zorder=5, alpha=0.5, label='Survey Points')
@@ -428,16 +495,14 @@ class_cmap = LinearSegmentedColormap.from_list('class',
     N=256)
 
 # Use the same clipped interpolated grid
-bounds_cls = [-3, -1, 0, 0.15, 0.30, 0.60, 1.00, 2.00, 3.50]
+bounds_cls = list(ELEVATION_CLASSES)
 class_norm = BoundaryNorm(bounds_cls, 256)
 
 im = ax.pcolormesh(xi_grid, yi_grid, zi_grid_clipped, cmap=class_cmap,
                     norm=class_norm, shading='auto')
 
 # Overlay planting zone boundaries
-for idx, row in final_poly.iterrows():
-    gpd.GeoSeries([row.geometry]).plot(ax=ax, facecolor='none',
-                                        edgecolor='black', linewidth=2.5)
+plot_polygons(ax, final_poly.geometry, edgecolor='black', linewidth=2.5)
 
 # Survey points
 ax.scatter(x, y, c='black', s=6, zorder=5, alpha=0.4)
@@ -456,17 +521,23 @@ cbar.set_ticklabels(['Deep\n(<-1m)', 'Sub-MSL\n(-1 to 0m)',
                       'Marginal\nHigh\n(0.60-1.0m)',
                       'Above\n(1.0-2.0m)', 'High\n(>2.0m)'])
 
-# Area statistics per classification
-stats_lines = [
-    f"ELEVATION CLASSIFICATION SUMMARY",
-    f"{'='*35}",
-    f"Below MSL (<0m):        {(z < 0).sum():3d} pts ({(z < 0).mean()*100:4.1f}%)",
-    f"Low (0 to +0.15m):      {((z >= 0) & (z < 0.15)).sum():3d} pts ({((z >= 0) & (z < 0.15)).mean()*100:4.1f}%)",
-    f"Marginal (0.15-0.30m):  {((z >= 0.15) & (z < 0.30)).sum():3d} pts ({((z >= 0.15) & (z < 0.30)).mean()*100:4.1f}%)",
-    f"OPTIMAL (0.30-0.60m):   {((z >= 0.30) & (z <= 0.60)).sum():3d} pts ({((z >= 0.30) & (z <= 0.60)).mean()*100:4.1f}%)",
-    f"Marginal (0.60-1.00m):  {((z > 0.60) & (z <= 1.00)).sum():3d} pts ({((z > 0.60) & (z <= 1.00)).mean()*100:4.1f}%)",
-    f"Above optimal (>1.0m):  {(z > 1.00).sum():3d} pts ({(z > 1.00).mean()*100:4.1f}%)",
+# Area statistics per classification (DEM cells within the planting zones)
+class_table = class_areas('phase2_surface', 'final_poly')
+class_ha = class_table.groupby('class', sort=False)['area_ha'].sum()
+total_ha = max(class_ha.sum(), 1e-9)
+summary_rows = [
+    ("Below MSL (<0m):", ['Deep', 'Sub-MSL']),
+    ("Low (0 to +0.15m):", ['Low']),
+    ("Marginal (0.15-0.30m):", ['Marginal Low']),
+    ("OPTIMAL (0.30-0.60m):", ['Optimal']),
+    ("Marginal (0.60-1.00m):", ['Marginal High']),
+    ("Above optimal (>1.0m):", ['Above', 'High']),
 ]
+stats_lines = [
+    f"ELEVATION CLASSIFICATION SUMMARY (DEM AREA)",
+    f"{'='*43}",
+] + [f"{label:<24}{class_ha[classes].sum():7.1f} ha ({class_ha[classes].sum() / total_ha * 100:4.1f}%)"
+     for label, classes in summary_rows]
 
 ax.text(0.02, 0.97, '\n'.join(stats_lines), transform=ax.transAxes,
         fontsize=7.5, verticalalignment='top', family='monospace',
@@ -511,6 +582,9 @@ site_terrain_cmap = LinearSegmentedColormap.from_list('site_terrain',
      '#B2182B', '#67001F'],
     N=256)
 
+# Share of each site's DEM area in the optimal band (cached class table)
+site_optimal_pct = optimal_pct(class_table)
+
 for i, (title, zone_gdf, color) in enumerate(site_configs):
     ax = axes[i // 2][i % 2]
     ax.set_facecolor('#F5F5F5')
@@ -520,34 +594,27 @@ for i, (title, zone_gdf, color) in enumerate(site_configs):
         area_ha = zone_gdf['AREA_HA'].iloc[0]
 
         # Find points within or near this zone
-        zone_buffer = zone_gdf.copy()
-        zone_buffer['geometry'] = zone_buffer.geometry.buffer(0.005)
-        pts_in_zone = gpd.sjoin(all_pts, zone_buffer, how='inner', predicate='within')
+        pts_in_zone = all_pts.loc[np.unique(np.concatenate(
+            [zone_members.points(site_id) for site_id in zone_gdf.index]))]
 
         if len(pts_in_zone) > 0:
-            # Create per-site interpolation grid clipped to site boundary
-            sb = zone_geom.bounds
-            sm = 0.001
-            sxi = np.linspace(sb[0] - sm, sb[2] + sm, 300)
-            syi = np.linspace(sb[1] - sm, sb[3] + sm, 300)
-            sxi_grid, syi_grid = np.meshgrid(sxi, syi)
-
-            # Interpolate (use linear for sites with fewer points)
-            method = 'cubic' if len(pts_in_zone) >= 10 else 'linear'
-            szi_grid = griddata(
-                (pts_in_zone.geometry.x.values, pts_in_zone.geometry.y.values),
-                pts_in_zone['ELEVATION'].values,
-                (sxi_grid, syi_grid), method=method
-            )
-
-            # Clip to site boundary
-            site_mask = create_polygon_mask(zone_geom, sxi_grid, syi_grid)
-            szi_clipped = np.where(site_mask, szi_grid, np.nan)
+            # Per-site grid at SITE_CELL_M, clipped to the site boundary
+            zone_utm = final_poly_utm.geometry.loc[zone_gdf.index[0]]
+            site_spec = GridSpec.from_cell_size(zone_utm.bounds, SITE_CELL_M, margin=100)
+
+            # Same surface and method as phase2_surface, on a finer grid, so the
+            # per-site and project maps agree over the same ground
+            surface.write_dem(site_spec, f"site_{i + 1}_surface", DEM_METHOD, clip=[zone_utm],
+                              crs=DEM_CRS,
+                              source_key=f"{surface.data_hash}_{site_spec.key()}_{DEM_METHOD}_{zones_key}")
+            sxi_grid, syi_grid, szi_clipped = dem_preview(f"site_{i + 1}_surface", to_crs=WGS84)
+            write_derivatives(f"site_{i + 1}_surface")
 
             # Plot interpolated DEM surface
             im = ax.pcolormesh(sxi_grid, syi_grid, szi_clipped,
                               cmap=site_terrain_cmap, shading='auto',
                               vmin=-1, vmax=2)
+            add_hillshade(ax, f"site_{i + 1}_surface", to_crs=WGS84, alpha=0.3, zorder=1.5)
 
             # Plot zone boundary (white border on top)
             gpd.GeoSeries([zone_geom]).plot(ax=ax, facecolor='none',
@@ -559,14 +626,12 @@ for i, (title, zone_gdf, color) in enumerate(site_configs):
                            s=50, zorder=5, edgecolors='white', linewidth=0.8,
                            vmin=-1, vmax=2)
 
-            # Label each point
-            for _, pt in pts_in_zone.iterrows():
-                ax.annotate(f"{pt['ELEVATION']:.1f}m",
-                           xy=(pt.geometry.x, pt.geometry.y),
-                           xytext=(4, 4), textcoords='offset points',
-                           fontsize=5.5, color='#333', fontweight='bold',
-                           bbox=dict(boxstyle='round,pad=0.1', facecolor='white',
-                                     alpha=0.7, edgecolor='none'))
+            # Label points (non-overlapping subset, optimal-band points first)
+            add_labels(ax, pts_in_zone.geometry.x, pts_in_zone.geometry.y,
+                       [f"{e:.1f}m" for e in pts_in_zone['ELEVATION']],
+                       priority=-(pts_in_zone['ELEVATION'] - 0.45).abs(),
+                       offset=(4, 4), fontsize=5.5, color='#333',
+                       box_facecolor='white', box_alpha=0.7, pad=0.1)
 
             # Contour lines within site
             szi_ma = np.ma.masked_invalid(szi_clipped)
@@ -586,15 +651,19 @@ for i, (title, zone_gdf, color) in enumerate(site_configs):
             cbar.ax.axhline(y=0.60, color='#1B5E20', linewidth=2, linestyle='--')
 
             # Set extent to site boundary
-            ax.set_xlim(sb[0] - sm, sb[2] + sm)
-            ax.set_ylim(sb[1] - sm, sb[3] + sm)
+            ax.set_xlim(zone_geom.bounds[0] - 0.001, zone_geom.bounds[2] + 0.001)
+            ax.set_ylim(zone_geom.bounds[1] - 0.001, zone_geom.bounds[3] + 0.001)
 
             # Stats
             elev_zone = pts_in_zone['ELEVATION']
-            optimal_pct = ((elev_zone >= 0.30) & (elev_zone <= 0.60)).mean() * 100
+            site_optimal = site_optimal_pct.get(zone_gdf.index[0], np.nan)
             stats = (f"n={len(pts_in_zone)} | {area_ha:.0f} ha\n"
                      f"Elev: {elev_zone.min():.2f} to {elev_zone.max():.2f}m\n"
-                     f"Mean: {elev_zone.mean():.2f}m | Optimal: {optimal_pct:.0f}%")
+                     f"Mean: {elev_zone.mean():.2f}m | Optimal: {site_optimal:.0f}% of area")
+            if zone_gdf.index[0] in site_flooded_pct:
+                stats += f"\nFlooded: {site_flooded_pct[zone_gdf.index[0]]:.0f}% of time (mean)"
+            if zone_gdf.index[0] in site_suitable_pct:
+                stats += f"\nSuitable: {site_suitable_pct[zone_gdf.index[0]]:.0f}% of area"
             ax.text(0.02, 0.97, stats, transform=ax.transAxes, fontsize=7,
                     verticalalignment='top', family='monospace',
                     bbox=dict(boxstyle='round,pad=0.3', facecolor='white',
@@ -16,6 +16,25 @@ from docx.oxml.ns import qn, nsdecls
 from docx.oxml import parse_xml
 from pathlib import Path
 import datetime
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+try:
+    from elevation_classes import class_areas, optimal_pct
+    from project_layers import match_features
+    HAS_DEM_STATS = True
+except ImportError:
+    HAS_DEM_STATS = False
+try:
+    from suitability import SUITABILITY_NAMES, site_scores, suitable_areas, suitable_pct
+    HAS_SUITABILITY = True
+except ImportError:
+    HAS_SUITABILITY = False
+try:
+    from tide_model import station_model
+    HAS_TIDE_MODEL = True
+except ImportError:
+    HAS_TIDE_MODEL = False
 
 # ── Paths ──
 BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
@@ -836,6 +855,24 @@ climate_data = [
     ("Solar Radiation", ">6 kWh/m2/day (among highest globally)"),
 ]
 
+# Tidal levels from the fitted gauge constituents when available
+if HAS_TIDE_MODEL:
+    try:
+        tide_model = station_model('abu_ali')
+    except FileNotFoundError:
+        tide_model = None
+    if tide_model is not None:
+        datums = tide_model.datums()
+        climate_data = [row for row in climate_data if row[0] != "Tidal Range"]
+        climate_data[5:5] = [
+            ("Tidal Range",
+             f"{datums['MHW'] - datums['MLW']:.2f} m mean, {datums['MHHW'] - datums['MLLW']:.2f} m "
+             f"diurnal ({tide_model.regime()}; {len(tide_model.constituents)}-constituent fit)"),
+            ("Tidal Levels (m MSL)",
+             f"HAT {datums['HAT']:+.2f}, MHHW {datums['MHHW']:+.2f}, MHW {datums['MHW']:+.2f}, "
+             f"MLW {datums['MLW']:+.2f}, MLLW {datums['MLLW']:+.2f}, LAT {datums['LAT']:+.2f}"),
+        ]
+
 add_styled_table(doc, ["Parameter", "Value"], climate_data, [2.5, 4.0])
 
 doc.add_paragraph()
@@ -998,6 +1035,30 @@ elev_data = [
      "0%", "Above optimal; target micro-channels"),
 ]
 
+# Report site rows -> final_poly features, matched by NAME or AREA_HA (the
+# report's site numbering need not follow the layer's feature order)
+report_sites = {}
+if HAS_DEM_STATS:
+    report_sites = match_features('final_poly', [row[0] for row in elev_data],
+                                  [float(row[1]) for row in elev_data])
+    unmatched = [row[0] for row in elev_data if row[0] not in report_sites]
+    if unmatched:
+        print(f"  No final_poly feature matches {', '.join(unmatched)}; keeping hand figures")
+
+# % Target as a share of DEM area (cached class table from the DEM maps)
+site_optimal_pct = {}
+if HAS_DEM_STATS:
+    try:
+        site_optimal_pct = optimal_pct(class_areas('phase2_surface', 'final_poly'))
+    except FileNotFoundError:
+        print("  DEM class areas unavailable (run generate_8mm_maps_v2.py); "
+              "using survey-point figures")
+elev_data = [
+    (*row[:5], f"{site_optimal_pct[report_sites[row[0]]]:.0f}%"
+     if report_sites.get(row[0]) in site_optimal_pct else row[5], row[6])
+    for row in elev_data
+]
+
 add_styled_table(doc,
     ["Site", "Area (ha)", "Min (m)", "Max (m)", "Mean (m)",
      "% Target", "Assessment"],
@@ -2066,12 +2127,80 @@ scores = [
     ("Site 4", "0%", "92%", "85%", "90%", "90%", "92%", "88%", "95%", "72%"),
 ]
 
+# Elevation, substrate and tidal columns from the suitability raster
+# (per-site mean criterion scores) where that criterion was scored; a
+# row's weighted total is recomputed only when one of its cells changed
+suit_scores = suit_table = None
+replaced_columns = set()
+if HAS_SUITABILITY:
+    try:
+        suit_scores = site_scores('phase2_surface', 'final_poly')
+        suit_table = suitable_areas('phase2_surface', 'final_poly')
+    except FileNotFoundError:
+        pass
+if suit_scores is not None:
+    weights = [float(w.rstrip('%')) for _, w, _ in criteria_data]
+    engine_columns = {1: 'elevation', 2: 'substrate', 3: 'inundation'}
+    updated = []
+    for row in scores:
+        row = list(row)
+        site_id = report_sites.get(row[0])
+        changed = False
+        for col, criterion in engine_columns.items():
+            value = (suit_scores[criterion].get(site_id)
+                     if criterion in suit_scores and site_id is not None else None)
+            if value is not None and value == value:        # skip missing / NaN
+                row[col] = f"{100 * value:.0f}%"
+                replaced_columns.add(criterion)
+                changed = True
+        if changed:
+            values = [float(v.rstrip('%')) for v in row[1:-1]]
+            row[-1] = f"{sum(v * w for v, w in zip(values, weights)) / sum(weights):.0f}%"
+        updated.append(tuple(row))
+    scores = updated
+
 add_styled_table(doc,
     ["Site", "Elev.", "Substr.", "Tidal", "Salin.", "Wave", "Infra.", "Enviro.", "Logist.", "TOTAL"],
     scores, [0.6, 0.55, 0.6, 0.55, 0.55, 0.55, 0.55, 0.6, 0.6, 0.65])
 
 doc.add_paragraph()
 
+if suit_table is not None:
+    def join_words(words):
+        return words[0] if len(words) == 1 else f"{', '.join(words[:-1])} and {words[-1]}"
+
+    criterion_text = {'elevation': 'elevation band', 'slope': 'slope',
+                      'inundation': 'inundation frequency',
+                      'channel_distance': 'distance to tidal channels',
+                      'substrate': 'substrate class'}
+    column_text = {'elevation': 'Elevation', 'substrate': 'substrate', 'inundation': 'tidal'}
+    used = [criterion_text.get(c, c) for c in suit_scores.columns if c != 'suitability']
+    raster = (f"the multi-criteria suitability raster ({join_words(used)}, each scored 0-1 "
+              f"per DEM cell and combined by weight)")
+    if replaced_columns:
+        columns = [column_text[c] for c in engine_columns.values() if c in replaced_columns]
+        columns[0] = columns[0].capitalize()
+        lead = (f"{join_words(columns)} scores above are area means of {raster}; "
+                f"the other columns are from the field assessment. ")
+    else:
+        lead = f"Scores above are from the field assessment. Suitability comes from {raster}. "
+    doc.add_paragraph(lead + "Suitable area is the part of each site scoring 0.5 or more:")
+    site_suitable_pct = suitable_pct(suit_table)
+    site_labels = {site_id: label for label, site_id in report_sites.items()}
+    suitable_rows = []
+    for site_id, group in suit_table.groupby('site_id'):
+        area = group.set_index('class')['area_ha']
+        suitable_rows.append((
+            site_labels.get(site_id, f"Zone {site_id + 1}"),
+            *[f"{area.get(name, 0):.1f}" for name in SUITABILITY_NAMES],
+            f"{site_suitable_pct.get(site_id, 0):.0f}%",
+        ))
+    suitable_rows.sort(key=lambda row: row[0])
+    add_styled_table(doc,
+        ["Site", *[f"{name} (ha)" for name in SUITABILITY_NAMES], "Suitable"],
+        suitable_rows, [0.8, 1.1, 1.0, 1.2, 1.0, 0.9])
+    doc.add_paragraph()
+
 doc.add_heading('12.3 Recommended Actions', level=2)
 
 actions = [
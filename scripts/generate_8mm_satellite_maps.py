@@ -14,37 +14,43 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib.colors import LinearSegmentedColormap
 from matplotlib.lines import Line2D
-import contextily as ctx
 import numpy as np
 from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from project_layers import load_layer, layer, WEB_MERCATOR
+from plot_layers import plot_polygons
+from label_engine import add_labels
+from site_membership import site_membership
+from tile_cache import add_basemap
+from render_pool import render_all
 
 # ── Paths ──
 BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
-ESRI = BASE / "Work Files - GIS" / "_INBOX" / "ESRI_Data"
 OUTPUT = BASE / "outputs" / "maps" / "8mm_report"
 OUTPUT.mkdir(parents=True, exist_ok=True)
 
-# ── Load shapefiles (WGS84 EPSG:4326) ──
+# ── Load layers (WGS84 EPSG:4326, shared cache) ──
 print("[1/3] Loading shapefiles...")
-final_pts = gpd.read_file(ESRI / "8MM_Final_Locations_Points.shp")
-final_poly = gpd.read_file(ESRI / "8MM_Final_Locations_Polygons.shp")
-ali_pts = gpd.read_file(ESRI / "Abu_Ali_8MM_Sites_Points.shp")
-ali_poly = gpd.read_file(ESRI / "Abu_Ali_8MM_Sites_Polygons.shp")
-all_zones = gpd.read_file(ESRI / "All_Planting_Zones.shp")
-all_pts = gpd.read_file(ESRI / "All_Survey_Points.shp")
-control = gpd.read_file(ESRI / "Control_Sites.shp")
-nursery = gpd.read_file(ESRI / "Nursery_Boundary.shp")
-
-# ── Reproject everything to Web Mercator (EPSG:3857) for tile alignment ──
-print("[2/3] Reprojecting to Web Mercator...")
-final_pts_3857 = final_pts.to_crs(epsg=3857)
-final_poly_3857 = final_poly.to_crs(epsg=3857)
-ali_pts_3857 = ali_pts.to_crs(epsg=3857)
-ali_poly_3857 = ali_poly.to_crs(epsg=3857)
-all_zones_3857 = all_zones.to_crs(epsg=3857)
-all_pts_3857 = all_pts.to_crs(epsg=3857)
-control_3857 = control.to_crs(epsg=3857)
-nursery_3857 = nursery.to_crs(epsg=3857)
+final_poly = load_layer('final_poly', ['AREA_HA'])
+ali_poly = load_layer('ali_poly', [])
+all_zones = load_layer('all_zones', ['NAME', 'AREA_HA'])
+all_pts = load_layer('all_pts', ['ELEVATION'])
+control = load_layer('control', ['NAME'])
+nursery = load_layer('nursery', [])
+
+# ── Web Mercator (EPSG:3857) copies for tile alignment (cached projections) ──
+print("[2/3] Loading Web Mercator layers...")
+final_poly_3857 = layer('final_poly', WEB_MERCATOR, ['AREA_HA'])
+ali_poly_3857 = layer('ali_poly', WEB_MERCATOR, [])
+all_zones_3857 = layer('all_zones', WEB_MERCATOR, ['NAME', 'AREA_HA'])
+all_pts_3857 = layer('all_pts', WEB_MERCATOR, ['ELEVATION'])
+control_3857 = layer('control', WEB_MERCATOR, ['NAME'])
+nursery_3857 = layer('nursery', WEB_MERCATOR, [])
+
+# Survey points per site (cached membership, 100 m buffer in UTM metres)
+site_members = site_membership('all_pts', 'final_poly', buffer_m=100)
 
 # ── Colors ──
 ZONE_COLORS = ['#2E7D32', '#1B5E20', '#388E3C', '#43A047',
@@ -64,8 +70,7 @@ elev_cmap = LinearSegmentedColormap.from_list('elev',
      '#BD0026', '#800026'],
     N=256)
 
-# Satellite tile source
-SATELLITE_TILES = ctx.providers.Esri.WorldImagery
+# Satellite tiles come from the local MBTiles cache (seed with: python scripts/tile_cache.py seed)
 
 
 # ═══════════════════════════════════════════════════════════
@@ -77,21 +82,16 @@ print("  Map 1: Abu Ali Overview on satellite...")
 fig, ax = plt.subplots(1, 1, figsize=(18, 14))
 
 # Plot all planting zones (semi-transparent fill)
-for idx, row in all_zones_3857.iterrows():
-    color = ZONE_COLORS[idx % len(ZONE_COLORS)]
-    gpd.GeoSeries([row.geometry]).plot(ax=ax, color=color, alpha=0.35,
-                                       edgecolor=color, linewidth=1.5)
+zone_colors = [ZONE_COLORS[i % len(ZONE_COLORS)] for i in all_zones_3857.index]
+plot_polygons(ax, all_zones_3857.geometry, facecolor=zone_colors, alpha=0.35,
+              edgecolor=zone_colors, linewidth=1.5)
 
 # Abu Ali polygons (orange dashed border)
-for idx, row in ali_poly_3857.iterrows():
-    gpd.GeoSeries([row.geometry]).plot(ax=ax, facecolor='none',
-                                       edgecolor='#FF6F00', linewidth=2.5,
-                                       linestyle='--')
+plot_polygons(ax, ali_poly_3857.geometry, edgecolor='#FF6F00', linewidth=2.5,
+              linestyle='--')
 
 # Phase 2 polygons (bold green border)
-for idx, row in final_poly_3857.iterrows():
-    gpd.GeoSeries([row.geometry]).plot(ax=ax, facecolor='none',
-                                       edgecolor='#00E676', linewidth=2.5)
+plot_polygons(ax, final_poly_3857.geometry, edgecolor='#00E676', linewidth=2.5)
 
 # Nursery
 nursery_3857.plot(ax=ax, color=NURSERY_COLOR, alpha=0.6,
@@ -146,7 +146,7 @@ for idx, row in control_3857.iterrows():
                 bbox=dict(boxstyle='round,pad=0.2', facecolor='black', alpha=0.7))
 
 # Add satellite basemap
-ctx.add_basemap(ax, source=SATELLITE_TILES, zoom=14)
+add_basemap(ax, zoom=14)
 
 # Colorbar
 cbar = plt.colorbar(scatter, ax=ax, shrink=0.6, pad=0.01)
@@ -199,16 +199,17 @@ print(f"    Saved: {outfile.name} ({outfile.stat().st_size / 1024:.0f} KB)")
 # ═══════════════════════════════════════════════════════════
 print("  Maps 2-5: Per-site dual-panel on satellite...")
 
-for idx, row in final_poly_3857.iterrows():
+def render_site(idx):
+    row = final_poly_3857.loc[idx]
     site_num = idx + 1
     geom = row.geometry
     orig_row = final_poly.iloc[idx]
     area_ha = orig_row['AREA_HA']
 
-    # Get survey points within site (tight buffer ~100m in meters for 3857)
-    site_pts_3857 = all_pts_3857[all_pts_3857.geometry.within(geom.buffer(100))]
-    # Match original elevation data
-    site_pts_orig = all_pts.loc[site_pts_3857.index]
+    # Survey points within site (100 m buffer)
+    site_ids = site_members.points(idx)
+    site_pts_3857 = all_pts_3857.loc[site_ids]
+    site_pts_orig = all_pts.loc[site_ids]
     n_pts = len(site_pts_3857)
 
     # Stats
@@ -251,7 +252,7 @@ for idx, row in final_poly_3857.iterrows():
     ax_left.set_ylim(ext[2], ext[3])
 
     # Add satellite basemap
-    ctx.add_basemap(ax_left, source=SATELLITE_TILES, zoom=15)
+    add_basemap(ax_left, zoom=15)
 
     ax_left.set_title(f'Site {site_num} - Satellite View\n{area_ha:.1f} ha | {n_pts} Survey Points',
                        fontsize=13, fontweight='bold', color='white', pad=12)
@@ -287,16 +288,11 @@ for idx, row in final_poly_3857.iterrows():
             vmin=-3, vmax=3.5
         )
 
-        # Elevation labels
-        for i, (_, pt3857) in enumerate(site_pts_3857.iterrows()):
-            elev_val = site_pts_orig.iloc[i]['ELEVATION']
-            ax_right.annotate(
-                f"{elev_val:.2f}",
-                xy=(pt3857.geometry.x, pt3857.geometry.y),
-                xytext=(5, 5), textcoords='offset points',
-                fontsize=6, color='white', fontweight='bold',
-                bbox=dict(boxstyle='round,pad=0.15', facecolor='black', alpha=0.7)
-            )
+        # Elevation labels (non-overlapping subset, optimal-band points first)
+        add_labels(ax_right, site_pts_3857.geometry.x, site_pts_3857.geometry.y,
+                   [f"{e:.2f}" for e in site_pts_orig['ELEVATION']],
+                   priority=-(site_pts_orig['ELEVATION'] - 0.45).abs(),
+                   offset=(5, 5), fontsize=6, box_alpha=0.7)
 
         # Colorbar
         cbar = plt.colorbar(sc, ax=ax_right, shrink=0.85, pad=0.02)
@@ -309,7 +305,7 @@ for idx, row in final_poly_3857.iterrows():
     ax_right.set_ylim(ext[2], ext[3])
 
     # Add satellite basemap
-    ctx.add_basemap(ax_right, source=SATELLITE_TILES, zoom=15)
+    add_basemap(ax_right, zoom=15)
 
     ax_right.set_title(
         f'Site {site_num} - DEM Elevation Overlay\n'
@@ -344,6 +340,9 @@ for idx, row in final_poly_3857.iterrows():
     outfile = OUTPUT / f"site_{site_num}_satellite_dem.png"
     plt.savefig(str(outfile), dpi=200, bbox_inches='tight', facecolor='black')
     plt.close()
-    print(f"    Saved: {outfile.name} ({outfile.stat().st_size / 1024:.0f} KB)")
+    return outfile
+
+
+render_all(render_site, list(final_poly_3857.index))
 
 print("\nAll satellite basemap maps generated.")
@@ -16,18 +16,33 @@ from matplotlib.colors import LinearSegmentedColormap
 from matplotlib.lines import Line2D
 import numpy as np
 from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from project_layers import load_layer
+from site_membership import site_membership
+from render_pool import render_all
+from label_engine import add_labels
+from elevation_classes import class_areas, optimal_pct
 
 # ── Paths ──
 BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
-ESRI = BASE / "Work Files - GIS" / "_INBOX" / "ESRI_Data"
 OUTPUT = BASE / "outputs" / "maps" / "8mm_report"
 OUTPUT.mkdir(parents=True, exist_ok=True)
 
-# ── Load shapefiles ──
+# ── Load layers (shared cache, only the columns used here) ──
 print("[1/2] Loading shapefiles...")
-final_pts = gpd.read_file(ESRI / "8MM_Final_Locations_Points.shp")
-final_poly = gpd.read_file(ESRI / "8MM_Final_Locations_Polygons.shp")
-all_pts = gpd.read_file(ESRI / "All_Survey_Points.shp")
+final_poly = load_layer('final_poly', ['AREA_HA'])
+all_pts = load_layer('all_pts', ['ELEVATION'])
+site_members = site_membership('all_pts', 'final_poly', buffer_m=100)
+
+# Optimal-band share of each site's DEM area (written by generate_8mm_maps_v2.py);
+# falls back to survey-point counts per site when the DEM (or the site's
+# entry in it) is missing
+try:
+    site_optimal_pct = optimal_pct(class_areas('phase2_surface', 'final_poly'))
+except FileNotFoundError:
+    site_optimal_pct = {}
 
 # ── Color setup ──
 site_colors = ['#2E7D32', '#1B5E20', '#388E3C', '#43A047']
@@ -43,16 +58,18 @@ elev_cmap = LinearSegmentedColormap.from_list('elev',
 # ── Generate dual-panel maps ──
 print("[2/2] Generating side-by-side site maps...")
 
-for idx, row in final_poly.iterrows():
+def render_site(idx):
+    row = final_poly.loc[idx]
     site_num = idx + 1
     area_ha = row['AREA_HA']
     geom = row.geometry
 
-    # Get survey points within site boundary (tight buffer ~100m for edge points)
-    site_pts = all_pts[all_pts.geometry.within(geom.buffer(0.001))]
+    # Survey points within site boundary (100 m buffer for edge points)
+    site_pts = all_pts.loc[site_members.points(idx)]
     n_pts = len(site_pts)
 
     # Compute site stats
+    optimal_basis = 'of area' if idx in site_optimal_pct else 'of points'
     if n_pts > 0 and 'ELEVATION' in site_pts.columns:
         elev_min = site_pts['ELEVATION'].min()
         elev_max = site_pts['ELEVATION'].max()
@@ -60,9 +77,10 @@ for idx, row in final_poly.iterrows():
         in_optimal = site_pts[
             (site_pts['ELEVATION'] >= 0.30) & (site_pts['ELEVATION'] <= 0.60)
         ]
-        pct_optimal = len(in_optimal) / n_pts * 100
+        pct_optimal = site_optimal_pct.get(idx, len(in_optimal) / n_pts * 100)
     else:
-        elev_min = elev_max = elev_mean = pct_optimal = 0
+        elev_min = elev_max = elev_mean = 0
+        pct_optimal = site_optimal_pct.get(idx, 0)
 
     # ── Create figure: 2 panels side by side ──
     fig, (ax_left, ax_right) = plt.subplots(1, 2, figsize=(20, 9))
@@ -130,15 +148,11 @@ for idx, row in final_poly.iterrows():
             vmin=-3, vmax=3.5
         )
 
-        # Add elevation labels on each point
-        for _, pt_row in site_pts.iterrows():
-            ax_right.annotate(
-                f"{pt_row['ELEVATION']:.2f}",
-                xy=(pt_row.geometry.x, pt_row.geometry.y),
-                xytext=(4, 4), textcoords='offset points',
-                fontsize=6, color='white', fontweight='bold',
-                bbox=dict(boxstyle='round,pad=0.15', facecolor='black', alpha=0.6)
-            )
+        # Elevation labels (non-overlapping subset, optimal-band points first)
+        add_labels(ax_right, site_pts.geometry.x, site_pts.geometry.y,
+                   [f"{e:.2f}" for e in site_pts['ELEVATION']],
+                   priority=-(site_pts['ELEVATION'] - 0.45).abs(),
+                   offset=(4, 4), fontsize=6, box_alpha=0.6)
 
         # Add colorbar
         cbar = plt.colorbar(scatter, ax=ax_right, shrink=0.85, pad=0.02)
@@ -168,7 +182,7 @@ for idx, row in final_poly.iterrows():
         f"Min:       {elev_min:+.2f} m\n"
         f"Max:       {elev_max:+.2f} m\n"
         f"Mean:      {elev_mean:+.2f} m\n"
-        f"Optimal:   {pct_optimal:.0f}%\n"
+        f"Optimal:   {pct_optimal:.0f}% {optimal_basis}\n"
         f"(+0.30 to +0.60m MSL)"
     )
     ax_right.text(0.02, 0.97, stats_text, transform=ax_right.transAxes,
@@ -186,6 +200,9 @@ for idx, row in final_poly.iterrows():
     plt.savefig(str(outfile), dpi=200, bbox_inches='tight',
                 facecolor=fig.get_facecolor())
     plt.close()
-    print(f"  Saved: {outfile.name} ({outfile.stat().st_size / 1024:.0f} KB)")
+    return outfile
+
+
+render_all(render_site, list(final_poly.index))
 
 print("\nAll side-by-side site maps generated.")
@@ -0,0 +1,160 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Tidal Inundation and Hydroperiod per DEM Cell
+
+How often, and for how long, each DEM cell is flooded by a tide series
+(e.g. a year of hourly levels), replacing the +0.30-0.60 m band as a
+proxy for inundation. Per cell:
+
+  inundation_frequency   fraction of time the water level is above the cell
+  flood_duration_h       mean length of a flooding event (hours)
+  dry_spell_h            mean length of a dry spell between floods (hours)
+  max_dry_spell_h        longest dry spell in the series (hours)
+
+Every metric depends only on the cell's elevation, so they are computed
+once on a table of elevations LEVEL_STEP apart spanning the tidal range,
+by broadcasting (levels x time) flooded masks in TIME_CHUNK x
+LEVEL_CHUNK blocks; run lengths carry across time chunks. Cells are then
+mapped through the table tile by tile. Cells above the highest tide are
+never flooded and cells below the lowest are always flooded.
+
+Tide levels must be in the DEM's vertical datum (m MSL, EGM2008). The
+metric grids are written as DEM products keyed by the DEM and the tide
+series.
+
+Usage:
+    from hydroperiod import hydroperiod_table, write_hydroperiod
+    tide = load_tide_series(TIDE_SERIES)             # pd.Series, DatetimeIndex
+    paths = write_hydroperiod('phase2_surface', tide)
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from dem_products import DemWriter, iter_dem_tiles, load_dem
+from dem_surface import GridSpec
+
+# ── Paths ──
+BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
+TIDE_SERIES = BASE / "data" / "tides" / "abu_ali_tide_series.csv"
+
+LEVEL_STEP = 0.001       # m between tabulated elevations
+TIME_CHUNK = 1024        # tide samples per broadcast block
+LEVEL_CHUNK = 2048       # elevations per broadcast block
+METRICS = ('inundation_frequency', 'flood_duration_h', 'dry_spell_h', 'max_dry_spell_h')
+
+
+def load_tide_series(path: Path = TIDE_SERIES, time_col: str = None, level_col: str = None) -> pd.Series:
+    """Water levels (m) indexed by time from a CSV; defaults to the first
+    two columns"""
+    df = pd.read_csv(path)
+    time_col = time_col or df.columns[0]
+    level_col = level_col or df.columns[1]
+    series = pd.Series(df[level_col].to_numpy(dtype=float),
+                       index=pd.to_datetime(df[time_col]), name='level')
+    return series.sort_index().dropna()
+
+
+def sample_hours(tide: pd.Series) -> float:
+    """Sampling interval of a (regular) tide series in hours"""
+    return float(np.median(np.diff(tide.index.asi8))) / 3.6e12
+
+
+def hydroperiod_table(levels: np.ndarray, dt_hours: float, elevations: np.ndarray) -> pd.DataFrame:
+    """Hydroperiod metrics for each elevation (rows) over a level series"""
+    levels = np.asarray(levels, dtype=float)
+    elevations = np.asarray(elevations, dtype=float)
+    n_time = len(levels)
+    columns = {name: np.empty(len(elevations)) for name in METRICS}
+
+    for l0 in range(0, len(elevations), LEVEL_CHUNK):
+        elev = elevations[l0:l0 + LEVEL_CHUNK, None]
+        n = len(elev)
+        flooded = np.zeros(n, dtype=np.int64)
+        floods = np.zeros(n, dtype=np.int64)
+        dry_spells = np.zeros(n, dtype=np.int64)
+        longest_dry = np.zeros(n, dtype=np.int64)
+        dry_run = np.zeros(n, dtype=np.int64)       # dry samples carried into the chunk
+        previous = None
+
+        for t0 in range(0, n_time, TIME_CHUNK):
+            wet = levels[None, t0:t0 + TIME_CHUNK] > elev                 # (levels, time)
+            flooded += wet.sum(axis=1)
+            first = wet[:, 0]
+            if previous is None:
+                floods += first
+                dry_spells += ~first
+            else:
+                floods += ~previous & first
+                dry_spells += previous & ~first
+            floods += (~wet[:, :-1] & wet[:, 1:]).sum(axis=1)
+            dry_spells += (wet[:, :-1] & ~wet[:, 1:]).sum(axis=1)
+
+            # Dry run length at every sample: distance to the last wet sample
+            position = np.arange(1, wet.shape[1] + 1)
+            last_wet = np.maximum.accumulate(np.where(wet, position, 0), axis=1)
+            run = position - last_wet
+            run = np.where(last_wet == 0, run + dry_run[:, None], run)
+            longest_dry = np.maximum(longest_dry, run.max(axis=1))
+            dry_run = run[:, -1]
+            previous = wet[:, -1]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns['inundation_frequency'][l0:l0 + n] = flooded / n_time
+            columns['flood_duration_h'][l0:l0 + n] = np.where(
+                floods > 0, flooded * dt_hours / floods, np.nan)
+            columns['dry_spell_h'][l0:l0 + n] = np.where(
+                dry_spells > 0, (n_time - flooded) * dt_hours / dry_spells, np.nan)
+        columns['max_dry_spell_h'][l0:l0 + n] = longest_dry * dt_hours
+
+    return pd.DataFrame(columns, index=pd.Index(elevations, name='elevation_m'))
+
+
+def tide_key(tide: pd.Series) -> str:
+    digest = hashlib.sha256(tide.index.asi8.tobytes())
+    digest.update(tide.to_numpy(dtype=float).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def write_hydroperiod(dem_name: str, tide: pd.Series, out_dir: Path = None) -> Dict[str, Path]:
+    """Per-cell hydroperiod products ``<dem>_<metric>`` for a tide series.
+
+    Skipped when every product already matches the DEM and the series.
+    Returns {metric: COG path}.
+    """
+    _, meta = load_dem(dem_name, out_dir)
+    spec = GridSpec(**meta['spec'])
+    key = f"{meta.get('source_key')}_tide{tide_key(tide)}"
+    writers = {name: DemWriter(spec, f"{dem_name}_{name}", meta['crs'], key, out_dir)
+               for name in METRICS}
+    if all(w.current for w in writers.values()):
+        return {name: w.close() for name, w in writers.items()}
+
+    levels = tide.to_numpy(dtype=float)
+    # Tabulate across the tidal range plus one step either side, where
+    # cells are always / never flooded
+    lo = np.floor(levels.min() / LEVEL_STEP) - 1
+    hi = np.ceil(levels.max() / LEVEL_STEP) + 1
+    elevations = np.arange(lo, hi + 1) * LEVEL_STEP
+    table = hydroperiod_table(levels, sample_hours(tide), elevations)
+    lookup = {name: table[name].to_numpy() for name in METRICS}
+
+    try:
+        for tile, block in iter_dem_tiles(dem_name, out_dir=out_dir):
+            valid = np.isfinite(block)
+            idx = np.clip(np.rint(np.where(valid, block, 0) / LEVEL_STEP) - lo,
+                          0, len(elevations) - 1).astype(np.int64)
+            r0, r1, c0, c1 = tile.core
+            for name, writer in writers.items():
+                values = np.where(valid, lookup[name][idx], np.nan)
+                # Tiles are north-up; DemWriter takes GridSpec rows (south first)
+                writer.write((spec.ny - r1, spec.ny - r0, c0, c1), values[::-1])
+    except BaseException:
+        for w in writers.values():
+            w.abort()
+        raise
+    return {name: w.close() for name, w in writers.items()}
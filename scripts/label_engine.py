@@ -0,0 +1,141 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Collision-aware Point Label Placement
+
+Elevation annotations on dense surveys used one ax.annotate() (Text plus
+FancyBboxPatch) per point, most of them overlapping. A LabelLayer is a
+single artist that, at draw time (so it sees the final limits, figure
+size and dpi):
+
+  1. measures each distinct label string once,
+  2. visits labels in priority order (ties broken by input order) and
+     tries four positions around the point, keeping the first whose box
+     is inside the axes and does not overlap an already placed label -
+     overlaps are found with a uniform-grid spatial index,
+  3. draws every surviving background box as one PatchCollection, then
+     the texts.
+
+The same inputs and figure always give the same labels.
+
+Usage:
+    from label_engine import add_labels
+    add_labels(ax, pts.geometry.x, pts.geometry.y,
+               [f"{e:.2f}" for e in pts['ELEVATION']],
+               priority=abs(pts['ELEVATION'] - 0.45), ...)
+"""
+
+from collections import defaultdict
+from typing import Optional, Sequence
+
+import numpy as np
+from matplotlib.artist import Artist
+from matplotlib.collections import PatchCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.patches import FancyBboxPatch
+from matplotlib.text import Text
+from matplotlib.transforms import IdentityTransform
+
+# Candidate positions relative to the point: NE, NW, SE, SW
+CANDIDATES = ((1, 1), (-1, 1), (1, -1), (-1, -1))
+
+
+class LabelLayer(Artist):
+    """Non-overlapping point labels placed and drawn in one pass"""
+
+    def __init__(self, x, y, texts: Sequence[str], priority=None, offset=(4, 4),
+                 fontsize=6, color='white', fontweight='bold', alpha=None,
+                 box_facecolor: Optional[str] = 'black', box_alpha=0.6,
+                 box_edgecolor='none', pad=0.15, zorder=6):
+        super().__init__()
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.texts = [str(t) for t in texts]
+        n = len(self.texts)
+        # Higher priority is placed first; default keeps input order
+        self.priority = np.zeros(n) if priority is None else np.asarray(priority, dtype=float)
+        self.offset = offset
+        self.prop = FontProperties(size=fontsize, weight=fontweight)
+        self.color = color
+        self.text_alpha = alpha
+        self.box_facecolor = box_facecolor
+        self.box_alpha = box_alpha
+        self.box_edgecolor = box_edgecolor
+        self.pad = pad
+        self.placed = []
+        self.set_zorder(zorder)
+
+    def _place(self, renderer):
+        ax = self.axes
+        px = ax.transData.transform(np.column_stack([self.x, self.y]))
+        to_px = renderer.points_to_pixels(1.0)
+        dx, dy = self.offset[0] * to_px, self.offset[1] * to_px
+        pad = self.pad * self.prop.get_size_in_points() * to_px if self.box_facecolor else 0.0
+
+        sizes = {s: renderer.get_text_width_height_descent(s, self.prop, ismath=False)[:2]
+                 for s in set(self.texts)}
+        if not sizes:
+            return []
+        cell = 2 * max(h for _, h in sizes.values()) + 2 * pad
+        grid = defaultdict(list)
+        x_lo, y_lo, x_hi, y_hi = ax.bbox.extents
+
+        def cells(box):
+            c0, r0 = int(box[0] // cell), int(box[1] // cell)
+            c1, r1 = int(box[2] // cell), int(box[3] // cell)
+            return [(c, r) for c in range(c0, c1 + 1) for r in range(r0, r1 + 1)]
+
+        placed = []
+        order = np.lexsort((np.arange(len(self.texts)), -self.priority))
+        for i in order:
+            if not np.all(np.isfinite(px[i])):
+                continue
+            w, h = sizes[self.texts[i]]
+            for sx, sy in CANDIDATES:
+                tx = px[i, 0] + sx * dx - (w if sx < 0 else 0)
+                ty = px[i, 1] + sy * dy - (h if sy < 0 else 0)
+                box = (tx - pad, ty - pad, tx + w + pad, ty + h + pad)
+                if box[0] < x_lo or box[1] < y_lo or box[2] > x_hi or box[3] > y_hi:
+                    continue
+                keys = cells(box)
+                if any(b[0] < box[2] and box[0] < b[2] and b[1] < box[3] and box[1] < b[3]
+                       for k in keys for b in grid[k]):
+                    continue
+                for k in keys:
+                    grid[k].append(box)
+                placed.append((i, tx, ty, w, h))
+                break
+        return placed
+
+    def draw(self, renderer):
+        if not self.get_visible() or self.axes is None:
+            return
+        placed = self._place(renderer)
+        self.placed = [p[0] for p in placed]
+        if not placed:
+            return
+
+        if self.box_facecolor:
+            pad = self.pad * self.prop.get_size_in_points() * renderer.points_to_pixels(1.0)
+            boxes = PatchCollection(
+                [FancyBboxPatch((tx, ty), w, h, boxstyle=f"round,pad={pad}")
+                 for _, tx, ty, w, h in placed],
+                facecolor=self.box_facecolor, edgecolor=self.box_edgecolor,
+                alpha=self.box_alpha, transform=IdentityTransform())
+            boxes.set_figure(self.figure)
+            boxes.set_clip_box(self.axes.bbox)
+            boxes.draw(renderer)
+
+        text = Text(fontproperties=self.prop, color=self.color, alpha=self.text_alpha,
+                    ha='left', va='bottom', transform=IdentityTransform())
+        text.set_figure(self.figure)
+        for i, tx, ty, _, _ in placed:
+            text.set_position((tx, ty))
+            text.set_text(self.texts[i])
+            text.draw(renderer)
+
+
+def add_labels(ax, x, y, texts: Sequence[str], **kwargs) -> LabelLayer:
+    """Add a LabelLayer to ``ax``; see LabelLayer for options"""
+    layer = LabelLayer(x, y, texts, **kwargs)
+    ax.add_artist(layer)
+    return layer
@@ -0,0 +1,224 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Planting Layout: Seedling Coordinates per Site
+
+Lays a hexagonal or square planting lattice (1-1.5 m spacing) over each
+site polygon in UTM 39N and keeps the points that fall inside the
+polygon and on suitable ground (suitability raster >= MIN_SCORE), giving
+field crews one coordinate per seedling.
+
+The lattice is aligned to multiples of the spacing, so neighbouring
+sites and reruns share the same points. It is generated a band of rows
+at a time (about CHUNK_POINTS candidates per band): each band is tested
+against the polygon clipped to the band with shapely.contains_xy and
+against the memory-mapped suitability grid by direct index lookup, and
+the kept points are appended to the output before the next band is
+made. The full lattice is never held in memory.
+
+Output is GeoParquet (row group per band) or GeoPackage, by suffix,
+with site_id, point_id, lattice row / col, UTM x / y, lon / lat and the
+cell's suitability score; per-site counts go to <output>_counts.csv.
+
+Usage:
+    python scripts/planting_layout.py --spacing 1.2 --pattern hex
+    python scripts/planting_layout.py --spacing 1.5 --pattern square --no-suitability -o layout.gpkg
+
+    from planting_layout import generate_layout
+    counts = generate_layout('final_poly', spacing=1.2, pattern='hex')
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import CRS
+
+from dem_products import load_dem
+from project_layers import CACHE_EXT, UTM_39N, WGS84, layer, transformer
+
+# ── Paths ──
+BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
+LAYOUT_DIR = BASE / "outputs" / "planting"
+
+DEFAULT_SPACING = 1.2     # m between seedlings
+MIN_SCORE = 0.5           # suitability at or above which a point is planted
+CHUNK_POINTS = 1_000_000  # lattice candidates per band
+PATTERNS = ('hex', 'square')
+
+
+def lattice_bands(bounds, spacing: float, pattern: str = 'hex',
+                  chunk_points: int = CHUNK_POINTS) -> Iterator[Tuple[np.ndarray, ...]]:
+    """(row, col, x, y) arrays of the lattice points covering ``bounds``,
+    one band of rows at a time. Hex rows are spacing * sqrt(3) / 2 apart
+    with odd rows shifted by half a spacing."""
+    if pattern not in PATTERNS:
+        raise ValueError(f"Unknown pattern '{pattern}'. Choose from {PATTERNS}")
+    xmin, ymin, xmax, ymax = bounds
+    dy = spacing * np.sqrt(3) / 2 if pattern == 'hex' else spacing
+    shift = spacing / 2 if pattern == 'hex' else 0.0
+    j0, j1 = int(np.floor(ymin / dy)), int(np.ceil(ymax / dy))
+    cols = np.arange(int(np.floor((xmin - shift) / spacing)), int(np.ceil(xmax / spacing)) + 1)
+    band = max(1, chunk_points // len(cols))
+    for a in range(j0, j1 + 1, band):
+        rows = np.arange(a, min(a + band, j1 + 1))
+        jj, ii = np.meshgrid(rows, cols, indexing='ij')
+        x = ii * spacing + (jj % 2) * shift
+        y = jj * dy
+        yield jj.ravel(), ii.ravel(), x.ravel(), y.ravel()
+
+
+class _Suitability:
+    """Nearest-cell lookup of a north-up suitability product (memmap)"""
+
+    def __init__(self, dem_name: str):
+        self.grid, meta = load_dem(f"{dem_name}_suitability")
+        self.a, _, self.x0, _, self.e, self.y0 = meta['transform'][:6]
+
+    def sample(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        col = np.floor((x - self.x0) / self.a).astype(np.int64)
+        row = np.floor((y - self.y0) / self.e).astype(np.int64)
+        inside = (row >= 0) & (row < self.grid.shape[0]) & (col >= 0) & (col < self.grid.shape[1])
+        out = np.full(len(x), np.nan, dtype='float32')
+        out[inside] = self.grid[row[inside], col[inside]]
+        return out
+
+
+class _LayoutWriter:
+    """Append point chunks to GeoParquet (pyarrow row groups) or GPKG"""
+
+    def __init__(self, path: Path, crs):
+        self.path = path
+        self.tmp = path.with_name(path.stem + '.tmp' + path.suffix)
+        self.tmp.unlink(missing_ok=True)
+        self.crs = CRS.from_user_input(crs)
+        self.parquet = path.suffix.lower() == '.parquet'
+        self._writer = None
+
+    def write(self, columns: dict, x: np.ndarray, y: np.ndarray):
+        if len(x) == 0:
+            return
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.table({**columns, 'geometry': shapely.to_wkb(shapely.points(x, y))})
+            if self._writer is None:
+                geo = {'version': '1.0.0', 'primary_column': 'geometry',
+                       'columns': {'geometry': {'encoding': 'WKB', 'geometry_types': ['Point'],
+                                                'crs': self.crs.to_json_dict()}}}
+                schema = table.schema.with_metadata({b'geo': json.dumps(geo).encode()})
+                self._writer = pq.ParquetWriter(self.tmp, schema, compression='zstd')
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            import geopandas as gpd
+
+            gdf = gpd.GeoDataFrame(columns, geometry=shapely.points(x, y), crs=self.crs)
+            gdf.to_file(self.tmp, driver='GPKG', layer='planting_points',
+                        mode='w' if self._writer is None else 'a')
+            self._writer = True
+
+    def close(self) -> Optional[Path]:
+        if self._writer is None:
+            return None
+        if self.parquet:
+            self._writer.close()
+        self.tmp.replace(self.path)
+        return self.path
+
+    def abort(self):
+        if self.parquet and self._writer is not None:
+            self._writer.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+def generate_layout(zones: str = 'final_poly', spacing: float = DEFAULT_SPACING,
+                    pattern: str = 'hex', suitability_dem: Optional[str] = 'phase2_surface',
+                    min_score: float = MIN_SCORE, output: Path = None,
+                    chunk_points: int = CHUNK_POINTS) -> pd.DataFrame:
+    """Stream the planting points of every site in ``zones`` to ``output``.
+
+    With ``suitability_dem`` set, points need a score >= ``min_score`` on
+    ``<suitability_dem>_suitability`` (FileNotFoundError if it has not
+    been written); None keeps every point inside the polygons. Returns
+    per-site counts, also written to ``<output>_counts.csv``.
+    """
+    output = Path(output or LAYOUT_DIR / f"{zones}_{pattern}_{spacing:g}m{CACHE_EXT}")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    sites = layer(zones, UTM_39N, [])
+    suitability = _Suitability(suitability_dem) if suitability_dem else None
+    to_lonlat = transformer(UTM_39N, WGS84)
+    cell_m2 = spacing * spacing * (np.sqrt(3) / 2 if pattern == 'hex' else 1.0)
+
+    writer = _LayoutWriter(output, UTM_39N)
+    rows = []
+    try:
+        for site_id, geom in zip(sites.index, sites.geometry):
+            inside_count = kept_count = 0
+            bounds = geom.bounds
+            for row, col, x, y in lattice_bands(bounds, spacing, pattern, chunk_points):
+                band = shapely.clip_by_rect(geom, bounds[0] - spacing, y.min() - spacing,
+                                            bounds[2] + spacing, y.max() + spacing)
+                shapely.prepare(band)
+                keep = shapely.contains_xy(band, x, y)
+                inside_count += int(keep.sum())
+                score = suitability.sample(x[keep], y[keep]) if suitability else None
+                if score is not None:
+                    good = score >= min_score
+                    keep[np.flatnonzero(keep)[~good]] = False
+                    score = score[good]
+                n = int(keep.sum())
+                if n == 0:
+                    continue
+                lon, lat = to_lonlat.transform(x[keep], y[keep])
+                columns = {
+                    'site_id': np.full(n, site_id, dtype=np.int32),
+                    'point_id': np.arange(kept_count, kept_count + n, dtype=np.int64),
+                    'row': row[keep].astype(np.int32), 'col': col[keep].astype(np.int32),
+                    'x': x[keep], 'y': y[keep], 'lon': lon, 'lat': lat,
+                }
+                if score is not None:
+                    columns['suitability'] = score
+                writer.write(columns, x[keep], y[keep])
+                kept_count += n
+            rows.append({
+                'site_id': site_id,
+                'area_ha': geom.area / 10_000,
+                'lattice_points': inside_count,
+                'planting_points': kept_count,
+                'planted_ha': kept_count * cell_m2 / 10_000,
+                'points_per_ha': kept_count / (geom.area / 10_000) if geom.area else np.nan,
+            })
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+    counts = pd.DataFrame(rows)
+    counts.to_csv(output.with_name(output.stem + '_counts.csv'), index=False)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Planting lattice points per site')
+    parser.add_argument('--zones', default='final_poly')
+    parser.add_argument('--spacing', type=float, default=DEFAULT_SPACING, help='Metres between seedlings')
+    parser.add_argument('--pattern', choices=PATTERNS, default='hex')
+    parser.add_argument('--dem', default='phase2_surface', help='DEM whose _suitability product filters points')
+    parser.add_argument('--no-suitability', action='store_true', help='Keep every point inside the polygons')
+    parser.add_argument('--min-score', type=float, default=MIN_SCORE)
+    parser.add_argument('-o', '--output', type=Path, help='.parquet or .gpkg')
+    args = parser.parse_args()
+
+    counts = generate_layout(args.zones, args.spacing, args.pattern,
+                             None if args.no_suitability else args.dem,
+                             args.min_score, args.output)
+    print(counts.to_string(index=False))
+    print(f"  Total: {counts['planting_points'].sum():,} points")
+
+
+if __name__ == '__main__':
+    main()
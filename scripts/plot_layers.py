@@ -0,0 +1,79 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Collection-based Layer Plotting
+
+Draws a whole polygon layer as one Matplotlib PathCollection instead of
+one GeoSeries (and one collection) per feature. Vertices and path codes
+for every ring are built in bulk with shapely's vectorised accessors,
+and colour, alpha and linewidth may be given per feature, so layers
+with thousands of zones cost one artist. The axes aspect is set as
+GeoSeries.plot sets it, so maps keep their proportions.
+
+Usage:
+    from plot_layers import plot_polygons
+    plot_polygons(ax, all_zones.geometry, facecolor=zone_colors, alpha=0.45,
+                  edgecolor=zone_colors, linewidth=1.5)
+"""
+
+from typing import List
+
+import numpy as np
+import shapely
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path as MplPath
+
+
+def polygon_paths(geoms) -> List[MplPath]:
+    """One compound Path (exterior + holes, all parts) per (Multi)Polygon"""
+    geoms = np.asarray(getattr(geoms, 'array', geoms), dtype=object)
+    n = len(geoms)
+    parts, part_owner = shapely.get_parts(geoms, return_index=True)
+    rings, ring_part = shapely.get_rings(parts, return_index=True)
+    coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+
+    codes = np.full(len(coords), MplPath.LINETO, dtype=MplPath.code_type)
+    if len(coords):
+        starts = np.flatnonzero(np.r_[True, coord_ring[1:] != coord_ring[:-1]])
+        ends = np.r_[starts[1:] - 1, len(coords) - 1]
+        codes[starts] = MplPath.MOVETO
+        codes[ends] = MplPath.CLOSEPOLY
+
+    coord_owner = part_owner[ring_part[coord_ring]]
+    bounds = np.searchsorted(coord_owner, np.arange(n + 1))
+    return [MplPath(coords[a:b], codes[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def plot_polygons(ax, geoms, facecolor='none', edgecolor='black', alpha=None,
+                  linewidth=1.0, linestyle='-', zorder=1, aspect='auto',
+                  **kwargs) -> PathCollection:
+    """Add a polygon layer to ``ax`` as a single collection.
+
+    ``facecolor``, ``edgecolor``, ``alpha`` and ``linewidth`` accept a
+    scalar or one value per feature. As with GeoSeries.plot, ``alpha``
+    applies to both fill and outline.
+
+    ``aspect='auto'`` follows geopandas: 'equal' for projected or
+    CRS-less geometries, 1 / cos(mid-latitude) for geographic ones.
+    None leaves the axes aspect alone.
+    """
+    collection = PathCollection(polygon_paths(geoms), facecolors=facecolor,
+                                edgecolors=edgecolor, linewidths=linewidth,
+                                linestyles=linestyle, zorder=zorder, **kwargs)
+    if alpha is not None:
+        collection.set_alpha(alpha)
+    ax.add_collection(collection, autolim=True)
+    ax.autoscale_view()
+    if aspect == 'auto':
+        aspect = _geo_aspect(geoms)
+    if aspect is not None:
+        ax.set_aspect(aspect)
+    return collection
+
+
+def _geo_aspect(geoms):
+    crs = getattr(geoms, 'crs', None)
+    if crs is None or not crs.is_geographic:
+        return 'equal'
+    arr = np.asarray(getattr(geoms, 'array', geoms), dtype=object)
+    _, miny, _, maxy = shapely.total_bounds(arr)
+    return 1 / np.cos(np.radians((miny + maxy) / 2))
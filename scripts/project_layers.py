@@ -0,0 +1,287 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Shared Layer Loader for all map scripts
+
+Each ESRI shapefile is read once and converted to a GeoParquet cache
+(GeoPackage when pyarrow is unavailable). The cache is keyed by the
+size/mtime of the shapefile parts and, when those change, by their
+SHA-256, so touching a file without editing it does not force a rebuild.
+Scripts ask only for the columns they use.
+
+Working-CRS copies (Web Mercator for basemap rendering, UTM 39N for
+metric work) are cached next to the WGS84 cache and rebuilt only when
+the source content changes. Transformers are pooled per thread and
+large point layers are reprojected in chunks across threads.
+
+Usage:
+    from project_layers import load_layer, layer, UTM_39N
+    all_pts = load_layer('all_pts', ['ELEVATION'])
+    sites_m = layer('final_poly', UTM_39N, ['AREA_HA'])
+"""
+
+import hashlib
+import importlib.util
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from pyproj import CRS, Transformer
+
+# ── Paths ──
+BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
+ESRI = BASE / "Work Files - GIS" / "_INBOX" / "ESRI_Data"
+CACHE = BASE / "data" / "cache" / "layers"
+
+LAYERS = {
+    'final_pts': "8MM_Final_Locations_Points.shp",
+    'final_poly': "8MM_Final_Locations_Polygons.shp",
+    'ali_pts': "Abu_Ali_8MM_Sites_Points.shp",
+    'ali_poly': "Abu_Ali_8MM_Sites_Polygons.shp",
+    'all_zones': "All_Planting_Zones.shp",
+    'all_pts': "All_Survey_Points.shp",
+    'control': "Control_Sites.shp",
+    'nursery': "Nursery_Boundary.shp",
+}
+# Layers that may be absent; callers check source_path(name).exists()
+OPTIONAL_LAYERS = {
+    'channels': "Tidal_Channels.shp",
+}
+
+SHAPEFILE_PARTS = {'.shp', '.shx', '.dbf', '.prj', '.cpg'}
+
+# ── Working CRS ──
+WGS84 = 4326
+WEB_MERCATOR = 3857
+UTM_39N = 32639          # Abu Ali / Jubail coast
+WORKING_CRS = (WEB_MERCATOR, UTM_39N)
+
+POINT_CHUNK = 50_000     # points per reprojection task
+REPROJECT_WORKERS = 4
+
+# GeoParquet needs pyarrow; GeoPackage is the fallback cache format
+CACHE_EXT = '.parquet' if importlib.util.find_spec('pyarrow') else '.gpkg'
+
+_validated = set()
+_loaded: Dict[tuple, gpd.GeoDataFrame] = {}
+_transformers = threading.local()
+
+
+def source_path(name: str) -> Path:
+    registry = {**LAYERS, **OPTIONAL_LAYERS}
+    if name not in registry:
+        raise KeyError(f"Unknown layer '{name}'. Choose from {sorted(registry)}")
+    return ESRI / registry[name]
+
+
+def _parts(shp: Path):
+    return sorted(p for p in shp.parent.glob(shp.stem + '.*')
+                  if p.suffix.lower() in SHAPEFILE_PARTS)
+
+
+def _stat_key(shp: Path) -> Dict:
+    return {p.name: [p.stat().st_size, p.stat().st_mtime_ns] for p in _parts(shp)}
+
+
+def source_hash(shp: Path) -> str:
+    """SHA-256 over every part of a shapefile"""
+    digest = hashlib.sha256()
+    for part in _parts(shp):
+        digest.update(part.name.encode())
+        with open(part, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_valid(shp: Path, manifest_file: Path, cache_file: Path) -> bool:
+    if not (manifest_file.exists() and cache_file.exists()):
+        return False
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    stat = _stat_key(shp)
+    if manifest.get('stat') == stat:
+        return True
+    # Files were touched; only a content change invalidates the cache
+    if manifest.get('sha256') == source_hash(shp):
+        manifest['stat'] = stat
+        with open(manifest_file, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return True
+    return False
+
+
+def _build_cache(name: str, shp: Path, manifest_file: Path, cache_file: Path):
+    gdf = gpd.read_file(shp)
+    CACHE.mkdir(parents=True, exist_ok=True)
+    if CACHE_EXT == '.parquet':
+        gdf.to_parquet(cache_file)
+    else:
+        gdf.to_file(cache_file, driver='GPKG', layer=name)
+    with open(manifest_file, 'w') as f:
+        json.dump({'source': str(shp), 'stat': _stat_key(shp),
+                   'sha256': source_hash(shp), 'columns': list(gdf.columns)}, f, indent=2)
+
+
+def _read_cache(cache_file: Path, layer_name: str, columns: Optional[Sequence[str]]):
+    if CACHE_EXT == '.parquet':
+        read_columns = None if columns is None else list(columns) + ['geometry']
+        return gpd.read_parquet(cache_file, columns=read_columns)
+    gdf = gpd.read_file(cache_file, layer=layer_name)
+    if columns is not None:
+        gdf = gdf[list(columns) + ['geometry']]
+    return gdf
+
+
+def cache_path(name: str) -> Path:
+    return CACHE / f"{name}{CACHE_EXT}"
+
+
+def load_layer(name: str, columns: Optional[Sequence[str]] = None) -> gpd.GeoDataFrame:
+    """Load a project layer (WGS84) from the cache, rebuilding it if stale.
+
+    ``columns`` limits the attribute columns read from disk; geometry is
+    always included. Within one process each layer is validated once and
+    each (layer, columns) read is memoised.
+    """
+    key = (name, tuple(columns) if columns is not None else None)
+    if key not in _loaded:
+        cache_file = cache_path(name)
+        if name not in _validated:
+            shp = source_path(name)
+            manifest_file = CACHE / f"{name}.json"
+            if not _cache_valid(shp, manifest_file, cache_file):
+                _build_cache(name, shp, manifest_file, cache_file)
+            _validated.add(name)
+
+        _loaded[key] = _read_cache(cache_file, name, columns)
+    return _loaded[key].copy()
+
+
+def transformer(src, dst) -> Transformer:
+    """Pooled Transformer for (src, dst); one instance per thread since
+    pyproj transformers must not be shared across threads"""
+    pool = getattr(_transformers, 'pool', None)
+    if pool is None:
+        pool = _transformers.pool = {}
+    key = (CRS.from_user_input(src).to_string(), CRS.from_user_input(dst).to_string())
+    if key not in pool:
+        pool[key] = Transformer.from_crs(key[0], key[1], always_xy=True)
+    return pool[key]
+
+
+def _transform_xy(src, dst, xy: np.ndarray) -> np.ndarray:
+    x, y = transformer(src, dst).transform(xy[:, 0], xy[:, 1])
+    return np.column_stack([x, y])
+
+
+def reproject(gdf: gpd.GeoDataFrame, crs, workers: int = REPROJECT_WORKERS) -> gpd.GeoDataFrame:
+    """Reproject with a pooled transformer. Point layers larger than
+    POINT_CHUNK are split into chunks transformed on worker threads
+    (PROJ releases the GIL)."""
+    src = gdf.crs
+    dst = CRS.from_user_input(crs)
+    geoms = np.asarray(gdf.geometry.array)
+    is_points = len(geoms) > 0 and bool(np.all(shapely.get_type_id(geoms) == 0))
+
+    if is_points and len(geoms) > POINT_CHUNK:
+        xy = shapely.get_coordinates(geoms)
+        chunks = [xy[i:i + POINT_CHUNK] for i in range(0, len(xy), POINT_CHUNK)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            out = np.concatenate(list(pool.map(lambda c: _transform_xy(src, dst, c), chunks)))
+        new_geoms = shapely.points(out)
+    else:
+        new_geoms = shapely.transform(geoms, lambda c: _transform_xy(src, dst, c))
+
+    result = gdf.copy()
+    result.geometry = gpd.GeoSeries(new_geoms, index=gdf.index, crs=dst)
+    return result
+
+
+def projected_cache_path(name: str, epsg: int) -> Path:
+    return CACHE / f"{name}.{epsg}{CACHE_EXT}"
+
+
+def layer_sha256(name: str) -> str:
+    """Content hash of a layer's source shapefile (validating its cache first);
+    derived caches key on this"""
+    load_layer(name, [])
+    with open(CACHE / f"{name}.json") as f:
+        return json.load(f)['sha256']
+
+
+def layer(name: str, crs=WGS84, columns: Optional[Sequence[str]] = None) -> gpd.GeoDataFrame:
+    """Load a project layer in ``crs``; projections are cached on disk.
+
+    The projected cache records the SHA-256 of the source it was built
+    from, so it is rebuilt whenever the WGS84 cache is.
+    """
+    epsg = CRS.from_user_input(crs).to_epsg()
+    if epsg == WGS84:
+        return load_layer(name, columns)
+    if epsg is None:
+        return reproject(load_layer(name, columns), crs)
+
+    key = (name, epsg, tuple(columns) if columns is not None else None)
+    if key not in _loaded:
+        source_sha = layer_sha256(name)
+        cache_file = projected_cache_path(name, epsg)
+        manifest_file = CACHE / f"{name}.{epsg}.json"
+        fresh = False
+        if cache_file.exists() and manifest_file.exists():
+            with open(manifest_file) as f:
+                fresh = json.load(f).get('sha256') == source_sha
+        if not fresh:
+            projected = reproject(load_layer(name), epsg)
+            if CACHE_EXT == '.parquet':
+                projected.to_parquet(cache_file)
+            else:
+                projected.to_file(cache_file, driver='GPKG', layer=name)
+            with open(manifest_file, 'w') as f:
+                json.dump({'sha256': source_sha, 'epsg': epsg}, f, indent=2)
+        _loaded[key] = _read_cache(cache_file, name, columns)
+    return _loaded[key].copy()
+
+
+def _normalise(text) -> str:
+    return ''.join(ch for ch in str(text).lower() if ch.isalnum())
+
+
+def match_features(name: str, labels: Sequence[str], areas_ha: Sequence[float],
+                   name_col: str = 'NAME', area_col: str = 'AREA_HA',
+                   tolerance: float = 0.05) -> Dict[str, int]:
+    """Map labelled rows (e.g. report table rows) to features of a layer.
+
+    A row matches the feature whose ``name_col`` equals its label
+    (ignoring case, spaces and punctuation), else the unclaimed feature
+    whose area (``area_col``, or the UTM area) is within ``tolerance``
+    of the row's area. Each feature is used once; rows without a match
+    are left out, so callers keep their own figures for them.
+    """
+    gdf = load_layer(name)
+    names = gdf[name_col].map(_normalise) if name_col in gdf else None
+    if area_col in gdf:
+        feature_ha = gdf[area_col].astype(float)
+    else:
+        feature_ha = layer(name, UTM_39N, []).area / 10_000
+
+    matched: Dict[str, int] = {}
+    for label in labels:
+        if names is not None:
+            hits = [i for i in names.index[names == _normalise(label)] if i not in matched.values()]
+            if hits:
+                matched[label] = int(hits[0])
+    for label, area in zip(labels, areas_ha):
+        if label in matched:
+            continue
+        free = feature_ha[~feature_ha.index.isin(list(matched.values()))]
+        if free.empty:
+            break
+        error = (free - area).abs() / max(abs(area), 1e-9)
+        if error.min() <= tolerance:
+            matched[label] = int(error.idxmin())
+    return matched
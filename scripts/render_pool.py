@@ -0,0 +1,84 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Parallel Figure Rendering
+
+Per-site figures are independent and CPU-bound (Agg rasterisation and
+PNG encoding), so each one is rendered as a job in a process pool. The
+pool uses the 'fork' start method: workers inherit the layers, colormaps
+and basemap mosaics a script has already loaded, copy-on-write, so
+nothing is pickled except the job argument and the returned path.
+
+Where fork is unavailable (Windows), or with RENDER_WORKERS=1, jobs run
+serially in the calling process. Output paths are chosen by each job,
+so results are identical either way.
+
+Usage:
+    from render_pool import render_all
+
+    def render_site(idx):
+        ...
+        return outfile          # Path written by the job
+
+    render_all(render_site, list(final_poly.index))
+"""
+
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+def default_workers() -> int:
+    env = os.environ.get('RENDER_WORKERS')
+    if env:
+        return max(1, int(env))
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _timed(fn: Callable, job) -> Tuple[object, float]:
+    start = time.perf_counter()
+    output = fn(job)
+    return output, time.perf_counter() - start
+
+
+def _describe(output) -> str:
+    if isinstance(output, (list, tuple)):
+        return ', '.join(_describe(o) for o in output)
+    path = Path(output)
+    if path.exists():
+        return f"{path.name} ({path.stat().st_size / 1024:.0f} KB)"
+    return str(output)
+
+
+def render_all(fn: Callable, jobs: Sequence, workers: Optional[int] = None) -> List[Tuple]:
+    """Render fn(job) for every job, in parallel where fork is available.
+
+    ``fn`` must be a module-level function returning the path(s) it
+    wrote. Returns [(job, output, seconds)] in job order and prints one
+    timing line per job plus the wall-clock total.
+    """
+    jobs = list(jobs)
+    workers = min(workers or default_workers(), len(jobs)) or 1
+    started = time.perf_counter()
+
+    if workers > 1 and 'fork' in mp.get_all_start_methods():
+        ctx = mp.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = [pool.submit(_timed, fn, job) for job in jobs]
+            timed = [f.result() for f in futures]
+    else:
+        workers = 1
+        timed = [_timed(fn, job) for job in jobs]
+
+    results = [(job, output, seconds) for job, (output, seconds) in zip(jobs, timed)]
+    for _, output, seconds in results:
+        print(f"  Saved: {_describe(output)} in {seconds:.1f}s")
+    elapsed = time.perf_counter() - started
+    busy = sum(seconds for _, _, seconds in results)
+    print(f"  {len(results)} figures in {elapsed:.1f}s on {workers} worker(s) "
+          f"({busy:.1f}s of rendering)")
+    return results
@@ -0,0 +1,96 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Site Membership Index
+
+Which survey points belong to which site, computed once for every
+script. Sites are buffered by an explicit distance in metres in UTM 39N
+and queried with a single bulk STRtree predicate query, instead of a
+within() scan over all points per site with degree buffers.
+
+The result is a table of (point_id, site_id, distance_to_boundary),
+cached as Parquet (CSV without pyarrow) and keyed by the SHA-256 of both
+source layers and the buffer distance. distance_to_boundary is in
+metres, positive inside the site and negative in the buffer ring.
+
+Usage:
+    from site_membership import site_membership
+    members = site_membership('all_pts', 'final_poly', buffer_m=100)
+    site_pts = all_pts.loc[members.points(site_id)]
+"""
+
+import hashlib
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from project_layers import CACHE, CACHE_EXT, UTM_39N, layer, layer_sha256
+
+MEMBERSHIP_DIR = CACHE / "membership"
+
+
+class SiteMembership:
+    """Cached membership table with O(k) per-site point lookup"""
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table
+        self._by_site: Dict[int, np.ndarray] = {
+            site: group.to_numpy() for site, group in table.groupby('site_id')['point_id']
+        }
+        self._empty = np.array([], dtype=table['point_id'].dtype)
+
+    def points(self, site_id) -> np.ndarray:
+        """Point ids in a site (ascending, i.e. layer order)"""
+        return self._by_site.get(site_id, self._empty)
+
+    def sites(self):
+        return list(self._by_site)
+
+
+def build_membership(points: str, sites: str, buffer_m: float) -> pd.DataFrame:
+    """One bulk STRtree query of points against buffered sites, in metres"""
+    pts = layer(points, UTM_39N, [])
+    polys = layer(sites, UTM_39N, [])
+    site_geoms = np.asarray(polys.geometry.array)
+    pt_geoms = np.asarray(pts.geometry.array)
+
+    tree = shapely.STRtree(shapely.buffer(site_geoms, buffer_m))
+    pt_idx, site_idx = tree.query(pt_geoms, predicate='within')
+
+    matched_pts = pt_geoms[pt_idx]
+    matched_sites = site_geoms[site_idx]
+    distance = shapely.distance(matched_pts, shapely.boundary(matched_sites))
+    inside = shapely.contains(matched_sites, matched_pts)
+
+    table = pd.DataFrame({
+        'point_id': pts.index.to_numpy()[pt_idx],
+        'site_id': polys.index.to_numpy()[site_idx],
+        'distance_to_boundary': np.where(inside, distance, -distance),
+    })
+    return table.sort_values(['site_id', 'point_id'], ignore_index=True)
+
+
+_memo: Dict[tuple, SiteMembership] = {}
+
+
+def site_membership(points: str = 'all_pts', sites: str = 'final_poly',
+                    buffer_m: float = 100.0) -> SiteMembership:
+    """Membership of ``points`` in ``sites`` buffered by ``buffer_m`` metres (cached)"""
+    key = hashlib.sha256(
+        f"{layer_sha256(points)}|{layer_sha256(sites)}|{float(buffer_m)}".encode()
+    ).hexdigest()[:16]
+    if key not in _memo:
+        ext = '.parquet' if CACHE_EXT == '.parquet' else '.csv'
+        cache_file = MEMBERSHIP_DIR / f"{points}__{sites}__{buffer_m:g}m_{key}{ext}"
+        if cache_file.exists():
+            table = pd.read_parquet(cache_file) if ext == '.parquet' else pd.read_csv(cache_file)
+        else:
+            table = build_membership(points, sites, buffer_m)
+            MEMBERSHIP_DIR.mkdir(parents=True, exist_ok=True)
+            if ext == '.parquet':
+                table.to_parquet(cache_file, index=False)
+            else:
+                table.to_csv(cache_file, index=False)
+        _memo[key] = SiteMembership(table)
+    return _memo[key]
@@ -0,0 +1,303 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Multi-Criteria Planting Suitability
+
+Combines per-cell criterion layers into a 0-1 planting suitability
+raster on the grid of a DEM product, replacing site readiness judged by
+hand from survey-point elevations:
+
+  elevation         DEM (m MSL)                  best +0.30 to +0.60 m
+  slope             <dem>_slope (degrees)        flatter is better
+  inundation        <dem>_inundation_frequency   regular, not permanent, flooding
+  channel_distance  <dem>_channel_distance (m)   near tidal creeks
+  substrate         substrate class COG          mud / muddy sand best
+
+Each criterion scores its layer 0-1, either with a trapezoid
+(lo0, lo1, hi1, hi0) - 0 outside lo0..hi0, 1 inside lo1..hi1, linear
+between - or with a class -> score table for categorical rasters.
+Suitability is the weighted mean of the scores; a criterion marked as a
+constraint sets suitability to 0 wherever it scores 0. Criteria whose
+layer does not exist are left out and the remaining weights rescaled;
+cells where a used layer has no data are NaN unless a constraint is 0.
+
+Layers are COGs opened lazily with rasterio and read one DEM tile at a
+time (through a WarpedVRT when a layer is on another grid), so memory is
+bounded by the tile size. The suitability raster is written as a DEM
+product keyed by the criteria and the layers' keys; per-site suitable
+areas come from elevation_classes.class_areas with SUITABILITY_CLASSES,
+and site_scores() gives per-site mean scores for the readiness tables.
+
+Usage:
+    from suitability import write_suitability, suitable_areas, site_scores
+    write_channel_distance('phase2_surface')          # needs the 'channels' layer
+    write_suitability('phase2_surface')
+    table = suitable_areas('phase2_surface', 'final_poly')
+    scores = site_scores('phase2_surface', 'final_poly')
+"""
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import CRS
+
+from dem_products import DEM_DIR, DEM_TILE, DemWriter, iter_dem_tiles, load_dem, product_paths
+from dem_surface import GridSpec
+from elevation_classes import class_areas
+from project_layers import layer, layer_sha256
+from raster_masks import tile_windows
+from zonal_stats import zone_labels
+
+# ── Paths ──
+BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
+SUBSTRATE = BASE / "data" / "substrate" / "abu_ali_substrate.tif"
+
+INF = float('inf')
+CHANNEL_MAX_DISTANCE = 500.0    # m; distances beyond are stored as this value
+DISTANCE_BATCH = 262_144        # cells per nearest-channel query
+
+# Substrate class codes of the substrate COG and their scores
+SUBSTRATE_CLASSES = {1: 'Sand', 2: 'Muddy sand', 3: 'Mud', 4: 'Sabkha crust', 5: 'Rock / hardground'}
+SUBSTRATE_SCORES = {1: 0.6, 2: 0.9, 3: 1.0, 4: 0.1, 5: 0.0}
+
+# Suitability classes for area tables; Moderate and High count as suitable
+SUITABILITY_CLASSES = (0.0, 0.25, 0.50, 0.75, 1.0)
+SUITABILITY_NAMES = ('Unsuitable', 'Low', 'Moderate', 'High')
+SUITABLE_NAMES = ('Moderate', 'High')
+
+
+@dataclass(frozen=True)
+class Criterion:
+    """One suitability layer. ``raster`` is a DEM product name or a COG
+    path; '{dem}' is replaced by the DEM name. Give either a
+    ``trapezoid`` (lo0, lo1, hi1, hi0) or ``classes`` {code: score}."""
+    name: str
+    raster: str
+    weight: float
+    trapezoid: Optional[Tuple[float, float, float, float]] = None
+    classes: Optional[Dict[int, float]] = None
+    constraint: bool = False
+
+    def score(self, values: np.ndarray) -> np.ndarray:
+        """0-1 scores of a block of layer values (NaN where missing)"""
+        if self.classes is not None:
+            codes = np.array(sorted(self.classes), dtype=float)
+            table = np.array([self.classes[c] for c in sorted(self.classes)], dtype=float)
+            idx = np.clip(np.searchsorted(codes, values), 0, len(codes) - 1)
+            return np.where(codes[idx] == values, table[idx], np.nan)
+        lo0, lo1, hi1, hi0 = self.trapezoid
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rise = np.clip((values - lo0) / (lo1 - lo0), 0.0, 1.0) if np.isfinite(lo0) else 1.0
+            fall = np.clip((hi0 - values) / (hi0 - hi1), 0.0, 1.0) if np.isfinite(hi0) else 1.0
+        return np.where(np.isnan(values), np.nan, np.minimum(rise, fall))
+
+
+DEFAULT_CRITERIA = (
+    Criterion('elevation', '{dem}', 0.30, trapezoid=(0.15, 0.30, 0.60, 1.00), constraint=True),
+    Criterion('slope', '{dem}_slope', 0.10, trapezoid=(-INF, -INF, 1.0, 5.0)),
+    Criterion('inundation', '{dem}_inundation_frequency', 0.25,
+              trapezoid=(0.10, 0.20, 0.45, 0.65), constraint=True),
+    Criterion('channel_distance', '{dem}_channel_distance', 0.15, trapezoid=(-INF, -INF, 50.0, 300.0)),
+    Criterion('substrate', str(SUBSTRATE), 0.20, classes=SUBSTRATE_SCORES),
+)
+
+
+def _raster_path(criterion: Criterion, dem_name: str, out_dir: Path = None) -> Path:
+    source = criterion.raster.format(dem=dem_name)
+    if source.lower().endswith(('.tif', '.tiff')):
+        return Path(source)
+    return product_paths(source, out_dir)['tif']
+
+
+def _raster_key(path: Path) -> str:
+    """Recorded source key of a DEM product, else the file's SHA-256"""
+    meta = path.with_suffix('.json')
+    if meta.exists():
+        with open(meta) as f:
+            key = json.load(f).get('source_key')
+        if key:
+            return key
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def available_criteria(dem_name: str, criteria: Sequence[Criterion] = DEFAULT_CRITERIA,
+                       out_dir: Path = None) -> Tuple[List[Criterion], List[Criterion]]:
+    """(criteria whose layer exists, criteria left out)"""
+    used = [c for c in criteria if _raster_path(c, dem_name, out_dir).exists()]
+    return used, [c for c in criteria if c not in used]
+
+
+class _LayerReader:
+    """Lazily opened COG read window by window on the DEM grid"""
+
+    def __init__(self, path: Path, meta: Dict, categorical: bool):
+        import rasterio
+        from affine import Affine
+        from rasterio.enums import Resampling
+        from rasterio.vrt import WarpedVRT
+
+        self.src = rasterio.open(path)
+        transform = Affine(*meta['transform'])
+        height, width = meta['shape']
+        same_grid = (CRS.from_user_input(self.src.crs.to_wkt()) == CRS.from_user_input(meta['crs'])
+                     and self.src.transform.almost_equals(transform)
+                     and self.src.shape == (height, width))
+        # Near-exact transforms (not GDAL's 0.125 px approximation) so
+        # windowed reads match whole reads
+        self.dataset = self.src if same_grid else WarpedVRT(
+            self.src, crs=meta['crs'], transform=transform, width=width, height=height,
+            resampling=Resampling.nearest if categorical else Resampling.bilinear, tolerance=1e-6)
+
+    def read(self, window: Tuple[int, int, int, int]) -> np.ndarray:
+        from rasterio.windows import Window
+
+        r0, r1, c0, c1 = window
+        data = self.dataset.read(1, window=Window(c0, r0, c1 - c0, r1 - r0), masked=True)
+        return np.ma.filled(data.astype(float), np.nan)
+
+    def close(self):
+        if self.dataset is not self.src:
+            self.dataset.close()
+        self.src.close()
+
+
+def _iter_scores(dem_name: str, criteria: Sequence[Criterion], out_dir: Path = None):
+    """(tile, {criterion: scores}, suitability) per DEM tile, north-up"""
+    dem, meta = load_dem(dem_name, out_dir)
+    total = sum(c.weight for c in criteria)
+    readers = {c.name: _LayerReader(_raster_path(c, dem_name, out_dir), meta, c.classes is not None)
+               for c in criteria}
+    try:
+        for tile in tile_windows(dem.shape[0], dem.shape[1], DEM_TILE):
+            scores = {c.name: c.score(readers[c.name].read(tile.core)) for c in criteria}
+            suit = sum(scores[c.name] * (c.weight / total) for c in criteria)
+            for c in criteria:
+                if c.constraint:
+                    suit = np.where(scores[c.name] == 0, 0.0, suit)
+            yield tile, scores, suit
+    finally:
+        for reader in readers.values():
+            reader.close()
+
+
+def suitability_key(dem_name: str, criteria: Sequence[Criterion], out_dir: Path = None) -> str:
+    parts = [json.dumps(asdict(c), sort_keys=True, default=str) + '|'
+             + _raster_key(_raster_path(c, dem_name, out_dir)) for c in criteria]
+    return hashlib.sha256('||'.join(parts).encode()).hexdigest()[:16]
+
+
+def write_suitability(dem_name: str, criteria: Sequence[Criterion] = DEFAULT_CRITERIA,
+                      out_dir: Path = None) -> Path:
+    """0-1 suitability product ``<dem>_suitability`` from the available
+    criteria, tile by tile. Skipped when it matches the criteria and
+    layers. Returns the COG path."""
+    used, skipped = available_criteria(dem_name, criteria, out_dir)
+    if not used:
+        raise FileNotFoundError(f"No suitability layers found for {dem_name}")
+    for c in skipped:
+        print(f"  (suitability: no {c.name} layer at {_raster_path(c, dem_name, out_dir)}; left out)")
+    _, meta = load_dem(dem_name, out_dir)
+    spec = GridSpec(**meta['spec'])
+    with DemWriter(spec, f"{dem_name}_suitability", meta['crs'],
+                   suitability_key(dem_name, used, out_dir), out_dir) as writer:
+        if not writer.current:
+            for tile, _, suit in _iter_scores(dem_name, used, out_dir):
+                r0, r1, c0, c1 = tile.core
+                # Tiles are north-up; DemWriter takes GridSpec rows (south first)
+                writer.write((spec.ny - r1, spec.ny - r0, c0, c1), suit[::-1])
+    return writer.paths['tif']
+
+
+def write_channel_distance(dem_name: str, channels: str = 'channels',
+                           max_distance: float = CHANNEL_MAX_DISTANCE, out_dir: Path = None) -> Path:
+    """Distance (m) from each DEM cell to the nearest channel line, capped
+    at ``max_distance``, as the product ``<dem>_channel_distance``.
+    Polygon channel layers are measured to their banks."""
+    _, meta = load_dem(dem_name, out_dir)
+    crs = CRS.from_user_input(meta['crs'])
+    if crs.is_geographic:
+        raise ValueError(f"{dem_name} is in {meta['crs']}; channel distance needs a projected DEM")
+    spec = GridSpec(**meta['spec'])
+    key = f"{meta.get('source_key')}_{layer_sha256(channels)}_{max_distance:g}"
+    with DemWriter(spec, f"{dem_name}_channel_distance", meta['crs'], key, out_dir) as writer:
+        if writer.current:
+            return writer.paths['tif']
+        geoms = np.asarray(layer(channels, crs.to_epsg(), []).geometry.array)
+        geoms = shapely.get_parts(np.where(shapely.get_dimensions(geoms) == 2,
+                                           shapely.boundary(geoms), geoms))
+        # Split lines into two-point segments so tree boxes stay small
+        coords, owner = shapely.get_coordinates(geoms, return_index=True)
+        joined = owner[:-1] == owner[1:]
+        segments = shapely.linestrings(np.stack([coords[:-1][joined], coords[1:][joined]], axis=1))
+        tree = shapely.STRtree(segments)
+
+        a, _, x0, _, e, y0 = meta['transform'][:6]
+        for tile, block in iter_dem_tiles(dem_name, out_dir=out_dir):
+            r0, r1, c0, c1 = tile.core
+            rows, cols = np.nonzero(np.isfinite(block))
+            dist = np.full(len(rows), max_distance)
+            for b in range(0, len(rows), DISTANCE_BATCH):
+                pts = shapely.points(x0 + (c0 + cols[b:b + DISTANCE_BATCH] + 0.5) * a,
+                                     y0 + (r0 + rows[b:b + DISTANCE_BATCH] + 0.5) * e)
+                (hit, _), d = tree.query_nearest(pts, max_distance=max_distance,
+                                                 return_distance=True, all_matches=False)
+                dist[b + hit] = d
+            out = np.full(block.shape, np.nan)
+            out[rows, cols] = dist
+            writer.write((spec.ny - r1, spec.ny - r0, c0, c1), out[::-1])
+    return writer.paths['tif']
+
+
+def suitable_areas(dem_name: str = 'phase2_surface', zones: str = 'final_poly',
+                   out_dir: Path = None) -> pd.DataFrame:
+    """(site_id, suitability class) area table of the suitability product"""
+    return class_areas(f"{dem_name}_suitability", zones, SUITABILITY_CLASSES, out_dir,
+                       names=SUITABILITY_NAMES)
+
+
+def suitable_pct(table: pd.DataFrame) -> Dict:
+    """{site_id: % of the site's area in the suitable classes}"""
+    suitable = table[table['class'].isin(SUITABLE_NAMES)]
+    return suitable.groupby('site_id')['pct'].sum().to_dict()
+
+
+def site_scores(dem_name: str = 'phase2_surface', zones: str = 'final_poly',
+                criteria: Sequence[Criterion] = DEFAULT_CRITERIA, out_dir: Path = None) -> pd.DataFrame:
+    """Per-site mean of each available criterion score and of suitability
+    (0-1), indexed by site_id; cached as CSV next to the DEM product"""
+    used, _ = available_criteria(dem_name, criteria, out_dir)
+    key = hashlib.sha256(
+        f"{suitability_key(dem_name, used, out_dir)}|{layer_sha256(zones)}".encode()
+    ).hexdigest()[:16]
+    cache_file = Path(out_dir or DEM_DIR) / f"{dem_name}__{zones}_site_scores_{key}.csv"
+    if cache_file.exists():
+        return pd.read_csv(cache_file, index_col='site_id')
+
+    _, meta = load_dem(dem_name, out_dir)
+    polys = layer(zones, CRS.from_user_input(meta['crs']).to_epsg(), [])
+    labels = zone_labels(zones, product_paths(dem_name, out_dir)['tif'])
+    n = len(polys) + 1
+    names = [c.name for c in used] + ['suitability']
+    sums = {name: np.zeros(n) for name in names}
+    counts = {name: np.zeros(n) for name in names}
+    for tile, scores, suit in _iter_scores(dem_name, used, out_dir):
+        r0, r1, c0, c1 = tile.core
+        lab = np.asarray(labels[r0:r1, c0:c1])
+        for name, values in [*scores.items(), ('suitability', suit)]:
+            valid = (lab > 0) & np.isfinite(values)
+            sums[name] += np.bincount(lab[valid], weights=values[valid], minlength=n)
+            counts[name] += np.bincount(lab[valid], minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        table = pd.DataFrame({name: (sums[name] / counts[name])[1:] for name in names},
+                             index=pd.Index(polys.index, name='site_id'))
+    table.to_csv(cache_file)
+    return table
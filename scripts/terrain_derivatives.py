@@ -0,0 +1,123 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Terrain Derivatives: Slope, Aspect and Hillshade
+
+Slope (degrees), aspect (degrees clockwise from north, downslope
+direction) and hillshade (0-1) from a DEM product, with Horn's 3x3
+finite differences written as array slices. The DEM is read tile by tile
+with a one-cell halo so tiles join without seams, and each derivative is
+streamed to its own DEM product (COG + .npy):
+
+  <dem>_slope, <dem>_aspect, <dem>_hillshade
+
+Products are keyed by the DEM's source key and the illumination, so
+reruns and other scripts reuse them; add_hillshade() draws the cached
+hillshade as a relief underlay on a static map without recomputing it.
+
+Cells next to the clip boundary use the centre value for missing
+neighbours, so the derivatives cover the whole clipped DEM.
+
+Usage:
+    from terrain_derivatives import write_derivatives, add_hillshade
+    write_derivatives('phase2_surface')                  # needs a projected (metre) DEM
+    add_hillshade(ax, 'phase2_surface', to_crs=WGS84)    # ax in lon/lat
+"""
+
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+from pyproj import CRS
+
+from dem_products import DemWriter, dem_preview, iter_dem_tiles, load_dem
+from dem_surface import GridSpec
+
+HILLSHADE_AZIMUTH = 315.0    # degrees clockwise from north (NW light)
+HILLSHADE_ALTITUDE = 45.0    # degrees above the horizon
+DERIVATIVES = ('slope', 'aspect', 'hillshade')
+
+
+def horn_gradient(z: np.ndarray, dx: float, dy: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(dz/dx east, dz/dy north) of the interior of a north-up array
+    with a one-cell border; NaN neighbours take the centre value"""
+    centre = z[1:-1, 1:-1]
+
+    def nb(dr, dc):
+        v = z[1 + dr:z.shape[0] - 1 + dr, 1 + dc:z.shape[1] - 1 + dc]
+        return np.where(np.isnan(v), centre, v)
+
+    a, b, c = nb(-1, -1), nb(-1, 0), nb(-1, 1)
+    d, f = nb(0, -1), nb(0, 1)
+    g, h, i = nb(1, -1), nb(1, 0), nb(1, 1)
+    dzdx = ((c + 2 * f + i) - (a + 2 * d + g)) / (8 * dx)
+    dzdy = ((a + 2 * b + c) - (g + 2 * h + i)) / (8 * dy)
+    return dzdx, dzdy
+
+
+def terrain_block(z: np.ndarray, dx: float, dy: float, azimuth: float = HILLSHADE_AZIMUTH,
+                  altitude: float = HILLSHADE_ALTITUDE) -> Dict[str, np.ndarray]:
+    """Slope, aspect and hillshade of the interior of a bordered block"""
+    dzdx, dzdy = horn_gradient(z, dx, dy)
+    slope = np.arctan(np.hypot(dzdx, dzdy))
+    aspect = np.arctan2(-dzdx, -dzdy)                  # downslope, clockwise from north
+    zenith = np.radians(90.0 - altitude)
+    shade = (np.cos(zenith) * np.cos(slope)
+             + np.sin(zenith) * np.sin(slope) * np.cos(np.radians(azimuth) - aspect))
+
+    missing = np.isnan(z[1:-1, 1:-1])
+    aspect_deg = np.degrees(aspect) % 360.0
+    aspect_deg[slope == 0] = np.nan                    # flat: no aspect
+    out = {
+        'slope': np.degrees(slope),
+        'aspect': aspect_deg,
+        'hillshade': np.clip(shade, 0.0, 1.0),
+    }
+    for band in out.values():
+        band[missing] = np.nan
+    return out
+
+
+def _bordered(block: np.ndarray, tile) -> np.ndarray:
+    """Pad a halo'd block by edge replication where it meets the grid edge"""
+    r0, r1, c0, c1 = tile.core
+    o0, o1, p0, p1 = tile.outer
+    pad = ((1 - (r0 - o0), 1 - (o1 - r1)), (1 - (c0 - p0), 1 - (p1 - c1)))
+    return np.pad(block, pad, mode='edge') if any(sum(pad, ())) else block
+
+
+def write_derivatives(dem_name: str, azimuth: float = HILLSHADE_AZIMUTH,
+                      altitude: float = HILLSHADE_ALTITUDE, out_dir: Path = None) -> Dict[str, Path]:
+    """Slope, aspect and hillshade COGs of a DEM product, tile by tile.
+
+    Skipped when all three products already match the DEM and
+    illumination. Returns {derivative: COG path}.
+    """
+    _, meta = load_dem(dem_name, out_dir)
+    if CRS.from_user_input(meta['crs']).is_geographic:
+        raise ValueError(f"{dem_name} is in {meta['crs']}; derivatives need a projected DEM in metres")
+    spec = GridSpec(**meta['spec'])
+    key = f"{meta.get('source_key')}_az{azimuth:g}_alt{altitude:g}"
+    writers = {name: DemWriter(spec, f"{dem_name}_{name}", meta['crs'], key, out_dir)
+               for name in DERIVATIVES}
+    if not all(w.current for w in writers.values()):
+        try:
+            for tile, block in iter_dem_tiles(dem_name, halo=1, out_dir=out_dir):
+                bands = terrain_block(_bordered(block, tile), spec.dx, spec.dy,
+                                      azimuth, altitude)
+                r0, r1, c0, c1 = tile.core
+                for name, writer in writers.items():
+                    # Tiles are north-up; DemWriter takes GridSpec rows (south first)
+                    writer.write((spec.ny - r1, spec.ny - r0, c0, c1), bands[name][::-1])
+        except BaseException:
+            for w in writers.values():
+                w.abort()
+            raise
+    return {name: w.close() for name, w in writers.items()}
+
+
+def add_hillshade(ax, dem_name: str, to_crs=None, alpha: float = 0.35, zorder: float = 1,
+                  max_cells: int = 800, out_dir: Path = None):
+    """Draw a cached hillshade product as a grey relief layer on ``ax``"""
+    x, y, shade = dem_preview(f"{dem_name}_hillshade", max_cells, to_crs, out_dir)
+    return ax.pcolormesh(x, y, np.ma.masked_invalid(shade), cmap='gray', vmin=0, vmax=1,
+                         alpha=alpha, shading='auto', zorder=zorder, rasterized=True)
@@ -0,0 +1,398 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Tide Gauge Ingest and Harmonic Tide Prediction
+
+Fits tidal harmonic constituents to a local tide-gauge record and
+predicts water levels for any period, so datums and tidal levels come
+from data rather than assumptions in the report text.
+
+  read_gauge_csv   long gauge CSVs read in chunks; sentinel values
+                   dropped, units scaled and shifted to the project datum
+  fit_tide_model   vectorised least squares for mean level plus the
+                   constituents the record length can resolve (Rayleigh
+                   criterion), with nodal amplitude / phase corrections;
+                   normal equations are accumulated chunk by chunk
+  station_model    fitted constituents cached per station as JSON, keyed
+                   by the SHA-256 of the gauge file and the read options,
+                   which are stored with the model and reused
+  TideModel        predict() / series() with nodal factors per day,
+                   factorised into day x time-of-day for regular steps
+                   so a decade at 10-minute steps takes a few tens of
+                   milliseconds. datums() gives HAT, MHHW, MHW, MSL, MLW,
+                   MLLW and LAT from a 18.61-year prediction; regime()
+                   classifies the tide by its form factor
+
+Times are UTC; levels are metres in the gauge datum plus
+``datum_offset_m`` (use the offset to MSL / EGM2008 so predictions are
+on the DEM datum).
+
+Usage:
+    python scripts/tide_model.py fit abu_ali data/tides/gauges/abu_ali.csv --scale 0.001
+    python scripts/tide_model.py datums abu_ali
+
+    from tide_model import station_model
+    model = station_model('abu_ali', TIDE_GAUGE)
+    tide = model.series('2026-01-01', '2027-01-01', freq='10min')
+"""
+
+import argparse
+import hashlib
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ── Paths ──
+BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
+TIDE_GAUGES = BASE / "data" / "tides" / "gauges"
+TIDE_GAUGE = TIDE_GAUGES / "abu_ali.csv"
+CONSTITUENT_CACHE = BASE / "data" / "tides" / "constituents"
+
+EPOCH = pd.Timestamp('2000-01-01')
+CHUNK = 65_536              # samples per fit / prediction block
+CSV_CHUNK_ROWS = 500_000
+MISSING_VALUES = (-99, -999, -9999, 9999, 99999)
+NODAL_CYCLE_YEARS = 18.61
+# read_gauge_csv options recorded with each fitted model
+READ_OPTIONS = {'time_col': None, 'level_col': None, 'scale': 1.0, 'datum_offset_m': 0.0,
+                'missing': list(MISSING_VALUES)}
+
+# Constituent speeds (degrees per hour), most important first so the
+# Rayleigh criterion keeps the major constituent of a close pair
+SPEEDS = {
+    'M2': 28.9841042, 'S2': 30.0000000, 'K1': 15.0410686, 'O1': 13.9430356,
+    'N2': 28.4397295, 'P1': 14.9589314, 'K2': 30.0821373, 'Q1': 13.3986609,
+    'M4': 57.9682084, 'MS4': 58.9841042, 'MN4': 57.4238337, 'M6': 86.9523127,
+    'Sa': 0.0410686, 'Ssa': 0.0821373, 'Mf': 1.0980331, 'Mm': 0.5443747,
+    '2N2': 27.8953548, 'MU2': 27.9682084, 'NU2': 28.5125831, 'L2': 29.5284789,
+    'T2': 29.9589333, 'M3': 43.4761563,
+}
+# Constituents sharing the nodal modulation of a parent: (parent, power)
+NODAL_LIKE = {
+    'N2': ('M2', 1), '2N2': ('M2', 1), 'MU2': ('M2', 1), 'NU2': ('M2', 1), 'L2': ('M2', 1),
+    'MS4': ('M2', 1), 'M4': ('M2', 2), 'MN4': ('M2', 2), 'M6': ('M2', 3), 'M3': ('M2', 1.5),
+    'Q1': ('O1', 1),
+}
+
+
+def nodal_factors(names: Sequence[str], hours: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Amplitude factors f and phase corrections u (radians), shape
+    (len(names), len(hours)), from the longitude of the Moon's node"""
+    days = hours / 24.0 + (EPOCH - pd.Timestamp('1900-01-01')).days
+    n = np.radians(259.1560564 - 0.0529539222 * days)
+    c1, c2, c3 = np.cos(n), np.cos(2 * n), np.cos(3 * n)
+    s1, s2, s3 = np.sin(n), np.sin(2 * n), np.sin(3 * n)
+    base = {
+        'M2': (1.0004 - 0.0373 * c1 + 0.0002 * c2, -2.14 * s1),
+        'K1': (1.0060 + 0.1150 * c1 - 0.0088 * c2 + 0.0006 * c3, -8.86 * s1 + 0.68 * s2 - 0.07 * s3),
+        'O1': (1.0089 + 0.1871 * c1 - 0.0147 * c2 + 0.0014 * c3, 10.80 * s1 - 1.34 * s2 + 0.19 * s3),
+        'K2': (1.0241 + 0.2863 * c1 + 0.0083 * c2 - 0.0015 * c3, -17.74 * s1 + 0.68 * s2 - 0.04 * s3),
+        'Mf': (1.0430 + 0.4140 * c1, -23.74 * s1 + 2.68 * s2 - 0.38 * s3),
+        'Mm': (1.0000 - 0.1300 * c1, 0.0 * s1),
+    }
+    ones, zeros = np.ones_like(hours), np.zeros_like(hours)
+    f = np.empty((len(names), len(hours)))
+    u = np.empty((len(names), len(hours)))
+    for i, name in enumerate(names):
+        if name in base:
+            f[i], u[i] = base[name]
+        elif name in NODAL_LIKE:
+            parent, power = NODAL_LIKE[name]
+            f[i] = base[parent][0] ** power
+            u[i] = base[parent][1] * power
+        else:
+            f[i], u[i] = ones, zeros
+    return f, np.radians(u)
+
+
+def _daily_nodal(names: Sequence[str], hours: np.ndarray):
+    """Nodal factors evaluated once per day and gathered per sample"""
+    day = np.floor(hours / 24.0)
+    days, inverse = np.unique(day, return_inverse=True)
+    f, u = nodal_factors(names, days * 24.0 + 12.0)
+    return f[:, inverse], u[:, inverse]
+
+
+def to_hours(times) -> np.ndarray:
+    """Hours since EPOCH for datetimes (naive = UTC)"""
+    index = pd.DatetimeIndex(times)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return (index.as_unit('ns').asi8 - EPOCH.value) / 3.6e12
+
+
+def resolvable(duration_hours: float, names: Sequence[str] = tuple(SPEEDS)) -> list:
+    """Constituents separable over a record (Rayleigh criterion), keeping
+    the earlier (more important) one of any unresolved pair"""
+    kept = []
+    for name in names:
+        speed = SPEEDS[name]
+        if speed * duration_hours < 360.0:          # less than one full cycle
+            continue
+        if all(abs(speed - SPEEDS[k]) * duration_hours >= 360.0 for k in kept):
+            kept.append(name)
+    return kept
+
+
+def _design(names: Sequence[str], hours: np.ndarray) -> np.ndarray:
+    """[1, f cos(wt + u), f sin(wt + u) ...] columns for a chunk"""
+    f, u = _daily_nodal(names, hours)
+    speeds = np.radians([SPEEDS[n] for n in names])[:, None]
+    phase = speeds * hours[None, :] + u
+    x = np.empty((len(hours), 1 + 2 * len(names)))
+    x[:, 0] = 1.0
+    x[:, 1::2] = (f * np.cos(phase)).T
+    x[:, 2::2] = (f * np.sin(phase)).T
+    return x
+
+
+@dataclass
+class TideModel:
+    """Fitted harmonic model of one station: mean level plus constituents
+    {name: (amplitude m, phase lag deg relative to EPOCH)}"""
+    station: str
+    z0: float
+    constituents: Dict[str, Tuple[float, float]]
+    start: str = ''
+    end: str = ''
+    n_samples: int = 0
+    rms_residual: float = float('nan')
+    source_sha256: str = ''
+    read_options: Dict = field(default_factory=dict)
+    extra: Dict = field(default_factory=dict)
+
+    def predict(self, times) -> np.ndarray:
+        """Water levels (m) at the given times.
+
+        Regularly sampled times are factorised into day x time-of-day:
+        each constituent is a per-day complex coefficient (amplitude,
+        nodal factors, phase at midnight) times exp(i w tau) for the few
+        distinct times of day, so the whole prediction is one small
+        matrix product and a gather. Irregular times are summed directly
+        in chunks.
+        """
+        hours = to_hours(times)
+        names = list(self.constituents)
+        amp = np.array([self.constituents[n][0] for n in names])[:, None]
+        lag = np.radians([self.constituents[n][1] for n in names])[:, None]
+        speeds = np.radians([SPEEDS[n] for n in names])[:, None]
+        if len(hours) == 0:
+            return np.empty(0)
+
+        day = np.floor(hours / 24.0)
+        second = np.rint((hours - day * 24.0) * 3600.0).astype(np.int64)
+        day_idx = (day - day.min()).astype(np.int64)
+        present = np.zeros(86_401, dtype=bool)
+        present[second] = True
+        seconds = np.flatnonzero(present)
+        n_days = int(day_idx.max()) + 1
+        if n_days * len(seconds) <= 4 * len(hours):
+            days = day.min() + np.arange(n_days)
+            f, u = nodal_factors(names, days * 24.0 + 12.0)
+            coeff = amp * f * np.exp(1j * (speeds * days[None, :] * 24.0 + u - lag))
+            rotate = np.exp(1j * speeds * seconds[None, :] / 3600.0)
+            table = self.z0 + (coeff.T @ rotate).real                # (days, times of day)
+            return table[day_idx, np.cumsum(present)[second] - 1]
+
+        out = np.empty(len(hours))
+        for a in range(0, len(hours), CHUNK):
+            h = hours[a:a + CHUNK]
+            f, u = _daily_nodal(names, h)
+            out[a:a + CHUNK] = self.z0 + (amp * f * np.cos(speeds * h[None, :] + u - lag)).sum(axis=0)
+        return out
+
+    def series(self, start, end, freq: str = '10min') -> pd.Series:
+        """Predicted levels on a regular time grid [start, end)"""
+        index = pd.date_range(start, end, freq=freq, inclusive='left')
+        return pd.Series(self.predict(index), index=index, name='level')
+
+    def datums(self, start='2020-01-01', years: float = NODAL_CYCLE_YEARS,
+               freq: str = '10min') -> Dict[str, float]:
+        """Tidal datums (m) from a prediction over ``years`` (a full nodal
+        cycle by default): HAT, MHHW, MHW, MSL, MLW, MLLW, LAT"""
+        start = pd.Timestamp(start)
+        tide = self.series(start, start + pd.Timedelta(days=365.25 * years), freq)
+        level = tide.to_numpy()
+        d = np.diff(level)
+        is_high = np.r_[False, (d[:-1] > 0) & (d[1:] <= 0), False]
+        is_low = np.r_[False, (d[:-1] < 0) & (d[1:] >= 0), False]
+        day = tide.index.floor('D')
+        highs = pd.Series(level[is_high], index=day[is_high])
+        lows = pd.Series(level[is_low], index=day[is_low])
+        return {
+            'HAT': float(level.max()),
+            'MHHW': float(highs.groupby(level=0).max().mean()),
+            'MHW': float(highs.mean()),
+            'MSL': float(level.mean()),
+            'MLW': float(lows.mean()),
+            'MLLW': float(lows.groupby(level=0).min().mean()),
+            'LAT': float(level.min()),
+        }
+
+    def form_factor(self) -> float:
+        """(K1 + O1) / (M2 + S2) amplitude ratio"""
+        amp = {n: self.constituents.get(n, (0.0, 0.0))[0] for n in ('K1', 'O1', 'M2', 'S2')}
+        return (amp['K1'] + amp['O1']) / max(amp['M2'] + amp['S2'], 1e-9)
+
+    def regime(self) -> str:
+        """Tidal regime from the form factor (Courtier classes)"""
+        f = self.form_factor()
+        if f < 0.25:
+            return 'semi-diurnal'
+        if f < 1.5:
+            return 'mixed, mainly semi-diurnal'
+        if f < 3.0:
+            return 'mixed, mainly diurnal'
+        return 'diurnal'
+
+    def to_json(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(asdict(self), f, indent=2)
+
+    @classmethod
+    def from_json(cls, path: Path) -> 'TideModel':
+        with open(path) as f:
+            data = json.load(f)
+        data['constituents'] = {k: tuple(v) for k, v in data['constituents'].items()}
+        return cls(**data)
+
+
+def read_gauge_csv(path: Path, time_col: Optional[str] = None, level_col: Optional[str] = None,
+                   scale: float = 1.0, datum_offset_m: float = 0.0,
+                   missing: Sequence[float] = MISSING_VALUES) -> pd.Series:
+    """Gauge levels (m, project datum) indexed by UTC time, read in chunks.
+
+    Columns default to the first two; ``scale`` converts units (0.001
+    for mm) and ``datum_offset_m`` is added after scaling. Sentinel
+    values, unparsable rows and duplicate timestamps are dropped.
+    """
+    parts = []
+    for chunk in pd.read_csv(path, chunksize=CSV_CHUNK_ROWS):
+        t_col = time_col or chunk.columns[0]
+        l_col = level_col or chunk.columns[1]
+        times = pd.to_datetime(chunk[t_col], errors='coerce', utc=True)
+        levels = pd.to_numeric(chunk[l_col], errors='coerce')
+        keep = times.notna() & levels.notna() & ~levels.isin(missing)
+        parts.append(pd.Series(levels[keep].to_numpy(dtype=float) * scale + datum_offset_m,
+                               index=times[keep].dt.tz_localize(None)))
+    series = pd.concat(parts).sort_index()
+    series = series[~series.index.duplicated(keep='first')]
+    series.name = 'level'
+    return series
+
+
+def fit_tide_model(levels: pd.Series, station: str = '',
+                   names: Optional[Sequence[str]] = None) -> TideModel:
+    """Least-squares harmonic fit of a level series (DatetimeIndex)"""
+    hours = to_hours(levels.index)
+    z = levels.to_numpy(dtype=float)
+    names = resolvable(hours[-1] - hours[0], names or tuple(SPEEDS))
+    k = 1 + 2 * len(names)
+    xtx = np.zeros((k, k))
+    xtz = np.zeros(k)
+    for a in range(0, len(z), CHUNK):
+        x = _design(names, hours[a:a + CHUNK])
+        xtx += x.T @ x
+        xtz += x.T @ z[a:a + CHUNK]
+    coef = np.linalg.solve(xtx, xtz)
+
+    ss = 0.0
+    for a in range(0, len(z), CHUNK):
+        ss += float(((_design(names, hours[a:a + CHUNK]) @ coef - z[a:a + CHUNK]) ** 2).sum())
+    a_cos, b_sin = coef[1::2], coef[2::2]
+    constituents = {
+        name: (float(np.hypot(ac, bs)), float(np.degrees(np.arctan2(bs, ac)) % 360.0))
+        for name, ac, bs in zip(names, a_cos, b_sin)
+    }
+    return TideModel(station=station, z0=float(coef[0]), constituents=constituents,
+                     start=str(levels.index[0]), end=str(levels.index[-1]), n_samples=len(z),
+                     rms_residual=float(np.sqrt(ss / max(len(z), 1))))
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def station_model(station: str, gauge_csv: Optional[Path] = None, **read_kwargs) -> TideModel:
+    """Fitted model for a station, refitted only when the gauge file or
+    the read options change. Without ``gauge_csv`` the cached model is
+    returned (FileNotFoundError if there is none).
+
+    The read options (READ_OPTIONS: columns, unit scale, datum offset,
+    sentinels) are stored with the model; a call without them reuses the
+    stored ones, so a model fitted from the CLI in mm with a datum
+    offset is not refitted in raw units by a caller that only names the
+    gauge file.
+    """
+    unknown = set(read_kwargs) - set(READ_OPTIONS)
+    if unknown:
+        raise TypeError(f"Unknown read options {sorted(unknown)}; use {sorted(READ_OPTIONS)}")
+    cache_file = CONSTITUENT_CACHE / f"{station}.json"
+    cached = TideModel.from_json(cache_file) if cache_file.exists() else None
+    if gauge_csv is None:
+        if cached is None:
+            raise FileNotFoundError(f"No fitted model for '{station}' at {cache_file}")
+        return cached
+
+    options = {**READ_OPTIONS, **(cached.read_options if cached and not read_kwargs else {}),
+               **read_kwargs}
+    options['missing'] = list(options['missing'])
+    source = hashlib.sha256(
+        f"{file_sha256(Path(gauge_csv))}|{json.dumps(options, sort_keys=True)}".encode()
+    ).hexdigest()
+    if cached is not None and cached.source_sha256 == source:
+        return cached
+    model = fit_tide_model(read_gauge_csv(Path(gauge_csv), **options), station)
+    model.source_sha256 = source
+    model.read_options = options
+    model.to_json(cache_file)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tide gauge harmonic analysis and prediction')
+    sub = parser.add_subparsers(dest='command', required=True)
+    fit = sub.add_parser('fit', help='Fit and cache constituents for a station')
+    fit.add_argument('station')
+    fit.add_argument('csv', type=Path)
+    fit.add_argument('--time-col')
+    fit.add_argument('--level-col')
+    fit.add_argument('--scale', type=float, default=1.0, help='Unit scale, e.g. 0.001 for mm')
+    fit.add_argument('--datum-offset', type=float, default=0.0, help='Metres added to reach MSL')
+    datums = sub.add_parser('datums', help='Tidal datums of a cached station')
+    datums.add_argument('station')
+    predict = sub.add_parser('predict', help='Write a predicted series to CSV')
+    predict.add_argument('station')
+    predict.add_argument('start')
+    predict.add_argument('end')
+    predict.add_argument('--freq', default='10min')
+    predict.add_argument('-o', '--output', type=Path, required=True)
+    args = parser.parse_args()
+
+    if args.command == 'fit':
+        model = station_model(args.station, args.csv, time_col=args.time_col,
+                              level_col=args.level_col, scale=args.scale,
+                              datum_offset_m=args.datum_offset)
+        print(f"  {model.station}: {model.n_samples} samples {model.start} to {model.end}, "
+              f"rms residual {model.rms_residual:.3f} m")
+        for name, (amp, phase) in sorted(model.constituents.items(), key=lambda kv: -kv[1][0]):
+            print(f"    {name:<4} {amp:7.4f} m  {phase:6.1f} deg")
+    elif args.command == 'datums':
+        for name, value in station_model(args.station).datums().items():
+            print(f"  {name:<5} {value:+.3f} m")
+    else:
+        station_model(args.station).series(args.start, args.end, args.freq).to_csv(
+            args.output, header=['level_m'], index_label='time')
+        print(f"  -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
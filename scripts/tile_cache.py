@@ -0,0 +1,386 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Offline Basemap Tile Cache (MBTiles)
+
+Map scripts render basemaps from a local MBTiles (SQLite) file instead of
+fetching tiles over the network on every run. A pre-seed command
+downloads every tile covering the project AOI in parallel; rendering
+only ever reads the cache. Tiles missing from the cache are drawn from
+a cached parent tile (up to MAX_PARENT_LEVELS zooms up) or left blank,
+so an offline run still produces maps. Stitched mosaics are cached as
+memory-mapped arrays, so panels and reruns over the same extent reuse
+one mosaic.
+
+Usage:
+    python scripts/tile_cache.py seed                    # project AOI, zooms 12-18
+    python scripts/tile_cache.py seed --zooms 14-16 --bbox 49.4 26.5 49.8 26.9
+    python scripts/tile_cache.py info
+
+    from tile_cache import TileCache, add_basemap
+    add_basemap(ax, zoom=15)                             # ax in EPSG:3857
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+
+# ── Paths ──
+BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
+TILE_DIR = BASE / "data" / "cache" / "tiles"
+
+ESRI_WORLD_IMAGERY = ("https://server.arcgisonline.com/ArcGIS/rest/services/"
+                      "World_Imagery/MapServer/tile/{z}/{y}/{x}")
+DEFAULT_CACHE = TILE_DIR / "esri_world_imagery.mbtiles"
+
+WEB_MERCATOR = 3857
+SEED_ZOOMS = range(12, 19)
+AOI_MARGIN_DEG = 0.02
+TILE_SIZE = 256
+MAX_PARENT_LEVELS = 3
+EARTH_HALF_CIRCUMFERENCE = 20037508.342789244
+
+
+# ── Tile math (XYZ / Web Mercator) ──
+def lonlat_to_tile(lon: float, lat: float, zoom: int) -> Tuple[int, int]:
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds_3857(x: int, y: int, zoom: int) -> Tuple[float, float, float, float]:
+    """(left, bottom, right, top) of a tile in Web Mercator metres"""
+    span = 2 * EARTH_HALF_CIRCUMFERENCE / 2 ** zoom
+    left = -EARTH_HALF_CIRCUMFERENCE + x * span
+    top = EARTH_HALF_CIRCUMFERENCE - y * span
+    return left, top - span, left + span, top
+
+
+def mercator_to_tile(mx: float, my: float, zoom: int) -> Tuple[int, int]:
+    n = 2 ** zoom
+    span = 2 * EARTH_HALF_CIRCUMFERENCE / n
+    x = int((mx + EARTH_HALF_CIRCUMFERENCE) // span)
+    y = int((EARTH_HALF_CIRCUMFERENCE - my) // span)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_bbox(bbox: Sequence[float], zoom: int) -> Iterator[Tuple[int, int, int]]:
+    """XYZ tiles covering a WGS84 (minx, miny, maxx, maxy) bbox"""
+    minx, miny, maxx, maxy = bbox
+    x0, y0 = lonlat_to_tile(minx, maxy, zoom)
+    x1, y1 = lonlat_to_tile(maxx, miny, zoom)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield zoom, x, y
+
+
+def tile_url(source, z: int, x: int, y: int) -> str:
+    """URL for a tile from a template string or an xyzservices TileProvider"""
+    if hasattr(source, 'build_url'):
+        return source.build_url(x=x, y=y, z=z)
+    return source.format(x=x, y=y, z=z)
+
+
+class TileCache:
+    """XYZ tiles stored in an MBTiles file (rows are TMS-flipped per spec)"""
+
+    def __init__(self, path: Path = DEFAULT_CACHE, source=ESRI_WORLD_IMAGERY, name: str = None):
+        self.path = Path(path)
+        self.source = source
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.mosaic_dir = self.path.parent / "mosaics" / self.path.stem
+        self._mosaics = {}
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, "
+                         "tile_row INTEGER, tile_data BLOB, "
+                         "PRIMARY KEY (zoom_level, tile_column, tile_row))")
+            conn.executemany("INSERT OR IGNORE INTO metadata VALUES (?, ?)", [
+                ('name', name or self.path.stem), ('format', 'jpg'), ('type', 'baselayer'),
+                ('scheme', 'xyz-in-tms'), ('source', tile_url(source, '{z}', '{x}', '{y}')),
+            ])
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shareable across threads, nor across
+        # a fork (render_pool workers reopen their own)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _tms_row(z: int, y: int) -> int:
+        return 2 ** z - 1 - y
+
+    def get(self, z: int, x: int, y: int) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+            (z, x, self._tms_row(z, y))).fetchone()
+        return row[0] if row else None
+
+    def has(self, z: int, x: int, y: int) -> bool:
+        return self.get(z, x, y) is not None
+
+    def put_many(self, tiles: Sequence[Tuple[int, int, int, bytes]]):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)",
+                                 [(z, x, self._tms_row(z, y), data) for z, x, y, data in tiles])
+
+    def count(self):
+        return dict(self._conn().execute(
+            "SELECT zoom_level, COUNT(*) FROM tiles GROUP BY zoom_level ORDER BY zoom_level"))
+
+    # ── Seeding ──
+    def seed(self, bbox: Sequence[float], zooms=SEED_ZOOMS, workers: int = 8,
+             batch: int = 200, timeout: int = 30):
+        """Download every missing tile for bbox at each zoom, in parallel.
+
+        Returns {'fetched', 'cached', 'failed'} counts. Failed tiles are
+        simply absent and are retried by the next seed.
+        """
+        wanted = [t for z in zooms for t in tiles_for_bbox(bbox, z)]
+        missing = [t for t in wanted if not self.has(*t)]
+        stats = {'fetched': 0, 'cached': len(wanted) - len(missing), 'failed': 0}
+        if not missing:
+            return stats
+
+        local = threading.local()
+
+        def fetch(tile):
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+            z, x, y = tile
+            response = session.get(tile_url(self.source, z, x, y), timeout=timeout)
+            response.raise_for_status()
+            return z, x, y, response.content
+
+        pending = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(fetch, t) for t in missing]
+            for future in as_completed(futures):
+                try:
+                    pending.append(future.result())
+                    stats['fetched'] += 1
+                except Exception:
+                    stats['failed'] += 1
+                if len(pending) >= batch:
+                    self.put_many(pending)
+                    pending = []
+        if pending:
+            self.put_many(pending)
+        return stats
+
+    # ── Rendering ──
+    def _decode(self, data: bytes) -> np.ndarray:
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as img:
+            return np.asarray(img.convert('RGBA'))
+
+    def _tile_or_parent(self, z: int, x: int, y: int) -> Optional[np.ndarray]:
+        """Tile pixels, or the matching quadrant of a cached ancestor upsampled"""
+        for up in range(MAX_PARENT_LEVELS + 1):
+            data = self.get(z - up, x >> up, y >> up)
+            if data is None:
+                continue
+            img = self._decode(data)
+            if up == 0:
+                return img
+            n = 2 ** up
+            size = img.shape[0] // n
+            ox, oy = (x % n) * size, (y % n) * size
+            part = img[oy:oy + size, ox:ox + size]
+            return np.repeat(np.repeat(part, n, axis=0), n, axis=1)
+        return None
+
+    def _stitch(self, x0: int, y0: int, x1: int, y1: int, zoom: int):
+        """Stitch a tile range; returns (rgba, tiles found, tiles found at zoom)"""
+        image = np.zeros(((y1 - y0 + 1) * TILE_SIZE, (x1 - x0 + 1) * TILE_SIZE, 4), dtype=np.uint8)
+        found = exact = 0
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                tile = self._tile_or_parent(zoom, x, y)
+                if tile is None:
+                    continue
+                if tile.shape[0] != TILE_SIZE:
+                    from PIL import Image
+                    tile = np.asarray(Image.fromarray(tile).resize((TILE_SIZE, TILE_SIZE)))
+                r, c = (y - y0) * TILE_SIZE, (x - x0) * TILE_SIZE
+                image[r:r + TILE_SIZE, c:c + TILE_SIZE] = tile
+                found += 1
+                exact += self.has(zoom, x, y)
+        return image, found, exact
+
+    def mosaic(self, extent: Sequence[float], zoom: int, crs=WEB_MERCATOR):
+        """Stitched (and, for crs other than 3857, warped) basemap for an extent.
+
+        ``extent`` is (xmin, xmax, ymin, ymax) in ``crs``. Mosaics are
+        cached as memory-mapped .npy files keyed by (source, tile range,
+        zoom, crs), so every panel, figure and rerun over the same tiles
+        reuses one array. A mosaic stitched while tiles were missing is
+        rebuilt once the MBTiles file has been re-seeded.
+
+        Returns (rgba array, (left, right, bottom, top)) or (None, None)
+        when nothing for the extent is cached.
+        """
+        epsg = _epsg(crs)
+        xmin, xmax, ymin, ymax = extent
+        if epsg != WEB_MERCATOR:
+            from pyproj import Transformer
+            xmin, ymin, xmax, ymax = Transformer.from_crs(
+                epsg, WEB_MERCATOR, always_xy=True).transform_bounds(xmin, ymin, xmax, ymax)
+        x0, y0 = mercator_to_tile(xmin, ymax, zoom)
+        x1, y1 = mercator_to_tile(xmax, ymin, zoom)
+
+        key = hashlib.sha1(json.dumps(
+            [tile_url(self.source, '{z}', '{x}', '{y}'), zoom, x0, y0, x1, y1, epsg]
+        ).encode()).hexdigest()[:20]
+        if key in self._mosaics:
+            return self._mosaics[key]
+
+        array_file = self.mosaic_dir / f"{key}.npy"
+        meta_file = self.mosaic_dir / f"{key}.json"
+        if array_file.exists() and meta_file.exists():
+            with open(meta_file) as f:
+                meta = json.load(f)
+            if meta['complete'] or meta_file.stat().st_mtime >= self.path.stat().st_mtime:
+                result = np.load(array_file, mmap_mode='r'), tuple(meta['extent'])
+                self._mosaics[key] = result
+                return result
+
+        image, found, exact = self._stitch(x0, y0, x1, y1, zoom)
+        if not found:
+            return None, None
+        left, _, _, top = tile_bounds_3857(x0, y0, zoom)
+        _, bottom, right, _ = tile_bounds_3857(x1, y1, zoom)
+        bounds = (left, right, bottom, top)
+        if epsg != WEB_MERCATOR:
+            image, bounds = _warp(image, bounds, epsg)
+
+        self.mosaic_dir.mkdir(parents=True, exist_ok=True)
+        np.save(array_file, image)
+        with open(meta_file, 'w') as f:
+            json.dump({'extent': bounds, 'zoom': zoom, 'tiles': [x0, y0, x1, y1], 'crs': epsg,
+                       'complete': exact == (x1 - x0 + 1) * (y1 - y0 + 1)}, f)
+        result = np.load(array_file, mmap_mode='r'), bounds
+        self._mosaics[key] = result
+        return result
+
+
+def _epsg(crs) -> int:
+    if isinstance(crs, int):
+        return crs
+    from pyproj import CRS
+    return CRS.from_user_input(crs).to_epsg()
+
+
+def _warp(image: np.ndarray, bounds: Sequence[float], epsg: int):
+    """Warp an EPSG:3857 RGBA mosaic into another CRS"""
+    from rasterio.transform import from_bounds
+    from rasterio.warp import Resampling, calculate_default_transform, reproject
+
+    left, right, bottom, top = bounds
+    height, width = image.shape[:2]
+    src_transform = from_bounds(left, bottom, right, top, width, height)
+    dst_transform, dst_width, dst_height = calculate_default_transform(
+        f"EPSG:{WEB_MERCATOR}", f"EPSG:{epsg}", width, height, left, bottom, right, top)
+    out = np.zeros((4, dst_height, dst_width), dtype=np.uint8)
+    reproject(np.moveaxis(image, -1, 0), out, src_transform=src_transform,
+              src_crs=f"EPSG:{WEB_MERCATOR}", dst_transform=dst_transform,
+              dst_crs=f"EPSG:{epsg}", resampling=Resampling.bilinear)
+    dst_left, dst_top = dst_transform.c, dst_transform.f
+    dst_right = dst_left + dst_transform.a * dst_width
+    dst_bottom = dst_top + dst_transform.e * dst_height
+    return np.moveaxis(out, 0, -1), (dst_left, dst_right, dst_bottom, dst_top)
+
+
+_caches = {}
+
+
+def get_cache(path: Path = DEFAULT_CACHE, source=ESRI_WORLD_IMAGERY) -> TileCache:
+    key = (str(path), str(source))
+    if key not in _caches:
+        _caches[key] = TileCache(path, source)
+    return _caches[key]
+
+
+def add_basemap(ax, zoom: int, cache: Optional[TileCache] = None, crs=WEB_MERCATOR,
+                zorder: int = 0, **kwargs):
+    """Draw a cached basemap under the axes; never touches the network.
+
+    Drop-in for ``ctx.add_basemap(ax, source=..., zoom=...)``; ``crs`` is
+    the CRS of the axes data. Returns False (and leaves the axes
+    untouched) when the cache has nothing for the current extent, e.g.
+    on a machine that has not been seeded.
+    """
+    cache = cache or get_cache()
+    xmin, xmax = ax.get_xlim()
+    ymin, ymax = ax.get_ylim()
+    image, extent = cache.mosaic((xmin, xmax, ymin, ymax), zoom, crs)
+    if image is None:
+        print(f"  [tile cache] no cached tiles at z{zoom} for this extent; basemap skipped")
+        return False
+    ax.imshow(image, extent=extent, interpolation='bilinear', zorder=zorder, **kwargs)
+    # imshow resets limits to the image; keep the caller's view
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+    return True
+
+
+def project_aoi(margin: float = AOI_MARGIN_DEG) -> Tuple[float, float, float, float]:
+    """WGS84 bbox of every project layer, with a margin in degrees"""
+    from project_layers import LAYERS, load_layer
+
+    bounds = np.array([load_layer(name, []).total_bounds for name in LAYERS])
+    return (bounds[:, 0].min() - margin, bounds[:, 1].min() - margin,
+            bounds[:, 2].max() + margin, bounds[:, 3].max() + margin)
+
+
+def _parse_zooms(text: str):
+    lo, _, hi = text.partition('-')
+    return range(int(lo), int(hi or lo) + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline basemap tile cache')
+    parser.add_argument('command', choices=['seed', 'info'])
+    parser.add_argument('--zooms', default='12-18', help='Zoom range, e.g. 12-18')
+    parser.add_argument('--bbox', nargs=4, type=float, metavar=('MINX', 'MINY', 'MAXX', 'MAXY'),
+                        help='WGS84 bbox (default: project AOI from the ESRI layers)')
+    parser.add_argument('--cache', type=Path, default=DEFAULT_CACHE)
+    parser.add_argument('--url', default=ESRI_WORLD_IMAGERY, help='XYZ tile URL template')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    cache = TileCache(args.cache, args.url)
+    if args.command == 'info':
+        for z, n in cache.count().items():
+            print(f"  z{z}: {n} tiles")
+        return
+
+    bbox = tuple(args.bbox) if args.bbox else project_aoi()
+    zooms = _parse_zooms(args.zooms)
+    print(f"Seeding {args.cache.name} for bbox {tuple(round(float(b), 4) for b in bbox)}, zooms {args.zooms}...")
+    stats = cache.seed(bbox, zooms, workers=args.workers)
+    print(f"  fetched {stats['fetched']}, already cached {stats['cached']}, failed {stats['failed']}")
+
+
+if __name__ == '__main__':
+    main()
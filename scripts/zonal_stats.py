@@ -0,0 +1,234 @@
+"""
+8MM Mangrove Restoration Project - Phase 2
+Zonal Statistics for Any Raster over Project Polygons
+
+Per-zone statistics (means, spreads, percentiles) of any single-band
+raster - DEM, slope, NDVI, inundation frequency - over the project
+polygon layers (8MM_Final_Locations_Polygons, Control_Sites,
+Nursery_Boundary, ...).
+
+Zones are rasterised once per raster grid (CRS, transform and shape)
+into an int32 label array cached as .npy, so every raster on the same
+grid and every rerun reuses it. The raster is read one window at a time;
+each window adds to per-zone accumulators with np.bincount and
+reduceat, so memory is bounded by the window size and the zone count,
+not the raster.
+
+Percentiles histogram each zone's values into HIST_BINS bins between
+its own min and max, so they are exact to (max - min) / HIST_BINS. The
+histograms hold n_zones * HIST_BINS int64 counts, and each window only
+bins the zones it contains. The bin edges are only known after the first
+pass, so percentiles need a second one: the zoned cells of the first
+pass are kept in memory (12 bytes each) up to KEEP_CELLS and binned from
+there; larger rasters read the zoned windows again, roughly doubling the
+I/O and decode time. Windows with no zone are skipped in both passes,
+and no second pass is made when only count / sum / mean / std / min /
+max are asked for.
+
+Usage:
+    python scripts/zonal_stats.py outputs/dem/8mm/phase2_surface.tif final_poly control nursery
+    python scripts/zonal_stats.py slope.tif final_poly --stats mean p50 p90 -o slope_stats.csv
+
+    from zonal_stats import zonal_stats
+    table = zonal_stats(dem_tif, ['final_poly', 'control', 'nursery'],
+                        stats=('count', 'mean', 'std', 'p10', 'p50', 'p90'))
+"""
+
+import argparse
+import hashlib
+from pathlib import Path
+from typing import Dict, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import CRS
+
+from project_layers import layer, layer_sha256
+from raster_masks import tile_windows
+
+# ── Paths ──
+BASE = Path(r"D:\My-Applications\70-GIS-Command-Center")
+LABEL_CACHE = BASE / "data" / "cache" / "zone_labels"
+
+WINDOW = 2048            # raster cells per window side
+HIST_BINS = 4096         # percentile resolution per zone
+KEEP_CELLS = 8_000_000   # zoned cells held for the percentile pass (~100 MB)
+DEFAULT_STATS = ('count', 'mean', 'std', 'min', 'max', 'p10', 'p50', 'p90')
+BASIC_STATS = {'count', 'sum', 'mean', 'std', 'min', 'max'}
+
+
+def _grid_key(src) -> str:
+    return hashlib.sha256(
+        f"{src.crs.to_wkt()}|{tuple(src.transform)[:6]}|{src.width}x{src.height}".encode()
+    ).hexdigest()[:16]
+
+
+def _rasterise(zones: str, src, path: Path):
+    """Write the label raster of ``zones`` on the grid of ``src`` window by window"""
+    from rasterio.features import rasterize
+    from rasterio.windows import Window, bounds as window_bounds
+
+    polys = layer(zones, CRS.from_wkt(src.crs.to_wkt()).to_epsg(), [])
+    geoms = np.asarray(polys.geometry.array)
+    tree = shapely.STRtree(geoms)
+
+    tmp = path.with_name(path.stem + '.tmp.npy')
+    labels = np.lib.format.open_memmap(tmp, mode='w+', dtype='int32', shape=(src.height, src.width))
+    for tile in tile_windows(src.height, src.width, WINDOW):
+        r0, r1, c0, c1 = tile.core
+        window = Window(c0, r0, c1 - c0, r1 - r0)
+        hits = tree.query(shapely.box(*window_bounds(window, src.transform)))
+        if len(hits) == 0:
+            labels[r0:r1, c0:c1] = 0
+            continue
+        labels[r0:r1, c0:c1] = rasterize(
+            [(geoms[i], int(i) + 1) for i in np.sort(hits)], out_shape=(r1 - r0, c1 - c0),
+            transform=src.window_transform(window), fill=0, dtype='int32')
+    labels.flush()
+    del labels
+    tmp.replace(path)
+
+
+def zone_labels(zones: str, raster) -> np.memmap:
+    """Memory-mapped (rows, cols) label array of ``zones`` on the grid of
+    ``raster`` (path or open dataset): 0 = no zone, i + 1 = i-th feature
+    of the layer. Built once per layer version and raster grid."""
+    import rasterio
+
+    src = rasterio.open(raster) if isinstance(raster, (str, Path)) else raster
+    try:
+        key = hashlib.sha256(f"{layer_sha256(zones)}|{_grid_key(src)}".encode()).hexdigest()[:16]
+        path = LABEL_CACHE / f"{zones}_{key}.npy"
+        if not path.exists():
+            LABEL_CACHE.mkdir(parents=True, exist_ok=True)
+            _rasterise(zones, src, path)
+    finally:
+        if src is not raster:
+            src.close()
+    return np.load(path, mmap_mode='r')
+
+
+def _windows(src, labels: np.ndarray, band: int):
+    """(labels, values) of the zoned, valid cells of each raster window"""
+    from rasterio.windows import Window
+
+    for tile in tile_windows(src.height, src.width, WINDOW):
+        r0, r1, c0, c1 = tile.core
+        lab = np.asarray(labels[r0:r1, c0:c1])
+        if not lab.any():
+            continue
+        data = src.read(band, window=Window(c0, r0, c1 - c0, r1 - r0), masked=True)
+        valid = (lab > 0) & ~np.ma.getmaskarray(data)
+        values = np.ma.getdata(data)[valid].astype(float)
+        valid_values = np.isfinite(values)
+        yield lab[valid][valid_values], values[valid_values]
+
+
+def _percentile_stats(stats: Sequence[str]) -> Dict[str, float]:
+    out = {}
+    for name in stats:
+        if name not in BASIC_STATS:
+            if not (name.startswith('p') and name[1:].replace('.', '', 1).isdigit()):
+                raise ValueError(f"Unknown statistic '{name}' (use {sorted(BASIC_STATS)} or pNN)")
+            out[name] = float(name[1:])
+    return out
+
+
+def layer_zonal_stats(src, zones: str, stats: Sequence[str] = DEFAULT_STATS,
+                      band: int = 1) -> pd.DataFrame:
+    """Statistics of one open raster over one zone layer, indexed by zone_id"""
+    labels = zone_labels(zones, src)
+    polys = layer(zones, CRS.from_wkt(src.crs.to_wkt()).to_epsg(), [])
+    n = len(polys) + 1
+    percentiles = _percentile_stats(stats)
+
+    count = np.zeros(n, dtype=np.int64)
+    total = np.zeros(n)
+    total_sq = np.zeros(n)
+    lo = np.full(n, np.inf)
+    hi = np.full(n, -np.inf)
+    kept, kept_cells = [], 0
+    for lab, values in _windows(src, labels, band):
+        if percentiles and kept is not None:
+            kept_cells += len(values)
+            if kept_cells <= KEEP_CELLS:
+                kept.append((lab, values))
+            else:
+                kept = None
+        count += np.bincount(lab, minlength=n)
+        total += np.bincount(lab, weights=values, minlength=n)
+        total_sq += np.bincount(lab, weights=values * values, minlength=n)
+        order = np.argsort(lab, kind='stable')
+        ids, starts = np.unique(lab[order], return_index=True)
+        sorted_values = values[order]
+        lo[ids] = np.minimum(lo[ids], np.minimum.reduceat(sorted_values, starts))
+        hi[ids] = np.maximum(hi[ids], np.maximum.reduceat(sorted_values, starts))
+
+    has = count > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(has, total / count, np.nan)
+        std = np.sqrt(np.maximum(np.where(has, total_sq / count, np.nan) - mean ** 2, 0.0))
+    columns = {
+        'count': count, 'sum': total, 'mean': mean, 'std': std,
+        'min': np.where(has, lo, np.nan), 'max': np.where(has, hi, np.nan),
+    }
+
+    if percentiles:
+        width = np.where(has & (hi > lo), (hi - lo) / HIST_BINS, 1.0)
+        hist = np.zeros((n, HIST_BINS), dtype=np.int64)
+        for lab, values in kept if kept is not None else _windows(src, labels, band):
+            bins = np.clip(((values - lo[lab]) / width[lab]).astype(np.int64), 0, HIST_BINS - 1)
+            # Only the zones present in the window, so its cost does not grow with the layer
+            ids, local = np.unique(lab, return_inverse=True)
+            hist[ids] += np.bincount(local * HIST_BINS + bins,
+                                     minlength=len(ids) * HIST_BINS).reshape(len(ids), HIST_BINS)
+        cumulative = np.cumsum(hist, axis=1)
+        for name, q in percentiles.items():
+            target = np.maximum(np.ceil(q / 100 * count), 1)
+            bin_idx = np.array([np.searchsorted(c, t) for c, t in zip(cumulative, target)])
+            value = lo + (np.minimum(bin_idx, HIST_BINS - 1) + 0.5) * width
+            columns[name] = np.where(has, np.clip(value, lo, hi), np.nan)
+
+    table = pd.DataFrame({name: columns[name][1:] for name in stats}, index=polys.index)
+    table.index.name = 'zone_id'
+    return table
+
+
+def zonal_stats(raster, zones: Union[str, Sequence[str]] = 'final_poly',
+                stats: Sequence[str] = DEFAULT_STATS, band: int = 1) -> pd.DataFrame:
+    """Per-zone statistics of ``raster`` over one or more zone layers.
+
+    ``stats`` takes count, sum, mean, std, min, max and percentiles as
+    pNN (p50, p90, p2.5). Returns one row per feature with 'layer' and
+    'zone_id' columns; zones with no valid cells get count 0 and NaN.
+    """
+    import rasterio
+
+    layers = [zones] if isinstance(zones, str) else list(zones)
+    with rasterio.open(raster) as src:
+        tables = [layer_zonal_stats(src, name, stats, band).reset_index().assign(layer=name)
+                  for name in layers]
+    table = pd.concat(tables, ignore_index=True)
+    return table[['layer', 'zone_id', *stats]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Zonal statistics of a raster over project polygons')
+    parser.add_argument('raster', type=Path)
+    parser.add_argument('zones', nargs='+', help='Layer names, e.g. final_poly control nursery')
+    parser.add_argument('--stats', nargs='+', default=list(DEFAULT_STATS))
+    parser.add_argument('--band', type=int, default=1)
+    parser.add_argument('-o', '--output', type=Path, help='CSV file (printed when omitted)')
+    args = parser.parse_args()
+
+    table = zonal_stats(args.raster, args.zones, args.stats, args.band)
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"  -> {args.output}")
+    else:
+        print(table.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
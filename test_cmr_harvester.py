@@ -0,0 +1,104 @@
+"""Test Earthdata CMR DEM harvesting against a local CMR/HTTP stand-in"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import zipfile
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+print("=" * 50)
+print("  CMR DEM HARVESTER TEST")
+print("=" * 50)
+
+workdir = Path(tempfile.mkdtemp(prefix="cmr_test_"))
+os.environ['EARTHDATA_TOKEN'] = 'test-token'
+
+# Fixture granule: 1x1 degree SRTM-style tile over Abu Ali, zipped like LP DAAC
+tile = workdir / "N27E049.tif"
+with rasterio.open(tile, 'w', driver='GTiff', height=360, width=360, count=1,
+                   dtype='int16', crs='EPSG:4326', nodata=-32768,
+                   transform=from_origin(49.0, 28.0, 1 / 360, 1 / 360)) as dst:
+    dst.write(np.arange(360 * 360, dtype='int16').reshape(1, 360, 360) % 50)
+granule_zip = workdir / "NASADEM_HGT_n27e049.zip"
+with zipfile.ZipFile(granule_zip, 'w') as zf:
+    zf.write(tile, "n27e049.tif")
+
+seen_auth = []
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        seen_auth.append(self.headers.get('Authorization'))
+        host = f"http://127.0.0.1:{self.server.server_port}"
+        if self.path.startswith('/search/granules.json'):
+            feed = {'feed': {'entry': [
+                {'id': 'G1', 'title': 'NASADEM_HGT_n27e049',
+                 'boxes': ['27 49 28 50'],
+                 'links': [{'rel': 'http://esipfed.org/ns/fedsearch/1.1/data#',
+                            'href': f"{host}/data/{granule_zip.name}"}]},
+                {'id': 'G2', 'title': 'NASADEM_HGT_n20e040',
+                 'boxes': ['20 40 21 41'],
+                 'links': [{'rel': 'http://esipfed.org/ns/fedsearch/1.1/data#',
+                            'href': f"{host}/data/unused.zip"}]},
+            ]}}
+            body = json.dumps(feed).encode()
+        elif self.path == f"/data/{granule_zip.name}":
+            body = granule_zip.read_bytes()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+server = HTTPServer(('127.0.0.1', 0), StandIn)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+cmr_url = f"http://127.0.0.1:{server.server_port}/search"
+
+from nasa_harvester import NASAHarvester
+
+harvester = NASAHarvester(workdir / "nasa")
+aoi = box(49.45, 27.25, 49.55, 27.35)
+
+print("\n[1] Searching stand-in CMR...")
+granules = harvester.search_cmr_granules(aoi, 'nasadem', cmr_url=cmr_url)
+assert [g['id'] for g in granules] == ['G1'], granules
+print(f"    Granules intersecting AOI: {len(granules)}")
+
+print("\n[2] Downloading and clipping to COG...")
+results = harvester.harvest_dem_tiles(aoi, 'nasadem', cmr_url=cmr_url)
+assert len(results) == 1 and results[0]['cog'], results
+assert all(a == 'Bearer test-token' for a in seen_auth), seen_auth
+with rasterio.open(results[0]['cog']) as cog:
+    left, bottom, right, top = cog.bounds
+    assert abs(left - 49.45) < 0.01 and abs(top - 27.35) < 0.01, cog.bounds
+    assert cog.profile.get('tiled') or cog.block_shapes[0][0] < cog.height
+    print(f"    COG: {cog.width}x{cog.height} px, bounds {tuple(round(b, 3) for b in cog.bounds)}")
+
+print("\n[3] Re-running uses the cache...")
+requests_before = len(seen_auth)
+harvester.harvest_dem_tiles(aoi, 'nasadem', cmr_url=cmr_url)
+assert len(seen_auth) == requests_before + 1  # only the CMR search
+print("    Cached granule reused: SUCCESS")
+
+server.shutdown()
+shutil.rmtree(workdir, ignore_errors=True)
+
+print("\n" + "=" * 50)
+print("  TEST COMPLETE")
+print("=" * 50)
@@ -0,0 +1,118 @@
+"""Test GIBS WMTS mosaics against a local tile stand-in, including failed tiles"""
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import rasterio
+from PIL import Image
+
+print("=" * 50)
+print("  GIBS HARVESTER TEST")
+print("=" * 50)
+
+workdir = Path(tempfile.mkdtemp(prefix="gibs_test_"))
+LAYER = 'MODIS_Terra_CorrectedReflectance_TrueColor'
+failing = set()      # tile paths answered with HTTP 500
+served = []
+
+
+def tile_jpg(col):
+    # Flat colour per column so the mosaic halves can be told apart
+    buf = io.BytesIO()
+    Image.new('RGB', (512, 512), (200, 40, 40) if col % 2 else (40, 40, 200)).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        served.append(self.path)
+        if self.path in failing:
+            self.send_error(500)
+            return
+        if '/2026-01-03/' in self.path:       # no coverage that day
+            self.send_error(404)
+            return
+        body = tile_jpg(int(self.path.rsplit('/', 1)[1].split('.')[0]))
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+server = HTTPServer(('127.0.0.1', 0), StandIn)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+gibs_url = f"http://127.0.0.1:{server.server_port}/wmts"
+
+from nasa_harvester import NASAHarvester
+from nasa_sources import GibsImagerySource
+
+harvester = NASAHarvester(workdir / "nasa")
+# Straddles the 49.5 E tile seam at level 8: 2 tiles per date
+bbox = (49.45, 27.25, 49.55, 27.35)
+dates = ['2026-01-01', '2026-01-02', '2026-01-03']
+span, rows, cols = GibsImagerySource.tile_range(bbox, 8)
+assert len(rows) == 1 and len(cols) == 2, (rows, cols)
+bad_tile = f"/wmts/{LAYER}/default/2026-01-02/250m/8/{rows[0]}/{cols[1]}.jpg"
+
+
+def catalog_dates():
+    with open(harvester.catalog_file) as f:
+        entry = json.load(f)['sources'][f"gibs_{LAYER}"]
+    return next(iter(entry['mosaics'].values()))
+
+
+print("\n[1] A date with a failed tile gets no mosaic...")
+failing.add(bad_tile)
+mosaics = harvester.harvest_gibs_imagery(bbox, dates, level=8, gibs_url=gibs_url)
+assert [m['date'] for m in mosaics] == ['2026-01-01', '2026-01-03'], mosaics
+mosaic_dir = Path(mosaics[0]['mosaic']).parent
+assert not (mosaic_dir / "2026-01-02.tif").exists()
+assert catalog_dates() == ['2026-01-01', '2026-01-03'], catalog_dates()
+assert mosaics[0]['tiles_fetched'] == 2 and mosaics[1]['tiles_fetched'] == 0, mosaics
+print("    2026-01-02 left pending, 404 date mosaicked blank: SUCCESS")
+
+print("\n[2] Mosaics are placed by tile row / col...")
+with rasterio.open(mosaics[0]['mosaic']) as src:
+    left, bottom, right, top = src.bounds
+    assert abs(left - 49.45) < 0.01 and abs(right - 49.55) < 0.01, src.bounds
+    red = src.read(1)
+    half = src.width // 2
+    assert np.median(red[:, :half - 2]) > 150 and np.median(red[:, half + 2:]) < 100   # odd col red
+with rasterio.open(mosaics[1]['mosaic']) as src:
+    assert not src.read().any()
+print("    Seam at 49.5 E, blank 404 tiles: SUCCESS")
+
+print("\n[3] The next run fetches only the failed tile...")
+failing.clear()
+served.clear()
+mosaics = harvester.harvest_gibs_imagery(bbox, dates, level=8, gibs_url=gibs_url)
+assert [m['date'] for m in mosaics] == ['2026-01-02'], mosaics
+assert served == [bad_tile], served
+assert (mosaic_dir / "2026-01-02.tif").exists()
+assert catalog_dates() == dates, catalog_dates()
+print("    Incomplete date completed from cached tiles: SUCCESS")
+
+print("\n[4] Complete dates are not revisited...")
+served.clear()
+assert harvester.harvest_gibs_imagery(bbox, dates, level=8, gibs_url=gibs_url) == []
+assert served == []
+print("    No requests for mosaicked dates: SUCCESS")
+
+server.shutdown()
+shutil.rmtree(workdir, ignore_errors=True)
+
+print("\n" + "=" * 50)
+print("  TEST COMPLETE")
+print("=" * 50)
@@ -0,0 +1,161 @@
+"""Test the harvest pipeline: stages, caching, metrics, resume and failures"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import requests
+
+print("=" * 50)
+print("  HARVEST PIPELINE TEST")
+print("=" * 50)
+
+workdir = Path(tempfile.mkdtemp(prefix="pipeline_test_"))
+failing = set()      # request paths answered with HTTP 500
+served = []
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        served.append(path)
+        if path in failing:
+            self.send_error(500)
+            return
+        if path.startswith('/items/'):
+            body = b'x' * (100 + int(path.rsplit('/', 1)[1]))
+        elif path == '/power':
+            body = json.dumps({'properties': {'parameter': {
+                'T2M': {'20260101': 30.5, '20260102': -999},
+                'RH2M': {'20260101': 60.0, '20260102': 61.0}}}}).encode()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+server = HTTPServer(('127.0.0.1', 0), StandIn)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+host = f"http://127.0.0.1:{server.server_port}"
+
+from harvest_pipeline import HarvestSource, WorkItem
+from nasa_harvester import NASAHarvester
+from nasa_sources import NeoSource, PowerSource
+
+
+ROUTES = {'https://power.larc.nasa.gov/api/temporal/daily/point': '/power',
+          'https://api.nasa.gov/neo/rest/v1/feed': '/neo'}
+
+
+class LocalSession(requests.Session):
+    """Sends the NASA API requests of a source to the stand-in"""
+
+    def request(self, method, url, *args, **kwargs):
+        for api, path in ROUTES.items():
+            url = url.replace(api, host + path)
+        return super().request(method, url, *args, **kwargs)
+
+
+class ItemSource(HarvestSource):
+    name = 'items'
+
+    def __init__(self, n):
+        self.n = n
+
+    def run_key(self):
+        return f"items:{self.n}"
+
+    def discover(self, harvester, session):
+        for i in range(self.n):
+            yield WorkItem(key=str(i), url=f"{host}/items/{i}",
+                           target=harvester.data_dir / "items" / f"{i}.bin")
+
+    def parse(self, harvester, item):
+        item.result = {'key': item.key, 'size': item.target.stat().st_size}
+
+
+class LocalPower(PowerSource):
+    def session(self, harvester):
+        return LocalSession()
+
+
+class LocalNeo(NeoSource):
+    def session(self, harvester):
+        return LocalSession()
+
+
+harvester = NASAHarvester(workdir / "nasa", workers=8)
+state_dir = harvester.data_dir / ".pipeline"
+
+print("\n[1] Items flow through fetch / parse / persist...")
+results = harvester.run_source(ItemSource(40))
+metrics = harvester.catalog['sources']['items']['metrics']
+assert sorted(int(r['key']) for r in results) == list(range(40))
+assert all(r['size'] == 100 + int(r['key']) for r in results)
+assert metrics['bytes_fetched'] == sum(100 + i for i in range(40)), metrics
+assert metrics['stages']['fetch']['items'] == 40 and metrics['cached'] == 0
+assert not list(state_dir.glob('*.json')), "resume state left after a clean run"
+print(f"    {len(results)} items, {metrics['bytes_fetched']} bytes: SUCCESS")
+
+print("\n[2] Cached items are counted exactly across worker threads...")
+for _ in range(5):
+    harvester.run_source(ItemSource(40))
+    metrics = harvester.catalog['sources']['items']['metrics']
+    assert metrics['cached'] == 40 and metrics['bytes_fetched'] == 0, metrics
+print("    40 / 40 cached on every rerun: SUCCESS")
+
+print("\n[3] Failed items are kept for a resume that retries only them...")
+shutil.rmtree(harvester.data_dir / "items")
+failing.update({'/items/3', '/items/7'})
+results = harvester.run_source(ItemSource(40))
+metrics = harvester.catalog['sources']['items']['metrics']
+assert len(results) == 38 and metrics['stages']['fetch']['failed'] == 2, metrics
+state_files = list(state_dir.glob('*.json'))
+assert len(state_files) == 1 and len(json.loads(state_files[0].read_text())['done']) == 38
+failing.clear()
+served.clear()
+results = harvester.run_source(ItemSource(40))
+metrics = harvester.catalog['sources']['items']['metrics']
+assert len(results) == 40 and metrics['resumed'] == 38, metrics
+assert sorted(served) == ['/items/3', '/items/7'], served
+assert not state_files[0].exists()
+print("    38 resumed, 2 retried, state cleared: SUCCESS")
+
+print("\n[4] A source with no successful items raises its error...")
+failing.add('/power')
+try:
+    harvester.run_source(LocalPower(27.3, 49.5, '2026-01-01', '2026-01-02', 'abu_ali'))
+except requests.HTTPError as e:
+    print(f"    POWER: {e.__class__.__name__} ({e.response.status_code})")
+else:
+    raise AssertionError("POWER harvest with a failed request returned normally")
+failing.add('/neo')
+try:
+    harvester.run_source(LocalNeo(days=3))
+except requests.HTTPError:
+    print("    NEO: HTTPError")
+else:
+    raise AssertionError("NEO harvest with failed requests returned normally")
+failing.clear()
+summary = harvester.run_source(LocalPower(27.3, 49.5, '2026-01-01', '2026-01-02', 'abu_ali'))
+assert summary['records'] == 4 and summary['parameters'] == {'T2M': 2, 'RH2M': 2}, summary
+print("    Errors raised, retry succeeds: SUCCESS")
+
+server.shutdown()
+shutil.rmtree(workdir, ignore_errors=True)
+
+print("\n" + "=" * 50)
+print("  TEST COMPLETE")
+print("=" * 50)
@@ -0,0 +1,65 @@
+"""Test harmonic tide fitting, station caching and tidal datums on a synthetic gauge"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'scripts'))
+
+import numpy as np
+import pandas as pd
+
+import tide_model
+from tide_model import TideModel, fit_tide_model, station_model
+
+print("=" * 50)
+print("  TIDE MODEL TEST")
+print("=" * 50)
+
+workdir = Path(tempfile.mkdtemp(prefix="tide_test_"))
+tide_model.CONSTITUENT_CACHE = workdir / "constituents"
+
+# 90 days of hourly M2 + K1 about a 0.10 m mean, with 1 cm noise
+truth = TideModel('synthetic', 0.10, {'M2': (0.62, 135.0), 'K1': (0.28, 40.0)})
+index = pd.date_range('2024-01-01', periods=90 * 24, freq='1h')
+levels = truth.predict(index) + np.random.default_rng(0).normal(0, 0.01, len(index))
+
+print("\n[1] Fitting M2 + K1 recovers amplitude and phase...")
+model = fit_tide_model(pd.Series(levels, index=index), 'synthetic')
+for name, (amp, phase) in truth.constituents.items():
+    fit_amp, fit_phase = model.constituents[name]
+    assert abs(fit_amp - amp) < 0.005, (name, fit_amp)
+    assert abs((fit_phase - phase + 180) % 360 - 180) < 1.0, (name, fit_phase)
+assert abs(model.z0 - 0.10) < 0.005 and model.rms_residual < 0.015, (model.z0, model.rms_residual)
+print(f"    M2 {model.constituents['M2'][0]:.3f} m, K1 {model.constituents['K1'][0]:.3f} m: SUCCESS")
+
+print("\n[2] Datums are ordered and centred on the mean level...")
+datums = model.datums(years=1)
+order = ['HAT', 'MHHW', 'MHW', 'MSL', 'MLW', 'MLLW', 'LAT']
+assert all(datums[a] >= datums[b] for a, b in zip(order, order[1:])), datums
+assert abs(datums['MSL'] - model.z0) < 0.01
+assert abs(datums['HAT'] - datums['LAT'] - 2 * (0.62 + 0.28)) < 0.15, datums
+print(f"    HAT {datums['HAT']:+.2f} / LAT {datums['LAT']:+.2f} m: SUCCESS")
+
+print("\n[3] A CLI-style fit in mm with a datum offset is reused by plain callers...")
+gauge = workdir / "gauge.csv"
+pd.DataFrame({'time': index.strftime('%Y-%m-%d %H:%M'),
+              'level_mm': np.round((levels + 1.0) * 1000)}).to_csv(gauge, index=False)
+fitted = station_model('synthetic', gauge, scale=0.001, datum_offset_m=-1.0)
+assert abs(fitted.z0 - 0.10) < 0.005 and abs(fitted.constituents['M2'][0] - 0.62) < 0.005
+cache_file = tide_model.CONSTITUENT_CACHE / "synthetic.json"
+stamp = cache_file.stat().st_mtime_ns
+reused = station_model('synthetic', gauge)            # as generate_8mm_maps_v2 calls it
+assert cache_file.stat().st_mtime_ns == stamp, "plain call refitted the model"
+assert reused.z0 == fitted.z0 and reused.read_options['scale'] == 0.001
+assert station_model('synthetic').constituents == reused.constituents
+print("    Stored read options reused, no refit: SUCCESS")
+
+print("\n[4] New read options refit the model...")
+refit = station_model('synthetic', gauge, scale=0.001)
+assert abs(refit.z0 - 1.10) < 0.005 and station_model('synthetic').z0 == refit.z0
+print("    Refitted without the datum offset: SUCCESS")
+
+print("\n" + "=" * 50)
+print("  TEST COMPLETE")
+print("=" * 50)
@@ -0,0 +1,116 @@
+"""Test the MBTiles basemap cache against a local XYZ tile stand-in"""
+import io
+import os
+import sys
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'scripts'))
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image
+
+from tile_cache import TileCache, add_basemap, tiles_for_bbox, tile_bounds_3857
+
+print("=" * 50)
+print("  TILE CACHE TEST")
+print("=" * 50)
+
+workdir = Path(tempfile.mkdtemp(prefix="tile_test_"))
+requests_seen = []
+
+
+def tile_png(z, x, y):
+    # Colour encodes the tile address so mosaics can be checked
+    img = Image.new('RGB', (256, 256), (z * 10, x % 256, y % 256))
+    buf = io.BytesIO()
+    img.save(buf, 'PNG')
+    return buf.getvalue()
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        requests_seen.append(self.path)
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 4 or parts[0] != 'tiles':
+            self.send_error(404)
+            return
+        z, y, x = (int(p) for p in parts[1:])
+        body = tile_png(z, x, y)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+server = HTTPServer(('127.0.0.1', 0), StandIn)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f"http://127.0.0.1:{server.server_port}/tiles/{{z}}/{{y}}/{{x}}"
+
+bbox = (49.60, 26.70, 49.64, 26.74)   # small AOI near Abu Ali
+expected = sum(1 for z in (12, 13, 14) for _ in tiles_for_bbox(bbox, z))
+cache = TileCache(workdir / "test.mbtiles", url)
+
+print("\n[1] Seeding zooms 12-14 from stand-in server...")
+stats = cache.seed(bbox, range(12, 15), workers=4)
+assert stats == {'fetched': expected, 'cached': 0, 'failed': 0}, stats
+print(f"    Seeded {stats['fetched']} tiles: SUCCESS")
+
+print("\n[2] Re-seeding fetches nothing...")
+before = len(requests_seen)
+stats = cache.seed(bbox, range(12, 15), workers=4)
+assert stats['fetched'] == 0 and stats['cached'] == expected, stats
+assert len(requests_seen) == before
+print("    All tiles served from cache: SUCCESS")
+
+print("\n[3] Rendering offline from the cache...")
+server.shutdown()
+z, x, y = next(tiles_for_bbox(bbox, 14))
+left, bottom, right, top = tile_bounds_3857(x, y, z)
+fig, ax = plt.subplots()
+ax.set_xlim(left + 10, right - 10)
+ax.set_ylim(bottom + 10, top - 10)
+assert add_basemap(ax, zoom=14, cache=cache)
+pixels = ax.images[0].get_array()
+assert tuple(pixels[128, 128, :3]) == (140, x % 256, y % 256), pixels[128, 128]
+assert ax.get_xlim() == (left + 10, right - 10)
+print("    Tile drawn at its Web Mercator extent: SUCCESS")
+
+print("\n[4] Uncached zoom falls back to parent tiles...")
+fig, ax = plt.subplots()
+ax.set_xlim(left + 10, right - 10)
+ax.set_ylim(bottom + 10, top - 10)
+assert add_basemap(ax, zoom=16, cache=cache)
+assert ax.images[0].get_array()[0, 0, 0] == 140
+print("    z16 rendered from cached z14: SUCCESS")
+
+print("\n[5] Mosaics are reused across panels and runs...")
+extent = (left + 10, right - 10, bottom + 10, top - 10)
+first, _ = cache.mosaic(extent, 14)
+assert cache.mosaic(extent, 14)[0] is first
+rerun = TileCache(workdir / "test.mbtiles", url)
+rerun._stitch = None   # a rerun must not stitch again
+image, _ = rerun.mosaic(extent, 14)
+assert isinstance(image, np.memmap) and np.array_equal(image, first)
+print("    Memory-mapped mosaic reused without stitching: SUCCESS")
+
+print("\n[6] Extent outside the cache is skipped cleanly...")
+fig, ax = plt.subplots()
+ax.set_xlim(0, 1000)
+ax.set_ylim(0, 1000)
+assert add_basemap(ax, zoom=14, cache=cache) is False
+assert not ax.images
+print("    No basemap, no network access: SUCCESS")
+plt.close('all')
+
+print("\n" + "=" * 50)
+print("  TEST COMPLETE")
+print("=" * 50)